@@ -47,7 +47,7 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ('role', 'is_active', 'created_at')
     search_fields = ('user__username', 'user__email', 'student_id', 'phone_number')
     readonly_fields = ('created_at', 'updated_at', 'current_borrowed_books',
-                       'can_borrow_more')
+                       'can_borrow_more', 'overdue_loans', 'outstanding_fine_balance')
 
     fieldsets = (
         ('User Information', {
@@ -58,7 +58,7 @@ class UserProfileAdmin(admin.ModelAdmin):
         }),
         ('Library Settings', {
             'fields': ('max_books_allowed', 'is_active', 'current_borrowed_books',
-                       'can_borrow_more')
+                       'can_borrow_more', 'overdue_loans', 'outstanding_fine_balance')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
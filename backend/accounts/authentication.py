@@ -0,0 +1,110 @@
+"""
+JWT authentication with embedded role claims.
+
+Tokens issued by LibraryRefreshToken carry the user's role and profile id as
+signed claims. ClaimsJWTAuthentication rebuilds request.user from those
+claims without touching the database; any other user or profile field is
+hydrated lazily the first time it is read. Because the role is trusted from
+the token, role changes and deactivations revoke previously issued tokens
+through a timestamp kept in the shared cache.
+"""
+import time
+
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import blacklist_index
+from .models import ClaimsUser, UserProfile
+
+ROLE_CLAIM = 'role'
+PROFILE_CLAIM = 'profile_id'
+USERNAME_CLAIM = 'username'
+AUTH_TIME_CLAIM = 'auth_time'
+
+REVOCATION_CACHE = 'shared'
+REVOCATION_KEY = 'auth:revoked:{user_id}'
+
+
+def _revocation_cache():
+    return caches[REVOCATION_CACHE]
+
+
+def revoke_user_tokens(user_id):
+    """Invalidate every token issued to user_id before now"""
+    _revocation_cache().set(
+        REVOCATION_KEY.format(user_id=user_id),
+        time.time(),
+        timeout=int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    )
+
+
+def is_token_revoked(token):
+    """Return True if the token predates a revocation for its user"""
+    revoked_at = _revocation_cache().get(
+        REVOCATION_KEY.format(user_id=token[api_settings.USER_ID_CLAIM])
+    )
+    if revoked_at is None:
+        return False
+    return token.get(AUTH_TIME_CLAIM, token.get('iat', 0)) < revoked_at
+
+
+class LibraryRefreshToken(RefreshToken):
+    """Refresh token carrying role/profile claims (copied to its access tokens)"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        profile = getattr(user, 'profile', None)
+
+        token[USERNAME_CLAIM] = user.get_username()
+        token[ROLE_CLAIM] = profile.role if profile else None
+        token[PROFILE_CLAIM] = profile.pk if profile else None
+        token[AUTH_TIME_CLAIM] = time.time()
+        return token
+
+    def check_blacklist(self):
+        """Check the blacklist through the in-memory Bloom filter/LRU"""
+        if blacklist_index.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+
+def build_claims_user(token):
+    """Build a ClaimsUser (with its profile) from validated token claims"""
+    db = router.db_for_read(ClaimsUser)
+    user_id = token[api_settings.USER_ID_CLAIM]
+
+    user = ClaimsUser.from_db(
+        db, ['id', 'username', 'is_active'],
+        [user_id, token.get(USERNAME_CLAIM, ''), True]
+    )
+    if token.get(PROFILE_CLAIM) is not None:
+        user.profile = UserProfile.from_db(
+            db, ['id', 'user_id', 'role'],
+            [token[PROFILE_CLAIM], user_id, token[ROLE_CLAIM]]
+        )
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts the signed role claims instead of loading
+    the user and profile on every request. Tokens without the claims fall back
+    to the stock database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if is_token_revoked(validated_token):
+            raise InvalidToken(_('Token has been revoked'))
+
+        return build_claims_user(validated_token)
@@ -0,0 +1,210 @@
+"""
+Fast refresh-token blacklist lookups.
+
+simplejwt checks every refresh token with an EXISTS query against
+token_blacklist_blacklistedtoken. BlacklistIndex answers most of those
+checks in memory: a Bloom filter rules out tokens that were never
+blacklisted, and an LRU remembers recent answers for the rest.
+
+The filter is built from the database on first use in each process.
+Blacklist writes are appended to a log in the shared cache, so other worker
+processes pick them up on their next lookup without re-reading the table.
+"""
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+SHARED_CACHE = 'shared'
+GENERATION_KEY = 'token_blacklist:generation'
+EPOCH_KEY = 'token_blacklist:epoch'
+LOG_KEY = 'token_blacklist:log:{}'
+LOG_TIMEOUT = 60 * 60 * 24
+
+DEFAULTS = {
+    'CAPACITY': 1000000,
+    'ERROR_RATE': 0.001,
+    'LRU_SIZE': 10000,
+    'MAX_LOG_REPLAY': 1000,
+}
+
+
+def filter_settings():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_BLACKLIST_FILTER', {})}
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class BlacklistIndex:
+    """Process-local Bloom filter + LRU in front of the blacklist table"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._lru = OrderedDict()
+        self._generation = 0
+        self._epoch = None
+
+    @property
+    def cache(self):
+        return caches[SHARED_CACHE]
+
+    def rebuild(self):
+        """Load every unexpired blacklisted JTI from the database"""
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        config = filter_settings()
+        jtis = BlacklistedToken.objects.filter(
+            token__expires_at__gt=timezone.now()
+        ).values_list('token__jti', flat=True)
+
+        generation = self.cache.get(GENERATION_KEY, 0)
+        epoch = self.cache.get(EPOCH_KEY)
+        capacity = max(config['CAPACITY'], jtis.count() * 2)
+        bloom = BloomFilter(capacity, config['ERROR_RATE'])
+        for jti in jtis.iterator(chunk_size=10000):
+            bloom.add(jti)
+
+        with self._lock:
+            self._bloom = bloom
+            self._lru.clear()
+            self._generation = generation
+            self._epoch = epoch
+
+    def _remember(self, jti, blacklisted):
+        with self._lock:
+            self._lru[jti] = blacklisted
+            self._lru.move_to_end(jti)
+            while len(self._lru) > filter_settings()['LRU_SIZE']:
+                self._lru.popitem(last=False)
+
+    def _add_local(self, jti):
+        with self._lock:
+            self._bloom.add(jti)
+        self._remember(jti, True)
+
+    def _sync(self):
+        """Replay blacklist writes published by other processes"""
+        if self._bloom is None or self.cache.get(EPOCH_KEY) != self._epoch:
+            self.rebuild()
+            return
+
+        generation = self.cache.get(GENERATION_KEY, 0)
+        if generation <= self._generation:
+            return
+
+        if generation - self._generation > filter_settings()['MAX_LOG_REPLAY']:
+            self.rebuild()
+            return
+
+        keys = [LOG_KEY.format(n) for n in range(self._generation + 1, generation + 1)]
+        entries = self.cache.get_many(keys)
+        if len(entries) != len(keys):
+            # Part of the log expired; fall back to the database
+            self.rebuild()
+            return
+
+        for jti in entries.values():
+            self._add_local(jti)
+        self._generation = generation
+
+        if self._bloom.count > self._bloom.capacity:
+            self.rebuild()
+
+    def is_blacklisted(self, jti):
+        """Return True if the JTI is blacklisted, querying the DB only on Bloom hits"""
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        self._sync()
+        if jti not in self._bloom:
+            return False
+
+        cached = self._lru.get(jti)
+        if cached is not None:
+            return cached
+
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        self._remember(jti, blacklisted)
+        return blacklisted
+
+    def record(self, jti):
+        """Add a newly blacklisted JTI locally and publish it to other processes"""
+        if self._bloom is not None:
+            self._add_local(jti)
+
+        cache = self.cache
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        while True:
+            generation = cache.incr(GENERATION_KEY)
+            # add() refuses to overwrite a slot claimed by a concurrent writer
+            if cache.add(LOG_KEY.format(generation), jti, timeout=LOG_TIMEOUT):
+                break
+        if self._bloom is not None and generation == self._generation + 1:
+            self._generation = generation
+
+    def invalidate(self):
+        """Force every process to rebuild its filter (after compaction)"""
+        self.cache.set(EPOCH_KEY, timezone.now().timestamp(), timeout=None)
+        with self._lock:
+            self._bloom = None
+
+
+blacklist_index = BlacklistIndex()
+
+
+def compact_token_blacklist(chunk_size=5000):
+    """
+    Delete expired outstanding tokens (and their blacklist rows) in chunks
+
+    Returns the number of outstanding tokens removed.
+    """
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+    now = timezone.now()
+    removed = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        removed += len(ids)
+        if len(ids) < chunk_size:
+            break
+
+    if removed:
+        blacklist_index.invalidate()
+    return removed
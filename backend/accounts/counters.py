@@ -0,0 +1,139 @@
+"""
+Denormalized circulation counters on UserProfile.
+
+active_loans, overdue_loans and outstanding_fine_balance are maintained with
+F() updates from the borrow/return/fine write paths so eligibility checks and
+profile serialization never need an aggregate query. rebuild_profile_counters()
+recomputes them from transactions and fines. Every delta is also applied to
+the library-wide rollups (see stats.rollups).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+
+from stats.rollups import adjust_library_totals
+
+from .models import UserProfile
+
+ACTIVE_LOAN_STATUSES = ('borrowed', 'overdue')
+
+
+def loan_counter_deltas(old_status, new_status):
+    """Return (active_loans, overdue_loans) deltas for a status change"""
+    active = int(new_status in ACTIVE_LOAN_STATUSES) - int(old_status in ACTIVE_LOAN_STATUSES)
+    overdue = int(new_status == 'overdue') - int(old_status == 'overdue')
+    return active, overdue
+
+
+def _counter_updates(active_loans=0, overdue_loans=0, fine_balance=0):
+    updates = {}
+    if active_loans:
+        updates['active_loans'] = F('active_loans') + active_loans
+    if overdue_loans:
+        updates['overdue_loans'] = F('overdue_loans') + overdue_loans
+    if fine_balance:
+        updates['outstanding_fine_balance'] = F('outstanding_fine_balance') + fine_balance
+    return updates
+
+
+def adjust_profile_counters(user_id, active_loans=0, overdue_loans=0, fine_balance=0):
+    """Atomically apply counter deltas to one user's profile"""
+    updates = _counter_updates(active_loans, overdue_loans, fine_balance)
+    if updates:
+        UserProfile.objects.filter(user_id=user_id).update(**updates)
+        adjust_library_totals(
+            active_loans=active_loans, overdue_loans=overdue_loans, pending_fine_amount=fine_balance
+        )
+
+
+def apply_profile_counter_deltas(deltas, chunk_size=500):
+    """
+    Apply many counter deltas at once
+
+    deltas maps user_id -> (active_loans, overdue_loans, fine_balance).
+    Users sharing the same delta are updated with one statement.
+    """
+    by_delta = defaultdict(list)
+    totals = [0, 0, 0]
+    for user_id, delta in deltas.items():
+        if any(delta):
+            by_delta[tuple(delta)].append(user_id)
+            totals = [total + value for total, value in zip(totals, delta)]
+
+    for delta, user_ids in by_delta.items():
+        updates = _counter_updates(*delta)
+        for start in range(0, len(user_ids), chunk_size):
+            UserProfile.objects.filter(
+                user_id__in=user_ids[start:start + chunk_size]
+            ).update(**updates)
+
+    adjust_library_totals(
+        active_loans=totals[0], overdue_loans=totals[1], pending_fine_amount=totals[2]
+    )
+
+
+def rebuild_profile_counters(chunk_size=5000):
+    """
+    Recompute every profile's counters from transactions and fines
+
+    Uses one grouped aggregate per source table, then rewrites profiles in
+    primary-key chunks with CASE UPDATEs. Returns the number of profiles
+    whose counters changed.
+    """
+    from transactions.models import Transaction, Fine
+
+    loans = {
+        user_id: (active, overdue)
+        for user_id, active, overdue in Transaction.objects.filter(
+            status__in=ACTIVE_LOAN_STATUSES
+        ).order_by().values_list('user_id').annotate(
+            active=Count('id'),
+            overdue=Count('id', filter=Q(status='overdue'))
+        )
+    }
+    balances = dict(
+        Fine.objects.filter(status='pending').order_by()
+        .values_list('user_id').annotate(balance=Sum('amount'))
+    )
+
+    changed = 0
+    last_id = 0
+    with transaction.atomic():
+        while True:
+            chunk = list(
+                UserProfile.objects.filter(id__gt=last_id).order_by('id').values_list(
+                    'id', 'user_id', 'active_loans', 'overdue_loans', 'outstanding_fine_balance'
+                )[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+
+            expected = {}
+            for profile_id, user_id, active, overdue, balance in chunk:
+                values = (*loans.get(user_id, (0, 0)), balances.get(user_id) or Decimal('0'))
+                if (active, overdue, balance) != values:
+                    expected[profile_id] = values
+
+            if expected:
+                changed += UserProfile.objects.filter(id__in=expected).update(
+                    active_loans=Case(
+                        *[When(id=pk, then=Value(values[0])) for pk, values in expected.items()],
+                        output_field=IntegerField()
+                    ),
+                    overdue_loans=Case(
+                        *[When(id=pk, then=Value(values[1])) for pk, values in expected.items()],
+                        output_field=IntegerField()
+                    ),
+                    outstanding_fine_balance=Case(
+                        *[When(id=pk, then=Value(values[2])) for pk, values in expected.items()],
+                        output_field=DecimalField(max_digits=10, decimal_places=2)
+                    ),
+                )
+
+            if len(chunk) < chunk_size:
+                break
+
+    return changed
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.blacklist import compact_token_blacklist
+
+
+class Command(BaseCommand):
+    help = 'Purge expired outstanding and blacklisted refresh tokens in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        removed = compact_token_blacklist(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{removed} expired token(s) removed.'))
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisioning import parse_rows, provision_users
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create users and profiles from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file (use - for stdin)')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default=None,
+                            help='Input format (default: inferred from the extension)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (
+            'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+        )
+
+        try:
+            if path == '-':
+                rows = parse_rows(sys.stdin, fmt)
+            else:
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    rows = parse_rows(stream, fmt)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Could not read {path}: {exc}')
+
+        result = provision_users(
+            rows,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            dry_run=options['dry_run']
+        )
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']} ({error['username']}): {' '.join(error['errors'])}")
+
+        if options['dry_run']:
+            self.stdout.write(f"{result['valid']} valid row(s), {result['skipped']} rejected.")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['created']} user(s) created, {result['skipped']} skipped."
+            ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.counters import rebuild_profile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute active/overdue loan and fine balance counters on user profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        changed = rebuild_profile_counters(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{changed} profile(s) updated.'))
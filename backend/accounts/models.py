@@ -2,8 +2,46 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from library_management.tracking import TrackChangesMixin
 
-class UserProfile(models.Model):
+class HydrateDeferredFieldsMixin:
+    """
+    Load every deferred field at once the first time any of them is accessed,
+    instead of one query per field.
+    """
+
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields)
+
+
+class ClaimsUser(HydrateDeferredFieldsMixin, User):
+    """
+    User rebuilt from signed JWT claims (see accounts.authentication).
+    Only id, username and the profile role are known up front; the remaining
+    fields are deferred and hydrated from the database on first access.
+    """
+    # Taken from the token, so possibly stale: never written back
+    CLAIM_FIELDS = ('username', 'is_active')
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.name not in self.CLAIM_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class UserProfile(HydrateDeferredFieldsMixin, TrackChangesMixin, models.Model):
     USER_ROLES = (
         ('student', 'Student'),
         ('librarian', 'Librarian'),
@@ -23,6 +61,11 @@ class UserProfile(models.Model):
     max_books_allowed = models.IntegerField(default=5)
     is_active = models.BooleanField(default=True)
 
+    # Denormalized circulation counters (maintained by accounts.counters)
+    active_loans = models.IntegerField(default=0)
+    overdue_loans = models.IntegerField(default=0)
+    outstanding_fine_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
     class Meta:
         db_table = 'user_profiles'
         verbose_name = 'User Profile'
@@ -37,12 +80,48 @@ class UserProfile(models.Model):
 
     @property
     def current_borrowed_books(self):
-        """Count of currently borrowed books - uses reverse relation"""
-        return self.user.transactions.filter(status='borrowed').count()
+        """Count of currently borrowed books (including overdue ones)"""
+        return self.active_loans
 
     @property
     def can_borrow_more(self):
-        return self.current_borrowed_books < self.max_books_allowed
+        return self.active_loans < self.max_books_allowed
+
+    def borrowing_blocks(self):
+        """
+        Why this user cannot borrow right now (empty when they can)
+
+        The rules BorrowBookSerializer enforces, from the circulation
+        counters: 'borrowing_limit', 'overdue_loans' and 'unpaid_fines'.
+        """
+        blocks = []
+        if not self.can_borrow_more:
+            blocks.append('borrowing_limit')
+        if self.overdue_loans > 0:
+            blocks.append('overdue_loans')
+        if self.outstanding_fine_balance > 0:
+            blocks.append('unpaid_fines')
+        return blocks
+
+
+class UserSearchToken(models.Model):
+    """
+    Normalized search tokens for the librarian user directory
+    (maintained by accounts.search on User/UserProfile save)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=254)
+
+    class Meta:
+        db_table = 'user_search_tokens'
+        verbose_name = 'User Search Token'
+        verbose_name_plural = 'User Search Tokens'
+        indexes = [
+            models.Index(fields=['token', 'user']),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.user_id}"
 
 
 # Signal to automatically create UserProfile when a User is created
@@ -54,5 +133,51 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+    # Only a profile loaded alongside the user can have unsaved edits; the
+    # tracked save() is a no-op unless one of its fields actually changed
+    if User.profile.related.is_cached(instance):
+        instance.profile.save()
+
+
+# Tokens embed the role claim, so a role change or deactivation revokes them
+@receiver(post_save, sender=UserProfile)
+def revoke_tokens_on_role_change(sender, instance, created, **kwargs):
+    # post_save runs before the tracked snapshot is refreshed
+    loaded_role = instance.get_loaded_value('role')
+    if not created and loaded_role is not None and loaded_role != instance.role:
+        from .authentication import revoke_user_tokens
+        revoke_user_tokens(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_deactivation(sender, instance, created, **kwargs):
+    if not created and not instance.is_active:
+        from .authentication import revoke_user_tokens
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def record_blacklisted_token(sender, instance, created, **kwargs):
+    if created:
+        from .blacklist import blacklist_index
+        blacklist_index.record(instance.token.jti)
+
+
+# Keep the user directory search index current
+SEARCHABLE_USER_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def index_user_search_tokens(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCHABLE_USER_FIELDS & set(update_fields):
+        return
+    from .search import index_users
+    index_users([instance.pk])
+
+
+@receiver(post_save, sender=UserProfile)
+def index_profile_search_tokens(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'student_id' not in update_fields):
+        return
+    from .search import index_users
+    index_users([instance.user_id])
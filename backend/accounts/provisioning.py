@@ -0,0 +1,253 @@
+"""
+Bulk user provisioning for semester onboarding.
+
+Rows come from CSV or NDJSON. They are held to the registration rules
+(model field validators, AUTH_PASSWORD_VALIDATORS), duplicates are checked
+with set-based batch queries, and User/UserProfile rows are written with
+bulk_create -- so the per-user post_save signals and uniqueness queries of
+the registration path are skipped entirely.
+
+The management command hashes passwords across a process pool. The API
+validates the upload, hashes the passwords and hands the valid rows to
+background jobs of JOB_BATCH_SIZE rows each (see accounts.tasks). Job
+arguments are kept in the jobs table, so only the hashes are queued,
+never the plaintext passwords.
+"""
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import UserProfile
+from .search import index_users
+
+FIELDS = ('username', 'email', 'password', 'first_name', 'last_name',
+          'role', 'student_id', 'phone_number')
+REQUIRED_FIELDS = ('username', 'email', 'first_name', 'last_name')
+# Checked with the model field validators, as registration does
+VALIDATED_FIELDS = {
+    'username': User, 'email': User, 'first_name': User, 'last_name': User,
+    'student_id': UserProfile, 'phone_number': UserProfile,
+}
+JOB_BATCH_SIZE = 200
+
+
+def parse_rows(stream, fmt='csv'):
+    """Parse a CSV or NDJSON text stream into a list of row dicts"""
+    if fmt == 'ndjson':
+        return [json.loads(line) for line in stream if line.strip()]
+    if fmt == 'csv':
+        return list(csv.DictReader(stream))
+    raise ValueError(f'Unsupported format: {fmt}')
+
+
+def parse_upload(uploaded_file, fmt=None):
+    """Parse an uploaded file, inferring the format from its extension"""
+    if fmt is None:
+        fmt = 'ndjson' if uploaded_file.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    return parse_rows(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig'), fmt)
+
+
+def _value(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def _clean(row):
+    """Row dict with every field as a stripped string, or None for a non-object row"""
+    if not isinstance(row, dict):
+        return None
+    cleaned = {field: _value(row, field) for field in FIELDS}
+    cleaned['role'] = cleaned['role'] or 'student'
+    cleaned['student_id'] = cleaned['student_id'] or None
+    return cleaned
+
+
+def _existing(model, field, values, batch_size):
+    """Return the subset of values already present in model.field"""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), batch_size):
+        found.update(
+            model.objects.filter(**{f'{field}__in': values[start:start + batch_size]})
+            .values_list(field, flat=True)
+        )
+    return found
+
+
+def _field_errors(row, hashed=False):
+    problems = []
+    for field, model in VALIDATED_FIELDS.items():
+        if row[field]:
+            try:
+                model._meta.get_field(field).run_validators(row[field])
+            except ValidationError as exc:
+                problems += [f'{field}: {message}' for message in exc.messages]
+    if row['password'] and not hashed:
+        try:
+            validate_password(row['password'])
+        except ValidationError as exc:
+            problems += [f'password: {message}' for message in exc.messages]
+    return problems
+
+
+def validate_rows(rows, batch_size=500, hashed=False):
+    """
+    Split rows into (valid, errors)
+
+    errors is a list of {'row': n, 'username': ..., 'errors': [...]} with
+    1-based row numbers. Duplicates are detected within the file and against
+    the database with one query per batch and unique field. With hashed=True
+    the passwords are already hashes and are not checked again.
+    """
+    valid_roles = {role for role, _ in UserProfile.USER_ROLES}
+    cleaned = [_clean(row) for row in rows]
+    objects = [row for row in cleaned if row is not None]
+
+    existing = {
+        'username': _existing(User, 'username', {r['username'] for r in objects if r['username']}, batch_size),
+        'email': _existing(User, 'email', {r['email'] for r in objects if r['email']}, batch_size),
+        'student_id': _existing(UserProfile, 'student_id',
+                                {r['student_id'] for r in objects if r['student_id']}, batch_size),
+    }
+    seen = {field: set() for field in existing}
+
+    valid, errors = [], []
+    for number, row in enumerate(cleaned, start=1):
+        if row is None:
+            errors.append({'row': number, 'username': '', 'errors': ['Row must be an object of user fields.']})
+            continue
+
+        problems = [f'{field} is required.' for field in REQUIRED_FIELDS if not row[field]]
+        problems += _field_errors(row, hashed=hashed)
+        if row['role'] not in valid_roles:
+            problems.append(f"role must be one of: {', '.join(sorted(valid_roles))}.")
+
+        for field in existing:
+            value = row[field]
+            if not value:
+                continue
+            if value in existing[field]:
+                problems.append(f'{field} already exists.')
+            elif value in seen[field]:
+                problems.append(f'{field} is duplicated in the file.')
+
+        if problems:
+            errors.append({'row': number, 'username': row['username'], 'errors': problems})
+            continue
+
+        for field in seen:
+            if row[field]:
+                seen[field].add(row[field])
+        valid.append(row)
+
+    return valid, errors
+
+
+def _setup_worker(settings_module):
+    # Spawned workers need Django configured before hashing
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash passwords in parallel; blank passwords become unusable"""
+    values = [password or None for password in passwords]
+    if workers == 1 or len(values) < 2:
+        return [make_password(value) for value in values]
+
+    settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'library_management.settings')
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker,
+                             initargs=(settings_module,)) as pool:
+        chunksize = max(len(values) // ((workers or os.cpu_count() or 1) * 4), 1)
+        return list(pool.map(make_password, values, chunksize=chunksize))
+
+
+def provision_users(rows, batch_size=500, workers=None, dry_run=False, hashed=False):
+    """
+    Validate and create users with their profiles
+
+    With hashed=True each row's password is already a hash (see
+    enqueue_provisioning) and is stored as is.
+    Returns {'created': n, 'skipped': n, 'errors': [...]}.
+    """
+    valid, errors = validate_rows(rows, batch_size=batch_size, hashed=hashed)
+    result = {'created': 0, 'skipped': len(errors), 'errors': errors}
+    if dry_run or not valid:
+        result['valid'] = len(valid)
+        return result
+
+    if hashed:
+        hashes = [row['password'] or make_password(None) for row in valid]
+    else:
+        hashes = hash_passwords([row['password'] for row in valid], workers=workers)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=row['username'],
+                email=row['email'],
+                password=password_hash,
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+            )
+            for row, password_hash in zip(valid, hashes)
+        ], batch_size=batch_size)
+
+        if any(user.pk is None for user in users):
+            # Backends without RETURNING support: look the ids up by username
+            ids = {}
+            usernames = [user.username for user in users]
+            for start in range(0, len(usernames), batch_size):
+                ids.update(User.objects.filter(
+                    username__in=usernames[start:start + batch_size]
+                ).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user_id=user.pk,
+                role=row['role'],
+                student_id=row['student_id'],
+                phone_number=row['phone_number'],
+            )
+            for user, row in zip(users, valid)
+        ], batch_size=batch_size)
+
+        # bulk_create skips the post_save signals that maintain the directory index
+        index_users([user.pk for user in users], batch_size=batch_size)
+
+    result['created'] = len(users)
+    return result
+
+
+def enqueue_provisioning(rows, batch_size=JOB_BATCH_SIZE):
+    """
+    Validate rows and queue the valid ones for creation in background jobs
+
+    Returns {'queued': n, 'skipped': n, 'errors': [...], 'jobs': [job ids]}.
+    Passwords are hashed here, so the queued rows carry only hashes. Each
+    job validates its rows again, so users created in the meantime are
+    skipped rather than failing the batch.
+    """
+    from .tasks import provision_user_batch
+
+    valid, errors = validate_rows(rows)
+    hashes = hash_passwords([row['password'] for row in valid], workers=1)
+    valid = [{**row, 'password': password_hash} for row, password_hash in zip(valid, hashes)]
+    jobs = []
+    with transaction.atomic():
+        for start in range(0, len(valid), batch_size):
+            job = provision_user_batch.enqueue(valid[start:start + batch_size])
+            if job is not None:
+                jobs.append(job.pk)
+    return {'queued': len(valid), 'skipped': len(errors), 'errors': errors, 'jobs': jobs}
@@ -0,0 +1,109 @@
+"""
+Librarian user directory search.
+
+Every user is indexed as a set of normalized tokens (username, email and its
+local part, name words, student ID) in user_search_tokens. A query word
+matches a token by prefix through an index range scan, and each word of the
+query narrows the result further -- all in one SQL statement.
+"""
+import re
+import unicodedata
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import UserSearchToken
+
+WORD_SPLIT = re.compile(r'[\s,;]+')
+MAX_TOKEN_LENGTH = UserSearchToken._meta.get_field('token').max_length
+
+
+def normalize(value):
+    """Casefold and strip accents so 'José' matches 'jose'"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return value.casefold().strip()
+
+
+def tokens_for(username, email, first_name, last_name, student_id):
+    """Return the set of search tokens for one user"""
+    tokens = {normalize(username), normalize(email), normalize(student_id)}
+    tokens.add(normalize(email).split('@')[0])
+    for name in (first_name, last_name):
+        tokens.update(WORD_SPLIT.split(normalize(name)))
+    return {token[:MAX_TOKEN_LENGTH] for token in tokens if token}
+
+
+def index_users(user_ids, batch_size=1000):
+    """(Re)build search tokens for the given users"""
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        rows = User.objects.filter(id__in=chunk).values_list(
+            'id', 'username', 'email', 'first_name', 'last_name', 'profile__student_id'
+        )
+        entries = [
+            UserSearchToken(user_id=row[0], token=token)
+            for row in rows
+            for token in tokens_for(*row[1:])
+        ]
+        with transaction.atomic():
+            UserSearchToken.objects.filter(user_id__in=chunk).delete()
+            UserSearchToken.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def rebuild_search_index(batch_size=1000):
+    """Rebuild the whole index; returns the number of users indexed"""
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            User.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        index_users(ids, batch_size=batch_size)
+        indexed += len(ids)
+        last_id = ids[-1]
+    return indexed
+
+
+def search_users(query, limit=20):
+    """
+    Return compact directory entries for users matching every word of query
+
+    Each word is a prefix range scan on (token, user_id); the matching ids
+    feed a single SELECT that also returns the profile's loan counters.
+    """
+    words = [word for word in WORD_SPLIT.split(normalize(query)) if word]
+    if not words:
+        return []
+
+    users = User.objects.all()
+    for word in words:
+        users = users.filter(id__in=UserSearchToken.objects.filter(
+            token__gte=word, token__lt=word + '\uffff'
+        ).values('user_id'))
+
+    rows = users.order_by('last_name', 'first_name', 'username').values(
+        'id', 'username', 'email', 'first_name', 'last_name', 'is_active',
+        'profile__role', 'profile__student_id', 'profile__active_loans',
+        'profile__overdue_loans', 'profile__outstanding_fine_balance'
+    )[:limit]
+
+    return [
+        {
+            'id': row['id'],
+            'username': row['username'],
+            'full_name': f"{row['first_name']} {row['last_name']}".strip() or row['username'],
+            'email': row['email'],
+            'is_active': row['is_active'],
+            'role': row['profile__role'],
+            'student_id': row['profile__student_id'],
+            'active_loans': row['profile__active_loans'] or 0,
+            'overdue_loans': row['profile__overdue_loans'] or 0,
+            'outstanding_fine_balance': row['profile__outstanding_fine_balance'] or 0,
+        }
+        for row in rows
+    ]
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from .authentication import LibraryRefreshToken, is_token_revoked
 from .models import UserProfile
 
 
@@ -16,9 +19,11 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'id', 'role', 'student_id', 'phone_number', 'address',
             'date_of_birth', 'profile_picture', 'max_books_allowed',
             'is_active', 'full_name', 'current_borrowed_books',
-            'can_borrow_more', 'created_at', 'updated_at'
+            'can_borrow_more', 'active_loans', 'overdue_loans',
+            'outstanding_fine_balance', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['active_loans', 'overdue_loans', 'outstanding_fine_balance',
+                            'created_at', 'updated_at']
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -175,7 +180,7 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
             user.first_name = user_data.get('first_name', user.first_name)
             user.last_name = user_data.get('last_name', user.last_name)
             user.email = user_data.get('email', user.email)
-            user.save()
+            user.save(update_fields=list(user_data))
 
         # Update profile fields
         instance.phone_number = validated_data.get('phone_number', instance.phone_number)
@@ -184,4 +189,14 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
         instance.profile_picture = validated_data.get('profile_picture', instance.profile_picture)
         instance.save()
 
-        return instance
\ No newline at end of file
+        return instance
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """Token refresh that rejects tokens revoked by a role change"""
+    token_class = LibraryRefreshToken
+
+    def validate(self, attrs):
+        if is_token_revoked(self.token_class(attrs['refresh'])):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
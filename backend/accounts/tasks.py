@@ -0,0 +1,23 @@
+import logging
+
+from jobs.queue import task
+from .blacklist import compact_token_blacklist
+from .provisioning import provision_users
+
+logger = logging.getLogger(__name__)
+
+
+@task(unique=True)
+def compact_expired_tokens(chunk_size=5000):
+    """Scheduled twin of `manage.py compact_token_blacklist`"""
+    return compact_token_blacklist(chunk_size=chunk_size)
+
+
+@task(max_attempts=3)
+def provision_user_batch(rows):
+    """Create one batch of users validated (and hashed) by POST /api/auth/users/provision/"""
+    result = provision_users(rows, hashed=True)
+    for error in result['errors']:
+        logger.warning('Provisioning skipped row %s (%s): %s',
+                       error['row'], error['username'], ' '.join(error['errors']))
+    return result
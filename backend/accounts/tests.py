@@ -1,3 +1,243 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .blacklist import GENERATION_KEY, SHARED_CACHE, BlacklistIndex, compact_token_blacklist
+from .provisioning import provision_users
+from .search import rebuild_search_index, search_users
+
+
+class ClaimsUserWriteTests(APITestCase):
+    """Writes through a token-built request.user must not restore stale claims"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('stu', 'stu@example.com', 'Old-pass-123')
+        response = self.client.post(
+            '/api/auth/login/', {'username': 'stu', 'password': 'Old-pass-123'}, format='json'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['tokens']['access'])
+        # Renamed by an admin after the token was issued
+        User.objects.filter(pk=self.user.pk).update(username='renamed')
+
+    def test_change_password_keeps_username(self):
+        response = self.client.post('/api/auth/change-password/', {
+            'old_password': 'Old-pass-123', 'new_password': 'New-pass-456', 'new_password2': 'New-pass-456',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.username, 'renamed')
+        self.assertTrue(self.user.check_password('New-pass-456'))
+
+    def test_profile_update_keeps_username(self):
+        response = self.client.put('/api/auth/profile/', {'first_name': 'Stu'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.username, self.user.first_name), ('renamed', 'Stu'))
+
+
+class ProvisionUsersTests(APITestCase):
+    def setUp(self):
+        librarian = User.objects.create_user('lib', 'lib@example.com', 'Lib-pass-123')
+        librarian.profile.role = 'librarian'
+        librarian.profile.save()
+        self.client.force_authenticate(librarian)
+
+    def row(self, username, **fields):
+        return {'username': username, 'email': f'{username}@example.com', 'password': 'Sturdy-pass-123',
+                'first_name': 'First', 'last_name': 'Last', **fields}
+
+    def test_malformed_rows_are_row_errors(self):
+        response = self.client.post('/api/auth/users/provision/', {'dry_run': 'true', 'users': [
+            self.row('numeric', student_id=12345),
+            'junk',
+            self.row('weak', password='pw'),
+            self.row('bad name!'),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['valid'], 1)
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4])
+        self.assertTrue(all(message.startswith('password:') for message in errors[3]))
+        self.assertTrue(errors[4][0].startswith('username:'))
+
+    def test_creation_is_queued(self):
+        from jobs.models import Job
+        from accounts.tasks import provision_user_batch
+
+        response = self.client.post('/api/auth/users/provision/', {
+            'users': [self.row('new1', student_id=1), self.row('new2')]
+        }, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(response.data['queued'], 2)
+        self.assertFalse(User.objects.filter(username__startswith='new').exists())
+
+        job = Job.objects.get(pk=response.data['jobs'][0])
+        # Only password hashes are stored in the jobs table
+        self.assertNotIn('Sturdy-pass-123', json.dumps([job.args, job.kwargs]))
+        result = provision_user_batch(*job.args, **job.kwargs)
+        self.assertEqual(result['created'], 2)
+        user = User.objects.get(username='new1')
+        self.assertEqual(user.profile.student_id, '1')
+        self.assertTrue(user.check_password('Sturdy-pass-123'))
+
+    def test_job_admin_hides_arguments(self):
+        from django.contrib.admin.sites import site
+        from jobs.models import Job
+
+        form = site._registry[Job].get_form(None)
+        self.assertNotIn('args', form.base_fields)
+
+
+class BlacklistIndexTests(TestCase):
+    def setUp(self):
+        caches[SHARED_CACHE].clear()
+        self.user = User.objects.create_user('stu', 'stu@example.com', 'Old-pass-123')
+
+    def token(self, jti, expires_in=timedelta(days=1), blacklisted=False):
+        token = OutstandingToken.objects.create(
+            user=self.user, jti=jti, token=jti, expires_at=timezone.now() + expires_in
+        )
+        if blacklisted:
+            BlacklistedToken.objects.create(token=token)
+        return token
+
+    def test_blacklist_from_another_process_is_replayed(self):
+        here, there = BlacklistIndex(), BlacklistIndex()
+        self.assertFalse(here.is_blacklisted('a'))
+        self.assertFalse(there.is_blacklisted('a'))
+        bloom = here._bloom
+
+        # Written by "there": the database row plus the shared-cache log entry
+        self.token('a', blacklisted=True)
+        there.record('a')
+
+        self.assertTrue(here.is_blacklisted('a'))
+        self.assertIs(here._bloom, bloom)  # replayed from the log, not rebuilt
+        self.assertEqual(here._generation, caches[SHARED_CACHE].get(GENERATION_KEY))
+
+    def test_bloom_false_positive_asks_the_database(self):
+        index = BlacklistIndex()
+        index.rebuild()
+        with self.assertNumQueries(0):
+            self.assertFalse(index.is_blacklisted('never'))
+
+        index._bloom.add('ghost')  # as if its bits collided with blacklisted JTIs
+        with self.assertNumQueries(1):
+            self.assertFalse(index.is_blacklisted('ghost'))
+        with self.assertNumQueries(0):
+            self.assertFalse(index.is_blacklisted('ghost'))
+
+    @override_settings(TOKEN_BLACKLIST_FILTER={'LRU_SIZE': 2})
+    def test_lru_is_bounded(self):
+        index = BlacklistIndex()
+        index.rebuild()
+        for jti in ('a', 'b', 'c'):
+            self.token(jti, blacklisted=True)
+            index._bloom.add(jti)
+            self.assertTrue(index.is_blacklisted(jti))
+        self.assertEqual(list(index._lru), ['b', 'c'])
+
+    def test_compaction_deletes_in_chunks_and_forces_rebuild(self):
+        for n in range(5):
+            self.token(f'old{n}', expires_in=-timedelta(minutes=1), blacklisted=n % 2 == 0)
+        self.token('live', blacklisted=True)
+        index = BlacklistIndex()
+        self.assertTrue(index.is_blacklisted('live'))
+        bloom = index._bloom
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(compact_token_blacklist(chunk_size=2), 5)
+        deletes = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE FROM "token_blacklist_outstandingtoken"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+        self.assertTrue(index.is_blacklisted('live'))
+        self.assertIsNot(index._bloom, bloom)
+        self.assertEqual(compact_token_blacklist(chunk_size=2), 0)
+
+
+class UserSearchTests(APITestCase):
+    def setUp(self):
+        self.jose = User.objects.create_user('jnunez', 'Jose.Nunez@example.edu', 'pw',
+                                             first_name='José', last_name='Núñez Ortiz')
+        self.jose.profile.student_id = 'S-1001'
+        self.jose.profile.save()
+        self.josephine = User.objects.create_user('jnolan', 'jo@example.edu', 'pw',
+                                                  first_name='Josephine', last_name='Nolan')
+        self.librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        self.librarian.profile.role = 'librarian'
+        self.librarian.profile.save()
+        self.client.force_authenticate(self.librarian)
+
+    def found(self, query):
+        return [row['username'] for row in search_users(query)]
+
+    def test_accent_and_case_folding(self):
+        for query in ('nunez', 'NÚÑEZ', 'Ortiz', 'JOSÉ nunez', 'jose NÚÑEZ'):
+            self.assertEqual(self.found(query), ['jnunez'], query)
+        self.assertEqual(self.found('JOSÉ'), ['jnolan', 'jnunez'])
+
+    def test_every_word_matches_a_prefix(self):
+        self.assertEqual(self.found('jos'), ['jnolan', 'jnunez'])
+        self.assertEqual(self.found('jos nu'), ['jnunez'])
+        self.assertEqual(self.found('no, jos'), ['jnolan'])
+        self.assertEqual(self.found('jos xyz'), [])
+        # Username, email, its local part and the student ID are tokens too
+        for query in ('jnun', 'jose.nunez@', 'jose.nu', 's-100'):
+            self.assertEqual(self.found(query), ['jnunez'], query)
+        self.assertEqual(self.found(' ,; '), [])
+
+    def test_signals_keep_the_index_current(self):
+        self.jose.last_name = 'Pérez'
+        self.jose.save()
+        self.assertEqual(self.found('perez'), ['jnunez'])
+        self.assertEqual(self.found('nunez'), [])
+
+        self.jose.profile.student_id = 'S-2002'
+        self.jose.profile.save(update_fields=['student_id'])
+        self.assertEqual(self.found('s-2002'), ['jnunez'])
+        self.assertEqual(self.found('s-1001'), [])
+
+        # Saves that cannot change a token skip the reindex
+        with mock.patch('accounts.search.index_users') as index_users:
+            self.jose.save(update_fields=['last_login'])
+            self.jose.profile.save(update_fields=['active_loans'])
+        index_users.assert_not_called()
+
+    def test_provisioned_users_are_indexed(self):
+        result = provision_users([{
+            'username': 'newbie', 'email': 'newbie@example.edu', 'password': 'Sturdy-pass-123',
+            'first_name': 'Zoë', 'last_name': 'Quinn', 'student_id': 'S-3003',
+        }])
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(self.found('zoe qu'), ['newbie'])
+        self.assertEqual(self.found('s-3003'), ['newbie'])
+
+        # A full rebuild gives the same answers
+        self.assertEqual(rebuild_search_index(batch_size=2), User.objects.count())
+        self.assertEqual(self.found('zoe qu'), ['newbie'])
+
+    def test_endpoint_is_for_librarians(self):
+        response = self.client.get('/api/auth/users/search/', {'q': 'josé núñez'})
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data['results']
+        self.assertEqual((row['id'], row['full_name'], row['student_id'], row['role']),
+                         (self.jose.id, 'José Núñez Ortiz', 'S-1001', 'student'))
+        self.assertEqual(len(self.client.get('/api/auth/users/search/', {'q': 'jos', 'limit': 1}).data['results']), 1)
+        self.assertEqual(self.client.get('/api/auth/users/search/', {'q': 'j'}).status_code, 400)
+
+        self.client.force_authenticate(self.jose)
+        self.assertEqual(self.client.get('/api/auth/users/search/', {'q': 'jos'}).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/auth/users/search/', {'q': 'jos'}).status_code, 401)
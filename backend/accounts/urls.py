@@ -2,7 +2,7 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     RegisterView, LoginView, ProfileView,
-    ChangePasswordView, LogoutView
+    ChangePasswordView, LogoutView, ProvisionUsersView, UserSearchView
 )
 
 urlpatterns = [
@@ -15,4 +15,8 @@ urlpatterns = [
     # Profile
     path('profile/', ProfileView.as_view(), name='profile'),
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
+
+    # Librarian tools
+    path('users/search/', UserSearchView.as_view(), name='user_search'),
+    path('users/provision/', ProvisionUsersView.as_view(), name='provision_users'),
 ]
\ No newline at end of file
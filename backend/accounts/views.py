@@ -1,7 +1,7 @@
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from .serializers import (
@@ -10,6 +10,10 @@ from .serializers import (
     UserProfileSerializer
 )
 from .models import UserProfile
+from .authentication import LibraryRefreshToken
+from .provisioning import enqueue_provisioning, parse_upload, provision_users
+from .search import search_users
+from transactions.views import IsLibrarian
 
 
 class RegisterView(generics.CreateAPIView):
@@ -27,7 +31,7 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = LibraryRefreshToken.for_user(user)
 
         return Response({
             'user': UserSerializer(user).data,
@@ -68,7 +72,7 @@ class LoginView(APIView):
             }, status=status.HTTP_403_FORBIDDEN)
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = LibraryRefreshToken.for_user(user)
 
         return Response({
             'user': UserSerializer(user).data,
@@ -130,7 +134,7 @@ class ChangePasswordView(APIView):
 
         # Set new password
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
 
         return Response({
             'message': 'Password changed successfully'
@@ -148,7 +152,7 @@ class LogoutView(APIView):
         try:
             refresh_token = request.data.get('refresh_token')
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = LibraryRefreshToken(refresh_token)
                 token.blacklist()
 
             return Response({
@@ -157,4 +161,60 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({
                 'error': 'Invalid token'
-            }, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProvisionUsersView(APIView):
+    """
+    API endpoint for bulk user provisioning (librarian only)
+    POST /api/auth/users/provision/
+
+    Accepts a CSV/NDJSON upload in "file" or a JSON body {"users": [...]}.
+    Valid rows are created by background jobs (202 with their ids); pass
+    dry_run=true to validate without queueing anything.
+    """
+    permission_classes = [IsLibrarian]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        dry_run = str(request.data.get('dry_run', '')).lower() == 'true'
+
+        if 'file' in request.FILES:
+            try:
+                rows = parse_upload(request.FILES['file'], request.data.get('format'))
+            except (ValueError, UnicodeDecodeError) as e:
+                return Response({
+                    'error': f'Could not parse file: {e}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data.get('users'), list):
+            rows = request.data['users']
+        else:
+            return Response({
+                'error': 'Provide a CSV/NDJSON "file" or a "users" list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if dry_run:
+            return Response(provision_users(rows, dry_run=True), status=status.HTTP_200_OK)
+        return Response(enqueue_provisioning(rows), status=status.HTTP_202_ACCEPTED)
+
+
+class UserSearchView(APIView):
+    """
+    API endpoint for the librarian user directory
+    GET /api/auth/users/search/?q=<name, username, email or student ID>&limit=20
+    """
+    permission_classes = [IsLibrarian]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < 2:
+            return Response({
+                'error': 'Search query must be at least 2 characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+
+        return Response({'results': search_users(query, limit=limit)})
@@ -0,0 +1,93 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from library_management.parsers import FastJSONParser
+from library_management.renderers import FastJSONRenderer, orjson
+from transactions.models import Transaction
+from transactions.serializers import TransactionListSerializer
+
+
+def _payloads(rows):
+    """
+    A page of TransactionListSerializer output and the same rows as raw
+    values() dicts (native Decimal/datetime/date objects)
+    """
+    queryset = Transaction.objects.select_related('user', 'book').order_by('-id')[:rows]
+    serialized = list(TransactionListSerializer(queryset, many=True).data)
+    native = list(Transaction.objects.order_by('-id').values(
+        'id', 'user_id', 'book_id', 'borrow_date', 'due_date', 'return_date',
+        'status', 'renewal_count', 'created_at', 'updated_at', 'fines__amount',
+    )[:rows])
+    if not serialized:
+        raise CommandError('No transactions to encode; run seed_library first.')
+
+    # Repeat the available rows to reach the requested size
+    def fill(items):
+        return (items * (rows // len(items) + 1))[:rows]
+
+    return {'serializer_page': fill(serialized), 'native_values': fill(native)}
+
+
+def _time(function, repeat):
+    function()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat, result
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON encode/decode throughput of the stdlib and fast renderers on large lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed; nothing to compare against.')
+
+        report = {}
+        for name, payload in _payloads(options['rows']).items():
+            report[name] = {}
+            for backend, renderer, parser in (
+                ('stdlib', JSONRenderer(), JSONParser()),
+                ('orjson', FastJSONRenderer(), FastJSONParser()),
+            ):
+                with override_settings(FAST_JSON_BACKEND=backend):
+                    encode, body = _time(lambda: renderer.render(payload), options['repeat'])
+                    decode, _ = _time(lambda: parser.parse(io.BytesIO(body)), options['repeat'])
+                report[name][backend] = {
+                    'bytes': len(body),
+                    'encode_ms': round(encode * 1000, 3),
+                    'decode_ms': round(decode * 1000, 3),
+                    'encode_mb_per_s': round(len(body) / encode / 1e6, 1),
+                    'decode_mb_per_s': round(len(body) / decode / 1e6, 1),
+                }
+            stdlib, fast = report[name]['stdlib'], report[name]['orjson']
+            report[name]['encode_speedup'] = round(stdlib['encode_ms'] / fast['encode_ms'], 1)
+            report[name]['decode_speedup'] = round(stdlib['decode_ms'] / fast['decode_ms'], 1)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'payload':<18}{'backend':<9}{'bytes':>11}{'encode ms':>11}"
+                          f"{'MB/s':>8}{'decode ms':>11}{'MB/s':>8}")
+        for name, results in report.items():
+            for backend in ('stdlib', 'orjson'):
+                result = results[backend]
+                self.stdout.write(
+                    f"{name:<18}{backend:<9}{result['bytes']:>11}{result['encode_ms']:>11}"
+                    f"{result['encode_mb_per_s']:>8}{result['decode_ms']:>11}{result['decode_mb_per_s']:>8}"
+                )
+            self.stdout.write(
+                f"{'':<18}speedup: encode x{results['encode_speedup']}, decode x{results['decode_speedup']}"
+            )
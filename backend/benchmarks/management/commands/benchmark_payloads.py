@@ -0,0 +1,83 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from benchmarks.suite import BenchmarkContext, benchmark_environment
+from library_management.compression import available_encodings
+
+ENDPOINTS = ['/api/books/', '/api/transactions/']
+
+
+def _variants():
+    variants = [('json', 'identity'), ('msgpack', 'identity')]
+    for encoding in available_encodings():
+        variants += [('json', encoding), ('msgpack', encoding)]
+    return variants
+
+
+class Command(BaseCommand):
+    help = 'Measure payload size and latency of JSON vs MessagePack, with and without compression'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20, help='Pages fetched per endpoint and variant')
+        parser.add_argument('--bandwidth-mbps', type=float, default=10.0,
+                            help='Link speed used to model transfer time')
+        parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    def handle(self, *args, **options):
+        ctx = BenchmarkContext()
+        client = Client()
+        headers = {'Authorization': f'Bearer {ctx.tokens["librarian"]}'}
+        bytes_per_ms = options['bandwidth_mbps'] * 1e6 / 8 / 1000
+        report = {}
+
+        with benchmark_environment():
+            for endpoint in ENDPOINTS:
+                report[endpoint] = {}
+                for fmt, encoding in _variants():
+                    sizes, latencies = [], []
+                    for page in range(1, options['pages'] + 1):
+                        started = time.perf_counter()
+                        response = client.get(endpoint, {'page': page, 'format': fmt}, headers={
+                            **headers, 'Accept-Encoding': encoding,
+                        })
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        if response.status_code != 200:
+                            break
+                        sizes.append(len(response.content))
+                    if not sizes:
+                        continue
+                    size = statistics.fmean(sizes)
+                    latency = statistics.fmean(latencies)
+                    report[endpoint][f'{fmt}+{encoding}'] = {
+                        'bytes': round(size),
+                        'server_ms': round(latency, 3),
+                        'end_to_end_ms': round(latency + size / bytes_per_ms, 3),
+                    }
+
+                baseline = report[endpoint].get('json+identity')
+                for result in report[endpoint].values():
+                    if baseline:
+                        result['size_reduction'] = round(1 - result['bytes'] / baseline['bytes'], 3)
+                        result['end_to_end_reduction'] = round(
+                            1 - result['end_to_end_ms'] / baseline['end_to_end_ms'], 3
+                        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f'End-to-end = in-process latency + transfer at {options["bandwidth_mbps"]} Mbit/s')
+        for endpoint, variants in report.items():
+            self.stdout.write(f'\n{endpoint}')
+            self.stdout.write(f"{'variant':<18}{'bytes':>9}{'size -%':>9}{'server ms':>11}"
+                              f"{'e2e ms':>9}{'e2e -%':>8}")
+            for name, result in variants.items():
+                self.stdout.write(
+                    f"{name:<18}{result['bytes']:>9}{result.get('size_reduction', 0):>9.1%}"
+                    f"{result['server_ms']:>11}{result['end_to_end_ms']:>9}"
+                    f"{result.get('end_to_end_reduction', 0):>8.1%}"
+                )
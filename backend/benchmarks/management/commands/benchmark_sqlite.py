@@ -0,0 +1,128 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from library_management.db import write_atomic
+
+PROFILES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+    },
+    'production': {
+        'ENGINE': 'library_management.sqlite',
+        'WRITE_QUEUE': True,
+    },
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Measure mixed read/write throughput of the default and production SQLite profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    def run_profile(self, name, overrides, options, directory):
+        alias = f'benchmark_{name}'
+        connections.settings[alias] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(directory, f'{name}.sqlite3'),
+            'TEST': {},
+            **overrides,
+        }
+
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE counters (id INTEGER PRIMARY KEY, value INTEGER)')
+            cursor.executemany(
+                'INSERT INTO counters (id, value) VALUES (%s, 0)',
+                [(i,) for i in range(options['rows'])]
+            )
+        connections[alias].close()
+
+        deadline = time.perf_counter() + options['seconds']
+        results = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            stats = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+            connection = connections[alias]
+            while time.perf_counter() < deadline:
+                row = rng.randrange(options['rows'])
+                started = time.perf_counter()
+                try:
+                    if rng.random() < options['write_ratio']:
+                        with write_atomic(using=alias):
+                            with connection.cursor() as cursor:
+                                cursor.execute('SELECT value FROM counters WHERE id = %s', [row])
+                                cursor.execute(
+                                    'UPDATE counters SET value = value + 1 WHERE id = %s', [row]
+                                )
+                        stats['writes'] += 1
+                    else:
+                        with connection.cursor() as cursor:
+                            cursor.execute('SELECT value FROM counters WHERE id = %s', [row])
+                            cursor.fetchone()
+                        stats['reads'] += 1
+                    stats['latencies'].append(time.perf_counter() - started)
+                except OperationalError:
+                    stats['errors'] += 1
+            connection.close()
+            with lock:
+                results.append(stats)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        del connections.settings[alias]
+
+        latencies = [value for stats in results for value in stats['latencies']]
+        reads = sum(stats['reads'] for stats in results)
+        writes = sum(stats['writes'] for stats in results)
+        return {
+            'reads': reads,
+            'writes': writes,
+            'errors': sum(stats['errors'] for stats in results),
+            'ops_per_second': round((reads + writes) / options['seconds'], 1),
+            'writes_per_second': round(writes / options['seconds'], 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        }
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            report = {
+                name: self.run_profile(name, overrides, options, directory)
+                for name, overrides in PROFILES.items()
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'profile':<12}{'ops/s':>10}{'writes/s':>10}{'errors':>8}"
+                          f"{'p50 ms':>9}{'p99 ms':>9}")
+        for name, result in report.items():
+            self.stdout.write(
+                f"{name:<12}{result['ops_per_second']:>10}{result['writes_per_second']:>10}"
+                f"{result['errors']:>8}{result['p50_ms']:>9}{result['p99_ms']:>9}"
+            )
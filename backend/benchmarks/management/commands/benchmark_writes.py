@@ -0,0 +1,105 @@
+import json
+import re
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from books.models import Book
+
+SET_CLAUSE = re.compile(r'\bSET\b(.*?)\bWHERE\b', re.S | re.I)
+
+
+class Rollback(Exception):
+    pass
+
+
+def measure(operation, instances):
+    """Run operation over instances and summarize the UPDATE traffic"""
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for instance in instances:
+            operation(instance)
+        elapsed = time.perf_counter() - started
+
+    updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+    columns = sum(
+        match.group(1).count('=') for match in map(SET_CLAUSE.search, updates) if match
+    )
+    return {
+        'queries': len(ctx.captured_queries),
+        'updates': len(updates),
+        'columns_written': columns,
+        'sql_bytes': sum(len(q['sql']) for q in ctx.captured_queries),
+        'seconds': round(elapsed, 4),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare tracked (changed-columns-only) saves against full-row saves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        report = {}
+
+        try:
+            with transaction.atomic():
+                Book.objects.bulk_create([
+                    Book(title=f'Benchmark {i}', isbn=f'9{i:012d}', publisher='Bench',
+                         publication_year=2000, total_copies=3, available_copies=3)
+                    for i in range(rows)
+                ])
+                users = User.objects.bulk_create([
+                    User(username=f'benchmark-{i}', email=f'benchmark-{i}@example.com')
+                    for i in range(rows)
+                ])
+                from accounts.models import UserProfile
+                UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+
+                def books():
+                    return list(Book.objects.filter(publisher='Bench'))
+
+                def bump_rating(book):
+                    book.rating = 4
+                    return book
+
+                scenarios = {
+                    'book_noop_save': lambda book: book.save(),
+                    'book_noop_save_full_row': lambda book: book.save(force_update=True),
+                    'book_one_field': lambda book: bump_rating(book).save(),
+                    'book_one_field_full_row': lambda book: bump_rating(book).save(force_update=True),
+                }
+                for name, operation in scenarios.items():
+                    report[name] = measure(operation, books())
+
+                def login_bump(user):
+                    user.last_login = timezone.now()
+                    user.save(update_fields=['last_login'])
+
+                report['user_last_login'] = measure(
+                    login_bump,
+                    list(User.objects.filter(username__startswith='benchmark-')
+                         .select_related('profile'))
+                )
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'scenario':<26}{'queries':>9}{'updates':>9}{'columns':>9}"
+                          f"{'sql bytes':>11}{'seconds':>9}")
+        for name, result in report.items():
+            self.stdout.write(
+                f"{name:<26}{result['queries']:>9}{result['updates']:>9}"
+                f"{result['columns_written']:>9}{result['sql_bytes']:>11}{result['seconds']:>9}"
+            )
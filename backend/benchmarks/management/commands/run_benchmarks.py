@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.suite import RUNNERS, SCENARIOS, compare, run_suite
+
+
+class Command(BaseCommand):
+    help = 'Run the HTTP benchmark suite in-process against the WSGI and/or ASGI handler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Scenario to run (repeatable, default: all)')
+        parser.add_argument('--server', action='append', choices=sorted(RUNNERS),
+                            help='Handler to benchmark (repeatable, default: wsgi and asgi)')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Compare against a previous JSON report')
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help='Allowed slowdown against the baseline (0.10 = 10%%)')
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    def handle(self, *args, **options):
+        report = run_suite(
+            scenarios=options['scenario'],
+            servers=options['server'] or ['wsgi', 'asgi'],
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            seed=options['seed'],
+            log=None if options['json'] else self.stdout.write,
+        )
+
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                report['comparison'] = compare(report, json.load(handle), options['tolerance'])
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif 'comparison' in report:
+            self.stdout.write('\nAgainst baseline:')
+            for row in report['comparison']:
+                marker = self.style.ERROR('REGRESSION') if row['regression'] else ''
+                self.stdout.write(
+                    f'{row["server"]:5} {row["scenario"]:30} {row["metric"]:15} '
+                    f'{row["baseline"]:>10} -> {row["current"]:>10} ({row["change"]:+.1%}) {marker}'
+                )
+
+        regressions = [row for row in report.get('comparison', []) if row['regression']]
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} benchmark metric(s) regressed beyond tolerance.')
@@ -0,0 +1,317 @@
+"""
+Deterministic dataset generator for load tests and benchmarks.
+
+Rows are written in fixed-size batches -- bulk_create for the catalogue and
+users, executemany for the loan history -- with explicit primary keys
+(appended after the current maximum id), so a given seed and
+set of volumes always produces the same library. Dates are relative to the
+day the seed runs. Model save() hooks and signals do not fire for bulk
+inserts, so the derived data -- available copies, profile loan/fine
+counters and the user search index -- is rebuilt in one pass at the end.
+"""
+import time
+from itertools import repeat
+from datetime import datetime, time as dt_time
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.counters import rebuild_profile_counters
+from accounts.models import UserProfile
+from accounts.search import rebuild_search_index
+from books.inventory import reconcile_inventory
+from books.models import Author, Book, Category
+from stats.rollups import rebuild_library_stats
+from transactions.fine_policy import as_money, get_fine_policy
+from transactions.models import Fine, Transaction
+
+FULL_VOLUMES = {
+    'books': 1000000,
+    'users': 200000,
+    'transactions': 10000000,
+}
+
+CATEGORIES = [
+    'Fiction', 'Mystery', 'Science Fiction', 'Fantasy', 'Romance', 'Thriller', 'History',
+    'Biography', 'Science', 'Mathematics', 'Computer Science', 'Engineering', 'Medicine',
+    'Law', 'Economics', 'Philosophy', 'Psychology', 'Poetry', 'Drama', 'Art', 'Music',
+    'Travel', 'Cooking', 'Religion', 'Politics', 'Education', 'Children', 'Reference',
+]
+FIRST_NAMES = [
+    'Ada', 'Alan', 'Amara', 'Ben', 'Chen', 'Chidi', 'Dana', 'Elena', 'Farah', 'Grace', 'Hiro',
+    'Ines', 'Jonas', 'Kofi', 'Lena', 'Maya', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam',
+    'Tariq', 'Uma', 'Victor', 'Wen', 'Yara', 'Zane',
+]
+LAST_NAMES = [
+    'Adams', 'Boateng', 'Castro', 'Diallo', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito',
+    'Jensen', 'Kim', 'Lopez', 'Mensah', 'Novak', 'Okafor', 'Patel', 'Quist', 'Rossi', 'Silva',
+    'Tanaka', 'Usman', 'Varga', 'Wright', 'Xu', 'Yilmaz', 'Zhou',
+]
+TITLE_WORDS = [
+    'Silent', 'River', 'Garden', 'Empire', 'Shadow', 'Light', 'Journey', 'Storm', 'Secret',
+    'Ocean', 'Mountain', 'City', 'Winter', 'Summer', 'Forgotten', 'Last', 'First', 'Hidden',
+    'Golden', 'Broken', 'Theory', 'Principles', 'History', 'Art', 'Science', 'Modern', 'Ancient',
+    'Introduction', 'Patterns', 'Systems', 'Letters', 'Voices', 'Atlas', 'Machine', 'Dream',
+]
+PUBLISHERS = [
+    'Penguin', 'HarperCollins', 'Macmillan', 'Hachette', 'Simon & Schuster', 'Oxford Press',
+    'Cambridge Press', 'Springer', 'Wiley', "O'Reilly", 'Pearson', 'Vintage',
+]
+LANGUAGES = ['en', 'en', 'en', 'en', 'fr', 'es', 'de', 'other']
+
+LOAN_DAYS = 14
+HISTORY_DAYS = 3 * 365
+
+
+def scaled_volumes(scale=1.0, **overrides):
+    """FULL_VOLUMES multiplied by scale, with explicit per-table overrides"""
+    volumes = {name: max(int(count * scale), 1) for name, count in FULL_VOLUMES.items()}
+    volumes.update({name: count for name, count in overrides.items() if count is not None})
+    return volumes
+
+
+def _insert_sql(model):
+    """INSERT statement covering every concrete column of model"""
+    quote = connection.ops.quote_name
+    columns = [field.column for field in model._meta.concrete_fields]
+    return 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+
+
+def _timestamps(seconds):
+    """UTC epoch seconds (datetime64[s]) -> naive 'YYYY-MM-DD HH:MM:SS' strings"""
+    return np.char.replace(np.datetime_as_string(seconds, unit='s'), 'T', ' ').tolist()
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _batches(total, batch_size):
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
+
+
+class LibrarySeeder:
+    """
+    Generate categories, authors, books, users, transactions and fines
+
+    log -- optional callable receiving progress messages
+    """
+
+    def __init__(self, seed=42, batch_size=5000, password='library123', log=None):
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.password = password
+        self.log = log or (lambda message: None)
+        self.today = timezone.localdate()
+        self.timings = {}
+
+    def _phase(self, name, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        self.timings[name] = round(time.perf_counter() - started, 2)
+        self.log(f'{name}: {result} in {self.timings[name]}s')
+        return result
+
+    def seed(self, books, users, transactions, index_users=True):
+        summary = {
+            'categories': self._phase('categories', self.seed_categories),
+            'authors': self._phase('authors', self.seed_authors, max(books // 5, 1)),
+            'books': self._phase('books', self.seed_books, books),
+            'users': self._phase('users', self.seed_users, users),
+            'transactions': self._phase('transactions', self.seed_transactions, transactions),
+        }
+        summary['fines'] = self.fines_created
+        self._phase('inventory', lambda: reconcile_inventory(fix=True)['fixed_books'])
+        self._phase('profile_counters', rebuild_profile_counters)
+        self._phase('library_stats', rebuild_library_stats)
+        if index_users:
+            self._phase('search_index', rebuild_search_index)
+        return {'volumes': summary, 'seconds': self.timings}
+
+    def seed_categories(self):
+        existing = set(Category.objects.values_list('name', flat=True))
+        Category.objects.bulk_create([
+            Category(name=name, description=f'{name} titles') for name in CATEGORIES
+            if name not in existing
+        ])
+        self.category_ids = list(
+            Category.objects.filter(name__in=CATEGORIES).order_by('id').values_list('id', flat=True)
+        )
+        return len(self.category_ids)
+
+    def seed_authors(self, count):
+        self.first_author_id = first_id = _next_id(Author)
+        self.author_count = count
+        for start, size in _batches(count, self.batch_size):
+            first = self.rng.integers(len(FIRST_NAMES), size=size)
+            last = self.rng.integers(len(LAST_NAMES), size=size)
+            nationality = self.rng.integers(len(LAST_NAMES), size=size)
+            Author.objects.bulk_create([
+                Author(
+                    id=first_id + start + i,
+                    name=f'{FIRST_NAMES[first[i]]} {LAST_NAMES[last[i]]}',
+                    nationality=LAST_NAMES[nationality[i]],
+                )
+                for i in range(size)
+            ])
+        return count
+
+    def seed_books(self, count):
+        self.first_book_id = first_id = _next_id(Book)
+        self.book_count = count
+        through = Book.authors.through
+        for start, size in _batches(count, self.batch_size):
+            words = self.rng.integers(len(TITLE_WORDS), size=(size, 3))
+            publisher = self.rng.integers(len(PUBLISHERS), size=size)
+            year = self.rng.integers(1950, self.today.year + 1, size=size)
+            language = self.rng.integers(len(LANGUAGES), size=size)
+            pages = self.rng.integers(80, 900, size=size)
+            copies = self.rng.integers(1, 6, size=size)
+            category = self.rng.integers(len(self.category_ids), size=size)
+            rating = self.rng.integers(200, 501, size=size)
+            authors = (self.rng.integers(self.author_count, size=(size, 2)) + self.first_author_id).tolist()
+            coauthored = self.rng.random(size) < 0.2
+
+            with transaction.atomic():
+                Book.objects.bulk_create([
+                    Book(
+                        id=first_id + start + i,
+                        title=' '.join(TITLE_WORDS[word] for word in words[i]) + f' {start + i}',
+                        isbn=f'{first_id + start + i:013d}',
+                        category_id=self.category_ids[int(category[i])],
+                        publisher=PUBLISHERS[publisher[i]],
+                        publication_year=int(year[i]),
+                        language=LANGUAGES[language[i]],
+                        pages=int(pages[i]),
+                        total_copies=int(copies[i]),
+                        available_copies=int(copies[i]),
+                        rating=as_money(rating[i] / 100),
+                        shelf_location=f'{chr(65 + category[i] % 26)}-{start + i:07d}'[:50],
+                    )
+                    for i in range(size)
+                ])
+                links = []
+                for i in range(size):
+                    book_id = first_id + start + i
+                    first_author, second_author = authors[i]
+                    links.append(through(book_id=book_id, author_id=first_author))
+                    if coauthored[i] and second_author != first_author:
+                        links.append(through(book_id=book_id, author_id=second_author))
+                through.objects.bulk_create(links)
+        return count
+
+    def seed_users(self, count):
+        self.first_user_id = first_id = _next_id(User)
+        self.user_count = count
+        self.user_roles = np.where(self.rng.random(count) < 0.01, 'librarian', 'student')
+        password = make_password(self.password)
+        first_profile_id = _next_id(UserProfile)
+
+        for start, size in _batches(count, self.batch_size):
+            first = self.rng.integers(len(FIRST_NAMES), size=size)
+            last = self.rng.integers(len(LAST_NAMES), size=size)
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(
+                        id=first_id + start + i,
+                        username=f'user{first_id + start + i:07d}',
+                        email=f'user{first_id + start + i:07d}@library.test',
+                        first_name=FIRST_NAMES[first[i]],
+                        last_name=LAST_NAMES[last[i]],
+                        password=password,
+                    )
+                    for i in range(size)
+                ])
+                UserProfile.objects.bulk_create([
+                    UserProfile(
+                        id=first_profile_id + start + i,
+                        user_id=first_id + start + i,
+                        role=str(self.user_roles[start + i]),
+                        student_id=f'S{first_id + start + i:08d}'
+                        if self.user_roles[start + i] == 'student' else None,
+                    )
+                    for i in range(size)
+                ])
+        return count
+
+    def seed_transactions(self, count):
+        """
+        Loans spread over the last three years. Older loans are returned
+        (some late, which creates a fine); recent ones may still be out.
+
+        At 10M rows per-instance ORM overhead dominates, so loans and fines
+        are built as NumPy columns and written with executemany() on the
+        model's own table and columns instead of bulk_create().
+        """
+        first_id = _next_id(Transaction)
+        first_fine_id = _next_id(Fine)
+        policy = get_fine_policy()
+        midnight = timezone.make_aware(datetime.combine(self.today, dt_time.min))
+        midnight = np.datetime64(int(midnight.timestamp()), 's')
+        now = np.datetime64(int(timezone.now().timestamp()), 's')
+        today = np.datetime64(self.today, 'D')
+        transaction_sql = _insert_sql(Transaction)
+        fine_sql = _insert_sql(Fine)
+        self.fines_created = 0
+
+        for start, size in _batches(count, self.batch_size):
+            users = self.rng.integers(self.user_count, size=size)
+            books = self.rng.integers(self.book_count, size=size)
+            days_ago = self.rng.integers(0, HISTORY_DAYS, size=size)
+            seconds = self.rng.integers(8 * 3600, 20 * 3600, size=size)
+            kept_days = self.rng.geometric(1 / 12, size=size)
+            returned = (days_ago > LOAN_DAYS * 2) | (self.rng.random(size) < 0.5)
+            fine_status = self.rng.choice(['paid', 'pending', 'waived'], p=[0.7, 0.25, 0.05], size=size)
+            borrowed_at = np.minimum(midnight - days_ago * 86400 + seconds, now)
+            returned_at = borrowed_at + kept_days * 86400
+            returned &= returned_at <= now
+            days_late = np.where(returned, kept_days - LOAN_DAYS, 0)
+            amounts = policy.evaluate(days_late, self.user_roles[users])
+
+            due_date = today - days_ago + LOAN_DAYS
+            status = np.where(returned, 'returned', np.where(due_date < today, 'overdue', 'borrowed'))
+
+            ids = (np.arange(size) + first_id + start).tolist()
+            user_ids = (users + self.first_user_id).tolist()
+            borrowed = _timestamps(borrowed_at)
+            returned_list = [
+                value if is_returned else None
+                for value, is_returned in zip(_timestamps(returned_at), returned.tolist())
+            ]
+            updated = [value or borrowed[i] for i, value in enumerate(returned_list)]
+
+            transaction_rows = zip(
+                ids, user_ids, (books + self.first_book_id).tolist(), repeat(None), borrowed,
+                np.datetime_as_string(due_date).tolist(), returned_list, status.tolist(),
+                repeat(''), repeat(None), repeat(0), repeat(2), borrowed, updated,
+            )
+
+            fined = np.flatnonzero(amounts > 0).tolist()
+            fine_rows = []
+            for offset, i in enumerate(fined):
+                paid = fine_status[i] == 'paid'
+                fine_rows.append((
+                    first_fine_id + self.fines_created + offset, ids[i], user_ids[i],
+                    f'{amounts[i]:.2f}', f'Overdue by {days_late[i]} days', str(fine_status[i]),
+                    returned_list[i] if paid else None, 'cash' if paid else '', '', '', None,
+                    'Seeded waiver' if fine_status[i] == 'waived' else '',
+                    returned_list[i], returned_list[i],
+                ))
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(transaction_sql, list(transaction_rows))
+                if fine_rows:
+                    cursor.executemany(fine_sql, fine_rows)
+            self.fines_created += len(fine_rows)
+            if (start // self.batch_size) % 100 == 99:
+                self.log(f'  {start + size}/{count} transactions')
+        return count
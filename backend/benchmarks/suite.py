@@ -0,0 +1,329 @@
+"""
+HTTP benchmark suite.
+
+Scenarios are generators that yield (method, path, data) requests and
+receive each response back, so the same scenario drives the in-process
+WSGI handler (django.test.Client) and the ASGI handler (AsyncClient).
+Per-request SQL counts come from the Server-Timing header added by
+QueryInstrumentationMiddleware.
+
+Run it against a seeded, disposable database (see seed_library): the
+borrow/return scenario writes real loans.
+"""
+import json
+import logging
+import platform
+import random
+import re
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+
+from accounts.authentication import LibraryRefreshToken
+from accounts.models import UserProfile
+from books.models import Book
+from transactions.models import Fine
+
+from .seeding import TITLE_WORDS
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+BENCH_STUDENT = 'bench-student'
+BENCH_LIBRARIAN = 'bench-librarian'
+
+
+class BenchmarkContext:
+    """Users, tokens and sample ids shared by the scenarios"""
+
+    def __init__(self, seed=42):
+        self.random = random.Random(seed)
+        self.student = self._user(BENCH_STUDENT, role='student')
+        self.librarian = self._user(BENCH_LIBRARIAN, role='librarian', staff=True)
+        self.tokens = {
+            'student': self._access_token(self.student),
+            'librarian': self._access_token(self.librarian),
+        }
+
+        # The student with the most fines exercises my_fines realistically
+        fined = (
+            Fine.objects.order_by().values('user_id').annotate(fines=Count('id'))
+            .order_by('-fines').values_list('user_id', flat=True).first()
+        )
+        self.tokens['fined_student'] = (
+            self._access_token(User.objects.get(id=fined)) if fined else self.tokens['student']
+        )
+
+        self.book_ids = list(
+            Book.objects.filter(available_copies__gte=2).order_by('?').values_list('id', flat=True)[:1000]
+        )
+        self.book_count = Book.objects.count()
+
+    @staticmethod
+    def _user(username, role, staff=False):
+        user, _ = User.objects.get_or_create(
+            username=username,
+            defaults={'email': f'{username}@library.test', 'is_staff': staff, 'is_superuser': staff},
+        )
+        # Edit the profile cached on user (created by the post_save signal),
+        # which is the one LibraryRefreshToken.for_user() reads the role from
+        try:
+            profile = user.profile
+        except UserProfile.DoesNotExist:
+            profile = user.profile = UserProfile.objects.create(user=user)
+        profile.role = role
+        profile.max_books_allowed = 1000000
+        profile.save()
+        return user
+
+    @staticmethod
+    def _access_token(user):
+        return str(LibraryRefreshToken.for_user(user).access_token)
+
+    def search_term(self):
+        return self.random.choice(TITLE_WORDS)
+
+    def page(self, page_size=10):
+        pages = max(self.book_count // page_size, 1)
+        return self.random.randint(1, min(pages, 1000))
+
+    def book_id(self):
+        return self.random.choice(self.book_ids)
+
+
+def scenario(name, auth):
+    def register(function):
+        function.scenario_name = name
+        function.auth = auth
+        SCENARIOS[name] = function
+        return function
+    return register
+
+
+SCENARIOS = {}
+
+
+@scenario('book_search', auth='student')
+def book_search(ctx):
+    yield 'GET', f'/api/books/?search={ctx.search_term()}', None
+
+
+@scenario('book_list_page', auth='student')
+def book_list_page(ctx):
+    yield 'GET', f'/api/books/?page={ctx.page()}', None
+
+
+@scenario('borrow_return', auth='student')
+def borrow_return(ctx):
+    response = yield 'POST', '/api/transactions/borrow/', {'book_id': ctx.book_id()}
+    if response.status_code == 201:
+        transaction_id = response.json()['transaction']['id']
+        yield 'POST', f'/api/transactions/{transaction_id}/return_book/', {}
+
+
+@scenario('my_fines', auth='fined_student')
+def my_fines(ctx):
+    yield 'GET', '/api/fines/my_fines/', None
+
+
+@scenario('overdue', auth='librarian')
+def overdue(ctx):
+    yield 'GET', '/api/transactions/overdue/', None
+
+
+@scenario('admin_transaction_changelist', auth='admin')
+def admin_transaction_changelist(ctx):
+    yield 'GET', '/admin/transactions/transaction/', None
+
+
+@scenario('admin_book_changelist', auth='admin')
+def admin_book_changelist(ctx):
+    yield 'GET', '/admin/books/book/', None
+
+
+def _request_kwargs(ctx, auth, data):
+    kwargs = {}
+    if auth != 'admin':
+        kwargs['headers'] = {'Authorization': f'Bearer {ctx.tokens[auth]}'}
+    if data is not None:
+        kwargs['data'] = json.dumps(data)
+        kwargs['content_type'] = 'application/json'
+    return kwargs
+
+
+class _Sample:
+    def __init__(self):
+        self.seconds = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.db_ms = 0.0
+
+    def record(self, response, elapsed):
+        self.seconds += elapsed
+        self.requests += 1
+        if response.status_code >= 400:
+            self.errors += 1
+        match = SERVER_TIMING_DB.search(response.get('Server-Timing', ''))
+        if match:
+            self.db_ms += float(match.group(1))
+            self.queries += int(match.group(2))
+
+
+def run_wsgi(ctx, function, iterations):
+    client = Client()
+    if function.auth == 'admin':
+        client.force_login(ctx.librarian)
+    samples = []
+    for _ in range(iterations):
+        sample = _Sample()
+        steps = function(ctx)
+        response = None
+        try:
+            while True:
+                method, path, data = steps.send(response)
+                started = time.perf_counter()
+                response = client.generic(method, path, **_request_kwargs(ctx, function.auth, data))
+                sample.record(response, time.perf_counter() - started)
+        except StopIteration:
+            pass
+        samples.append(sample)
+    return samples
+
+
+def run_asgi(ctx, function, iterations):
+    client = AsyncClient()
+    if function.auth == 'admin':
+        client.force_login(ctx.librarian)
+    # Scenarios only read data preloaded on ctx, so they can run on the event loop
+    async def run():
+        samples = []
+        for _ in range(iterations):
+            sample = _Sample()
+            steps = function(ctx)
+            response = None
+            try:
+                while True:
+                    method, path, data = steps.send(response)
+                    started = time.perf_counter()
+                    response = await client.generic(method, path, **_request_kwargs(ctx, function.auth, data))
+                    sample.record(response, time.perf_counter() - started)
+            except StopIteration:
+                pass
+            samples.append(sample)
+        return samples
+    return async_to_sync(run)()
+
+
+RUNNERS = {'wsgi': run_wsgi, 'asgi': run_asgi}
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples):
+    latencies = [sample.seconds * 1000 for sample in samples]
+    total = sum(sample.seconds for sample in samples)
+    requests = sum(sample.requests for sample in samples)
+    return {
+        'iterations': len(samples),
+        'requests': requests,
+        'errors': sum(sample.errors for sample in samples),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'max_ms': round(max(latencies), 3),
+        'ops_per_sec': round(len(samples) / total, 1) if total else None,
+        'queries_per_op': round(sum(sample.queries for sample in samples) / len(samples), 2),
+        'db_ms_per_op': round(sum(sample.db_ms for sample in samples) / len(samples), 3),
+    }
+
+
+@contextmanager
+def benchmark_environment():
+    """
+    Accept the in-process clients' Host: testserver and silence per-request
+    query logs, which would drown the results
+    """
+    query_logger = logging.getLogger('library_management.queries')
+    disabled, query_logger.disabled = query_logger.disabled, True
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            yield
+    finally:
+        query_logger.disabled = disabled
+
+
+def run_suite(scenarios=None, servers=('wsgi',), iterations=50, warmup=5, seed=42, log=None):
+    """Run the selected scenarios on each server and return the JSON-able report"""
+    log = log or (lambda message: None)
+    ctx = BenchmarkContext(seed=seed)
+    names = scenarios or list(SCENARIOS)
+
+    results = {}
+    with benchmark_environment():
+        for server in servers:
+            runner = RUNNERS[server]
+            results[server] = {}
+            for name in names:
+                function = SCENARIOS[name]
+                runner(ctx, function, warmup)
+                result = results[server][name] = summarize(runner(ctx, function, iterations))
+                log(f'{server:5} {name:30} p50 {result["p50_ms"]:>9.2f} ms  '
+                    f'p95 {result["p95_ms"]:>9.2f} ms  {result["queries_per_op"]:>6} queries  '
+                    f'{result["errors"]} errors')
+
+    return {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'books': ctx.book_count,
+            'iterations': iterations,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=0.10):
+    """
+    Compare p50/p95 against a baseline report
+
+    Returns [{'server', 'scenario', 'metric', 'baseline', 'current',
+    'change', 'regression'}]; a regression is a slowdown beyond tolerance.
+    """
+    rows = []
+    for server, scenarios in report['results'].items():
+        for name, current in scenarios.items():
+            previous = baseline.get('results', {}).get(server, {}).get(name)
+            if not previous:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'queries_per_op'):
+                before, after = previous.get(metric), current[metric]
+                if not before:
+                    continue
+                change = (after - before) / before
+                rows.append({
+                    'server': server,
+                    'scenario': name,
+                    'metric': metric,
+                    'baseline': before,
+                    'current': after,
+                    'change': round(change, 4),
+                    'regression': change > tolerance,
+                })
+    return rows
@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.db.models import F
+from django.utils import timezone
+from stats.rollups import rebuild_book_totals
 from .models import Book, Category, Author
 
 
@@ -77,6 +80,13 @@ class BookAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_readonly_fields(self, request, obj=None):
+        readonly = super().get_readonly_fields(request, obj)
+        if obj is not None and obj.branch_availability.exists():
+            # Summed from the branch holdings by refresh_branch_index
+            readonly = (*readonly, 'total_copies', 'available_copies')
+        return readonly
+
     def display_authors(self, obj):
         """Display comma-separated list of authors"""
         return obj.author_names
@@ -94,22 +104,26 @@ class BookAdmin(admin.ModelAdmin):
 
     def mark_as_active(self, request, queryset):
         """Mark selected books as active"""
-        updated = queryset.update(is_active=True)
+        updated = queryset.update(is_active=True, updated_at=timezone.now())
+        rebuild_book_totals()
         self.message_user(request, f'{updated} book(s) marked as active.')
     mark_as_active.short_description = 'Mark selected books as active'
 
     def mark_as_inactive(self, request, queryset):
         """Mark selected books as inactive"""
-        updated = queryset.update(is_active=False)
+        updated = queryset.update(is_active=False, updated_at=timezone.now())
+        rebuild_book_totals()
         self.message_user(request, f'{updated} book(s) marked as inactive.')
     mark_as_inactive.short_description = 'Mark selected books as inactive'
 
     def reset_availability(self, request, queryset):
-        """Reset available copies to total copies"""
-        for book in queryset:
-            book.available_copies = book.total_copies
-            book.save()
-        self.message_user(request, f'{queryset.count()} book(s) availability reset.')
+        """Reset available copies to total copies (books lent by branches are skipped)"""
+        updated = queryset.filter(branch_availability__isnull=True).update(
+            available_copies=F('total_copies'),
+            updated_at=timezone.now()
+        )
+        rebuild_book_totals()
+        self.message_user(request, f'{updated} book(s) availability reset.')
     reset_availability.short_description = 'Reset availability to total copies'
 
 
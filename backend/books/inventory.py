@@ -0,0 +1,126 @@
+"""
+Inventory of Book.available_copies.
+
+available_copies is adjusted incrementally by borrows, returns, admin
+actions and manual edits. Borrows and returns go through lend_copy() and
+return_copy(), guarded F() updates that stay correct however many of them
+run at once. The reconciler recomputes the column from the source of
+truth -- total_copies minus active loans -- and reports (or fixes) drift.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from stats.rollups import adjust_library_totals, rebuild_book_totals
+
+from .models import Book
+
+ACTIVE_LOAN_STATUSES = ['borrowed', 'overdue']
+
+
+def lend_copy(book_id):
+    """Take one copy of an active book; False when none is available"""
+    if not Book.objects.filter(id=book_id, is_active=True, available_copies__gt=0).update(
+        available_copies=F('available_copies') - 1, updated_at=timezone.now()
+    ):
+        return False
+    adjust_library_totals(available_copies=-1)
+    return True
+
+
+def return_copy(book_id):
+    """Put one copy back, never above total_copies; returns whether it was added"""
+    if not Book.objects.filter(id=book_id, available_copies__lt=F('total_copies')).update(
+        available_copies=F('available_copies') + 1, updated_at=timezone.now()
+    ):
+        return False
+    if Book.objects.filter(id=book_id, is_active=True).exists():
+        adjust_library_totals(available_copies=1)
+    return True
+
+
+def active_loans_by_book():
+    """Map book_id -> active loan count with one grouped aggregate"""
+    from transactions.models import Transaction
+
+    return dict(
+        Transaction.objects.filter(status__in=ACTIVE_LOAN_STATUSES)
+        .order_by()
+        .values_list('book_id')
+        .annotate(loans=Count('id'))
+    )
+
+
+def expected_available_copies():
+    """total_copies minus the book's active loans (at least 0), evaluated in the UPDATE"""
+    from transactions.models import Transaction
+
+    loans = Subquery(
+        Transaction.objects.filter(book=OuterRef('pk'), status__in=ACTIVE_LOAN_STATUSES)
+        .order_by().values('book').annotate(loans=Count('id')).values('loans')
+    )
+    return Greatest(F('total_copies') - Coalesce(loans, Value(0)), Value(0))
+
+
+def reconcile_inventory(fix=False, chunk_size=5000, sample_size=50):
+    """
+    Compare available_copies against total_copies minus active loans
+
+    Books are scanned in primary-key chunks. With fix=True each chunk's
+    drifted rows are corrected with a single UPDATE that recounts their
+    loans itself, so borrows and returns committed since the scan are not
+    overwritten.
+    """
+    loans = active_loans_by_book()
+    report = {
+        'books_checked': 0,
+        'drifted_books': 0,
+        'overloaned_books': 0,
+        'total_drift': 0,
+        'fixed_books': 0,
+        'drift': [],
+    }
+
+    last_id = 0
+    while True:
+        chunk = list(
+            Book.objects.filter(id__gt=last_id).order_by('id').values_list(
+                'id', 'total_copies', 'available_copies'
+            )[:chunk_size]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        report['books_checked'] += len(chunk)
+
+        corrections = []
+        for book_id, total, available in chunk:
+            active = loans.get(book_id, 0)
+            expected = max(total - active, 0)
+            if active > total:
+                report['overloaned_books'] += 1
+            if available != expected:
+                corrections.append(book_id)
+                report['drifted_books'] += 1
+                report['total_drift'] += available - expected
+                if len(report['drift']) < sample_size:
+                    report['drift'].append({
+                        'book_id': book_id,
+                        'total_copies': total,
+                        'active_loans': active,
+                        'available_copies': available,
+                        'expected_available': expected,
+                    })
+
+        if fix and corrections:
+            report['fixed_books'] += Book.objects.filter(id__in=corrections).update(
+                available_copies=expected_available_copies(),
+                updated_at=timezone.now()
+            )
+
+        if len(chunk) < chunk_size:
+            break
+
+    if report['fixed_books']:
+        rebuild_book_totals()
+    return report
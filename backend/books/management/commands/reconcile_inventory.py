@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from books.inventory import reconcile_inventory
+
+
+class Command(BaseCommand):
+    help = 'Recompute available copies from active loans and report or fix drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Correct drifted books')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    def handle(self, *args, **options):
+        report = reconcile_inventory(fix=options['fix'], chunk_size=options['chunk_size'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for entry in report['drift']:
+            self.stdout.write(
+                f"Book {entry['book_id']}: available {entry['available_copies']}, "
+                f"expected {entry['expected_available']} "
+                f"({entry['total_copies']} total, {entry['active_loans']} on loan)"
+            )
+
+        self.stdout.write(f"Books checked:    {report['books_checked']}")
+        self.stdout.write(f"Drifted books:    {report['drifted_books']}")
+        self.stdout.write(f"Over-loaned:      {report['overloaned_books']}")
+        self.stdout.write(f"Net drift:        {report['total_drift']}")
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"{report['fixed_books']} book(s) fixed."))
+        elif report['drifted_books']:
+            self.stdout.write(self.style.WARNING('Run with --fix to correct drift.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Inventory is consistent.'))
@@ -1,7 +1,12 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from changes.feed import record_deletion
+from library_management.tracking import TrackChangesMixin
+from stats.rollups import adjust_library_totals, book_contribution
 
-class Category(models.Model):
+class Category(TrackChangesMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -16,7 +21,7 @@ class Category(models.Model):
         return self.name
 
 
-class Author(models.Model):
+class Author(TrackChangesMixin, models.Model):
     name = models.CharField(max_length=200)
     biography = models.TextField(blank=True)
     birth_date = models.DateField(null=True, blank=True)
@@ -33,7 +38,7 @@ class Author(models.Model):
         return self.name
 
 
-class Book(models.Model):
+class Book(TrackChangesMixin, models.Model):
     LANGUAGE_CHOICES = (
         ('en', 'English'),
         ('fr', 'French'),
@@ -92,6 +97,7 @@ class Book(models.Model):
         indexes = [
             models.Index(fields=['isbn']),
             models.Index(fields=['title']),
+            models.Index(fields=['updated_at']),  # change feed (see changes.feed)
         ]
 
     def __str__(self):
@@ -113,4 +119,26 @@ class Book(models.Model):
         # Ensure available copies doesn't exceed total copies
         if self.available_copies > self.total_copies:
             self.available_copies = self.total_copies
-        super().save(*args, **kwargs)
\ No newline at end of file
+
+        old = (0, 0, 0) if self._state.adding else book_contribution(
+            self.get_loaded_value('is_active'),
+            self.get_loaded_value('total_copies'),
+            self.get_loaded_value('available_copies'),
+        )
+        super().save(*args, **kwargs)
+
+        new = book_contribution(self.is_active, self.total_copies, self.available_copies)
+        adjust_library_totals(
+            total_books=new[0] - old[0],
+            total_copies=new[1] - old[1],
+            available_copies=new[2] - old[2],
+        )
+
+
+@receiver(post_delete, sender=Book)
+def release_book_totals(sender, instance, **kwargs):
+    books, copies, available = book_contribution(
+        instance.is_active, instance.total_copies, instance.available_copies
+    )
+    adjust_library_totals(total_books=-books, total_copies=-copies, available_copies=-available)
+    record_deletion(instance)
\ No newline at end of file
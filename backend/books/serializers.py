@@ -12,8 +12,9 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
     def get_book_count(self, obj):
-        """Get number of books in this category"""
-        return obj.books.count()
+        """Get number of books in this category (annotated by the viewset)"""
+        count = getattr(obj, 'book_count', None)
+        return obj.books.count() if count is None else count
 
 
 class AuthorSerializer(serializers.ModelSerializer):
@@ -29,8 +30,9 @@ class AuthorSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
     def get_book_count(self, obj):
-        """Get number of books by this author"""
-        return obj.books.count()
+        """Get number of books by this author (annotated by the viewset)"""
+        count = getattr(obj, 'book_count', None)
+        return obj.books.count() if count is None else count
 
 
 class AuthorSimpleSerializer(serializers.ModelSerializer):
@@ -132,6 +134,18 @@ class BookCreateUpdateSerializer(serializers.ModelSerializer):
                 "available_copies": "Available copies cannot exceed total copies."
             })
 
+        # Branch-held books take their counts from the branches (see branches.inventory)
+        if self.instance is not None:
+            from branches.inventory import is_branch_held
+
+            changed = [field for field in ('total_copies', 'available_copies')
+                       if field in attrs and attrs[field] != getattr(self.instance, field)]
+            if changed and is_branch_held(self.instance.id):
+                raise serializers.ValidationError({
+                    field: "This book's copies are held by branches; change its branch holdings instead."
+                    for field in changed
+                })
+
         return attrs
 
     def create(self, validated_data):
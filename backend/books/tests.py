@@ -1,3 +1,53 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from library_management.testing import QueryBudgetMixin
+from transactions.models import Transaction
+from .inventory import reconcile_inventory
+from .models import Author, Book, Category
+
+
+class ReconcileInventoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.book = Book.objects.create(
+            title='Book', isbn='9780000000001', publisher='P', publication_year=2000,
+            total_copies=3, available_copies=3
+        )
+
+    def test_fix_sets_total_minus_active_loans(self):
+        Transaction.objects.create(user=self.user, book=self.book)
+        report = reconcile_inventory(fix=True)
+        self.assertEqual((report['drifted_books'], report['fixed_books']), (1, 1))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+
+    def test_fix_counts_loans_made_after_the_scan(self):
+        # The scan saw no loans; a borrow committed before the correcting UPDATE
+        Book.objects.filter(id=self.book.id).update(available_copies=1)
+        Transaction.objects.create(user=self.user, book=self.book)
+        with mock.patch('books.inventory.active_loans_by_book', return_value={}):
+            reconcile_inventory(fix=True)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+
+
+@override_settings(COALESCED_RESPONSES={'ENABLED': False})
+class BookQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Fiction')
+        for number in range(10):
+            book = Book.objects.create(
+                title=f'Book {number}', isbn=f'97800000001{number:02d}', publisher='P',
+                publication_year=2000, category=category
+            )
+            book.authors.add(Author.objects.create(name=f'Author {number}'))
+        self.client.force_authenticate(User.objects.create_user('stu', 'stu@example.com', 'pw'))
+
+    def test_book_list(self):
+        with self.assertQueryBudget(3, max_repeats=1):
+            response = self.client.get('/api/books/')
+        self.assertEqual(response.status_code, 200)
@@ -1,8 +1,12 @@
 from rest_framework import viewsets, filters, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
+from django.db.models import Count, Q
+from library_management.coalescing import coalesced
+from changes.views import ChangeFeedMixin
 from .models import Book, Category, Author
+from .inventory import reconcile_inventory
+from transactions.views import IsLibrarian
 from .serializers import (
     BookListSerializer, BookDetailSerializer, BookCreateUpdateSerializer,
     CategorySerializer, AuthorSerializer
@@ -31,7 +35,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Category CRUD operations
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.annotate(book_count=Count('books'))
     serializer_class = CategorySerializer
     permission_classes = [IsLibrarianOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -39,12 +43,16 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
+    @coalesced('categories.list')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class AuthorViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Author CRUD operations
     """
-    queryset = Author.objects.all()
+    queryset = Author.objects.annotate(book_count=Count('books'))
     serializer_class = AuthorSerializer
     permission_classes = [IsLibrarianOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -52,12 +60,17 @@ class AuthorViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'birth_date', 'created_at']
     ordering = ['name']
 
+    @coalesced('authors.list')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     """
     ViewSet for Book CRUD operations
     """
     queryset = Book.objects.select_related('category').prefetch_related('authors').filter(is_active=True)
+    change_feed_serializer_class = BookListSerializer
     permission_classes = [IsLibrarianOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'isbn', 'authors__name', 'publisher', 'description']
@@ -93,9 +106,16 @@ class BookViewSet(viewsets.ModelViewSet):
         if language:
             queryset = queryset.filter(language=language)
 
-        # Filter by availability
+        # Filter by availability, at one branch (merged branch index) or overall
         available_only = self.request.query_params.get('available_only', None)
-        if available_only and available_only.lower() == 'true':
+        available_only = bool(available_only) and available_only.lower() == 'true'
+        branch = self.request.query_params.get('branch', None)
+        if branch:
+            stock = {'branch_availability__branch__code': branch}
+            if available_only:
+                stock['branch_availability__available_copies__gt'] = 0
+            queryset = queryset.filter(**stock)
+        elif available_only:
             queryset = queryset.filter(available_copies__gt=0)
 
         # Filter by minimum rating
@@ -113,7 +133,19 @@ class BookViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def get_change_feed_queryset(self):
+        """Every book, so deactivations reach the clients as deletions"""
+        return Book.objects.select_related('category').prefetch_related('authors')
+
+    def is_removed_change(self, obj):
+        return not obj.is_active
+
+    @coalesced('books.list')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'])
+    @coalesced('books.available')
     def available(self, request):
         """
         Get only available books
@@ -130,6 +162,7 @@ class BookViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @coalesced('books.recent')
     def recent(self, request):
         """
         Get recently added books
@@ -140,6 +173,7 @@ class BookViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @coalesced('books.popular')
     def popular(self, request):
         """
         Get popular books (highest rated)
@@ -158,10 +192,39 @@ class BookViewSet(viewsets.ModelViewSet):
         GET /api/books/{id}/check_availability/
         """
         book = self.get_object()
+        branches = [
+            {
+                'branch': code,
+                'name': name,
+                'available_copies': available,
+                'total_copies': total,
+                'shelf_location': shelf,
+            }
+            for code, name, available, total, shelf in book.branch_availability.order_by(
+                'branch__name'
+            ).values_list(
+                'branch__code', 'branch__name', 'available_copies', 'total_copies', 'shelf_location'
+            )
+        ]
+        available, total = book.available_copies, book.total_copies
+        if branches:
+            # The branch index is current; the book's own sums are refreshed periodically
+            available = sum(branch['available_copies'] for branch in branches)
+            total = sum(branch['total_copies'] for branch in branches)
         return Response({
             'book_id': book.id,
             'title': book.title,
-            'is_available': book.is_available,
-            'available_copies': book.available_copies,
-            'total_copies': book.total_copies
-        })
\ No newline at end of file
+            'is_available': available > 0,
+            'available_copies': available,
+            'total_copies': total,
+            'branches': branches
+        })
+
+    @action(detail=False, methods=['get', 'post'], permission_classes=[IsLibrarian])
+    def reconcile_inventory(self, request):
+        """
+        Report available_copies drift; POST also fixes it (librarian only)
+        GET/POST /api/books/reconcile_inventory/
+        """
+        report = reconcile_inventory(fix=request.method == 'POST')
+        return Response(report)
@@ -0,0 +1,43 @@
+from django.contrib import admin, messages
+from .inventory import branch_in_use, delete_branch
+from .models import Branch, BranchAvailability
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    """Admin interface for Branch model"""
+    list_display = ('code', 'name', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('code', 'name')
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and branch_in_use(obj):
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def delete_model(self, request, obj):
+        delete_branch(obj)
+
+    def delete_queryset(self, request, queryset):
+        """Delete the selected branches that have no copies or loans"""
+        for branch in queryset:
+            reason = branch_in_use(branch)
+            if reason:
+                self.message_user(request, reason, messages.WARNING)
+            else:
+                delete_branch(branch)
+
+
+@admin.register(BranchAvailability)
+class BranchAvailabilityAdmin(admin.ModelAdmin):
+    """Read-only view of the merged branch index (stock is set through the API)"""
+    list_display = ('book', 'branch', 'available_copies', 'total_copies', 'shelf_location', 'updated_at')
+    list_filter = ('branch',)
+    list_select_related = ('book', 'branch')
+    search_fields = ('book__title', 'book__isbn')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,255 @@
+"""
+Branch inventory: per-branch copy counts and the merged catalogue index.
+
+A branch's BranchHolding rows (in its partition, see branches.partitions)
+are the source of truth for what it can lend. Borrows take a copy with a
+guarded F() update in that partition, so branches never contend on a
+shared row; the loan itself is then recorded in the primary. The two
+databases do not commit together: a borrow gives its copy back if the
+loan cannot be recorded, and a return restocks the branch once the loan
+is committed. reconcile_branch_holdings() repairs any remaining drift.
+
+BranchAvailability mirrors every branch's holdings in the primary for
+catalogue search and is synced after each borrow/return. Book.total_copies
+and available_copies of branch-held books become the sums over branches;
+they are refreshed by refresh_branch_index() (scheduled every minute)
+rather than on every loan, which would make all branches update one row.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from library_management.db import write_atomic
+from stats.rollups import rebuild_book_totals
+
+from .models import Branch, BranchAvailability, BranchHolding
+from .partitions import branch_database
+
+ACTIVE_LOAN_STATUSES = ['borrowed', 'overdue']
+
+
+class BranchInUse(ValueError):
+    pass
+
+
+def holdings(code):
+    """BranchHolding queryset for a branch, on its partition"""
+    return BranchHolding.objects.using(branch_database(code)).filter(branch_code=code)
+
+
+def is_branch_held(book_id):
+    """Whether a book is lent through branches (it has merged index rows)"""
+    return BranchAvailability.objects.filter(book_id=book_id).exists()
+
+
+def take_copy(branch, book_id):
+    """Lend one copy from a branch; False when none is available there"""
+    return bool(
+        holdings(branch.code).filter(book_id=book_id, available_copies__gt=0).update(
+            available_copies=F('available_copies') - 1, updated_at=timezone.now()
+        )
+    )
+
+
+def restock(branch, book_counts):
+    """Return copies (book_id -> count) to a branch, clamped to its total"""
+    by_increment = defaultdict(list)
+    for book_id, count in book_counts.items():
+        by_increment[count].append(book_id)
+
+    updated = 0
+    now = timezone.now()
+    for increment, book_ids in by_increment.items():
+        updated += holdings(branch.code).filter(book_id__in=book_ids).update(
+            available_copies=Least(F('available_copies') + increment, F('total_copies')),
+            updated_at=now
+        )
+    return updated
+
+
+def restock_on_commit(branch, book_counts):
+    """Restock a branch once the primary's current transaction commits"""
+    book_counts = dict(book_counts)
+
+    def apply():
+        restock(branch, book_counts)
+        sync_branch_index(branch, book_counts)
+
+    transaction.on_commit(apply)
+
+
+def set_holding(branch, book_id, total_copies, shelf_location=None):
+    """
+    Create or resize a branch's holding of a book
+
+    Copies on loan stay on loan: available_copies moves by the change in
+    total_copies (never below zero).
+    """
+    using = branch_database(branch.code)
+    with write_atomic(using=using):
+        holding = holdings(branch.code).filter(book_id=book_id).first()
+        if holding is None:
+            holding = BranchHolding(
+                branch_code=branch.code, book_id=book_id, available_copies=total_copies
+            )
+        else:
+            holding.available_copies = max(
+                holding.available_copies + total_copies - holding.total_copies, 0
+            )
+        holding.total_copies = total_copies
+        if shelf_location is not None:
+            holding.shelf_location = shelf_location
+        holding.save(using=using)
+
+    sync_branch_index(branch, [book_id])
+    refresh_catalog_totals([book_id])
+    return holding
+
+
+def sync_branch_index(branch, book_ids=None):
+    """
+    Copy a branch's holdings into the merged index
+
+    With book_ids only those rows are synced; without, the branch's index
+    is rewritten and rows for holdings that no longer exist are dropped.
+    """
+    from books.models import Book
+
+    rows = holdings(branch.code)
+    if book_ids is not None:
+        rows = rows.filter(book_id__in=list(book_ids))
+    rows = list(rows.values_list('book_id', 'total_copies', 'available_copies', 'shelf_location'))
+    if book_ids is None:
+        # Holdings can outlive their book (no constraint across databases)
+        existing = set(Book.objects.filter(id__in=[row[0] for row in rows]).values_list('id', flat=True))
+        rows = [row for row in rows if row[0] in existing]
+
+    with transaction.atomic():
+        BranchAvailability.objects.bulk_create(
+            [
+                BranchAvailability(
+                    branch=branch, book_id=book_id, total_copies=total,
+                    available_copies=available, shelf_location=shelf
+                )
+                for book_id, total, available, shelf in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['branch', 'book'],
+            update_fields=['total_copies', 'available_copies', 'shelf_location', 'updated_at'],
+            batch_size=500,
+        )
+        if book_ids is None:
+            BranchAvailability.objects.filter(branch=branch).exclude(
+                book_id__in=[row[0] for row in rows]
+            ).delete()
+    return len(rows)
+
+
+def refresh_catalog_totals(book_ids=None, chunk_size=500):
+    """
+    Set each branch-held book's copy counts to the sums over branches
+
+    Returns the number of books whose counts changed.
+    """
+    from books.models import Book
+
+    sums = BranchAvailability.objects.order_by().values_list('book_id').annotate(
+        total=Sum('total_copies'), available=Sum('available_copies')
+    )
+    if book_ids is not None:
+        sums = sums.filter(book_id__in=list(book_ids))
+    sums = {book_id: (total, available) for book_id, total, available in sums}
+
+    current = Book.objects.filter(id__in=list(sums)).values_list('id', 'total_copies', 'available_copies')
+    changed = {book_id: sums[book_id] for book_id, total, available in current
+               if (total, available) != sums[book_id]}
+
+    updated = 0
+    ids = list(changed)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        updated += Book.objects.filter(id__in=chunk).update(
+            total_copies=Case(
+                *[When(id=book_id, then=Value(changed[book_id][0])) for book_id in chunk],
+                output_field=IntegerField()
+            ),
+            available_copies=Case(
+                *[When(id=book_id, then=Value(changed[book_id][1])) for book_id in chunk],
+                output_field=IntegerField()
+            ),
+            updated_at=timezone.now()
+        )
+    if updated:
+        rebuild_book_totals()
+    return updated
+
+
+def refresh_branch_index(codes=None):
+    """Rebuild the merged index from every (or the given) branch, then the book sums"""
+    branches = Branch.objects.all()
+    if codes:
+        branches = branches.filter(code__in=codes)
+    synced = {branch.code: sync_branch_index(branch) for branch in branches}
+    return {'holdings': synced, 'books_updated': refresh_catalog_totals()}
+
+
+def reconcile_branch_holdings(branch, fix=False):
+    """
+    Compare a branch's available copies with its total minus active loans
+
+    Loans are counted from the primary by (branch, status). With fix=True
+    drifted holdings are corrected and the index re-synced. Returns
+    {book_id: (available, expected)} for the drifted holdings.
+    """
+    from transactions.models import Transaction
+
+    loans = dict(
+        Transaction.objects.filter(branch=branch, status__in=ACTIVE_LOAN_STATUSES)
+        .order_by().values_list('book_id').annotate(loans=Count('id'))
+    )
+    drift = {}
+    for book_id, total, available in holdings(branch.code).values_list(
+        'book_id', 'total_copies', 'available_copies'
+    ):
+        expected = max(total - loans.get(book_id, 0), 0)
+        if available != expected:
+            drift[book_id] = (available, expected)
+
+    if fix and drift:
+        holdings(branch.code).filter(book_id__in=list(drift)).update(
+            available_copies=Case(
+                *[When(book_id=book_id, then=Value(expected)) for book_id, (_, expected) in drift.items()],
+                output_field=IntegerField()
+            ),
+            updated_at=timezone.now()
+        )
+        sync_branch_index(branch, drift)
+    return drift
+
+
+def branch_in_use(branch):
+    """Why a branch cannot be deleted, or None"""
+    from transactions.models import Transaction
+
+    if holdings(branch.code).filter(total_copies__gt=0).exists():
+        return f'{branch.name} still holds copies; set its holdings to 0 first'
+    if Transaction.objects.filter(branch=branch).exists():
+        return f'{branch.name} has loans on record; deactivate it instead'
+    return None
+
+
+def delete_branch(branch):
+    """
+    Delete a branch with its (empty) holdings in its partition
+
+    The partition has no foreign keys to cascade along, so its rows are
+    removed here; raises BranchInUse while the branch has copies or loans.
+    """
+    reason = branch_in_use(branch)
+    if reason:
+        raise BranchInUse(reason)
+    holdings(branch.code).delete()
+    branch.delete()
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from branches.inventory import reconcile_branch_holdings, refresh_branch_index
+from branches.models import Branch
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the merged branch index (optionally reconciling branch holdings with open loans first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('branches', nargs='*', help='Branch codes (default: every branch)')
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Correct available copies from total copies minus active loans')
+
+    def handle(self, *args, **options):
+        codes = options['branches']
+        unknown = set(codes) - set(Branch.objects.filter(code__in=codes).values_list('code', flat=True))
+        if unknown:
+            raise CommandError(f'Unknown branch(es): {", ".join(sorted(unknown))}')
+
+        if options['reconcile']:
+            branches = Branch.objects.filter(code__in=codes) if codes else Branch.objects.all()
+            for branch in branches:
+                drift = reconcile_branch_holdings(branch, fix=True)
+                self.stdout.write(f'{branch.code}: corrected {len(drift)} holding(s)')
+
+        result = refresh_branch_index(codes or None)
+        synced = sum(result['holdings'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {synced} holding(s) across {len(result["holdings"])} branch(es); '
+            f'{result["books_updated"]} book(s) updated.'
+        ))
@@ -0,0 +1,73 @@
+from django.db import models
+
+
+class Branch(models.Model):
+    """A campus branch that holds and lends its own copies"""
+    code = models.SlugField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    address = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'branches'
+        verbose_name = 'Branch'
+        verbose_name_plural = 'Branches'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+
+class BranchHolding(models.Model):
+    """
+    A branch's copies of one book (the branch's source of truth)
+
+    Stored in the branch's database partition (see branches.partitions), so
+    the columns reference the branch and book without database constraints.
+    """
+    branch_code = models.SlugField(max_length=20)
+    book = models.ForeignKey(
+        'books.Book', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    total_copies = models.IntegerField(default=0)
+    available_copies = models.IntegerField(default=0)
+    shelf_location = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'branch_holdings'
+        constraints = [
+            models.UniqueConstraint(fields=['branch_code', 'book'], name='branch_holdings_unique_book'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch_code}: book {self.book_id} ({self.available_copies}/{self.total_copies})"
+
+
+class BranchAvailability(models.Model):
+    """
+    Merged read index of every branch's holdings, in the primary database
+
+    Serves catalogue search across branches; rows are synced from the
+    partitions after each borrow/return and rebuilt by refresh_branch_index().
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='availability')
+    book = models.ForeignKey('books.Book', on_delete=models.CASCADE, related_name='branch_availability')
+    total_copies = models.IntegerField(default=0)
+    available_copies = models.IntegerField(default=0)
+    shelf_location = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'branch_availability'
+        verbose_name_plural = 'Branch availability'
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'book'], name='branch_availability_unique_book'),
+        ]
+        indexes = [
+            models.Index(fields=['book', 'available_copies']),
+        ]
+
+    def __str__(self):
+        return f"{self.branch_id}: {self.book_id} ({self.available_copies}/{self.total_copies})"
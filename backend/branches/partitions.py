@@ -0,0 +1,76 @@
+"""
+Branch database partitions.
+
+settings.BRANCH_DATABASES maps a branch code to the database alias that
+holds that branch's inventory (BranchHolding rows); branches without an
+entry keep theirs in 'default'. Each partition is a separate SQLite file
+with its own write lock, so borrows at one branch never wait for another
+branch's stock updates.
+
+Everything else (catalogue, users, loans, fines) stays in the primary:
+loans join users and books, so they carry a branch column instead and are
+scoped with the (branch, status) index.
+"""
+from django.conf import settings
+
+PRIMARY = 'default'
+BRANCH_LOCAL_MODELS = {'branches.branchholding'}
+
+
+def branch_databases():
+    return dict(getattr(settings, 'BRANCH_DATABASES', {}))
+
+
+def branch_database(code):
+    """Database alias holding a branch's inventory"""
+    return branch_databases().get(code, PRIMARY)
+
+
+def partitions():
+    """{alias: [branch codes]} for every database holding branch inventory"""
+    grouped = {}
+    for code, alias in branch_databases().items():
+        grouped.setdefault(alias, []).append(code)
+    return grouped
+
+
+def is_branch_local(model):
+    """Whether a model (or instance) lives on the branch partitions"""
+    return model._meta.label_lower in BRANCH_LOCAL_MODELS
+
+
+class BranchRouter:
+    """
+    Pins branch-local rows to their branch's partition
+
+    Listed before ReplicaRouter. Queries on branch-local models name their
+    partition with .using(branch_database(code)); saves and deletes of loaded
+    rows are routed by the row's branch_code.
+    """
+
+    def _partition(self, model, hints):
+        if not is_branch_local(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and getattr(instance, 'branch_code', None):
+            return branch_database(instance.branch_code)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._partition(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._partition(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Holdings point at primary rows without database constraints. The
+        # objects are checked directly: type() of a lazy request.user is
+        # SimpleLazyObject, not User
+        if is_branch_local(obj1) or is_branch_local(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in set(branch_databases().values()) - {PRIMARY}:
+            return model_name is not None and f'{app_label}.{model_name}' in BRANCH_LOCAL_MODELS
+        return None
@@ -0,0 +1,34 @@
+from rest_framework import serializers
+from .models import Branch, BranchHolding
+
+
+class BranchSerializer(serializers.ModelSerializer):
+    """Serializer for Branch model"""
+    class Meta:
+        model = Branch
+        fields = ['id', 'code', 'name', 'address', 'is_active', 'created_at']
+        read_only_fields = ['created_at']
+
+
+class BranchHoldingSerializer(serializers.ModelSerializer):
+    """Serializer for a branch's copies of a book"""
+    book_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = BranchHolding
+        fields = ['book_id', 'total_copies', 'available_copies', 'shelf_location', 'updated_at']
+
+
+class SetHoldingSerializer(serializers.Serializer):
+    """Serializer for stocking a book at a branch"""
+    book_id = serializers.IntegerField()
+    total_copies = serializers.IntegerField(min_value=0)
+    shelf_location = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
+    def validate_book_id(self, value):
+        """Validate book exists"""
+        from books.models import Book
+
+        if not Book.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Book not found.")
+        return value
@@ -0,0 +1,9 @@
+from jobs.queue import task
+from .inventory import refresh_branch_index as refresh_index
+
+
+@task(unique=True)
+def refresh_branch_index():
+    """Resync the merged branch index and the books' cross-branch copy counts"""
+    result = refresh_index()
+    return result['books_updated']
@@ -0,0 +1,159 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject
+from rest_framework.test import APITestCase
+
+from books.models import Book
+from transactions.bulk import bulk_return
+from transactions.models import Transaction
+from .inventory import (
+    holdings, reconcile_branch_holdings, refresh_branch_index, set_holding, take_copy
+)
+from .models import Branch, BranchAvailability, BranchHolding
+from .partitions import BranchRouter
+
+
+class BranchInventoryTests(APITestCase):
+    """Branch inventory across the primary and two partition databases (see test_settings)"""
+    databases = {'default', 'branch_north', 'branch_south'}
+
+    def setUp(self):
+        self.north = Branch.objects.create(code='north', name='North')
+        self.south = Branch.objects.create(code='south', name='South')
+        self.east = Branch.objects.create(code='east', name='East')  # no partition: primary
+        self.book = Book.objects.create(
+            title='Book', isbn='9780000000001', publisher='P', publication_year=2000,
+            total_copies=1, available_copies=1
+        )
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.client.force_authenticate(self.student)
+
+    def available(self, branch):
+        return holdings(branch.code).get(book=self.book).available_copies
+
+    def borrow(self, branch):
+        return self.client.post(
+            '/api/transactions/borrow/', {'book_id': self.book.id, 'branch': branch.code}, format='json'
+        )
+
+    def test_holdings_are_routed_to_partitions(self):
+        set_holding(self.north, self.book.id, 2)
+        set_holding(self.south, self.book.id, 3, shelf_location='S-1')
+        set_holding(self.east, self.book.id, 1)
+
+        self.assertEqual(list(BranchHolding.objects.using('branch_north').values_list('branch_code', flat=True)),
+                         ['north'])
+        self.assertEqual(list(BranchHolding.objects.using('branch_south').values_list('branch_code', flat=True)),
+                         ['south'])
+        self.assertEqual(list(BranchHolding.objects.using('default').values_list('branch_code', flat=True)),
+                         ['east'])
+
+        self.assertEqual(BranchAvailability.objects.filter(book=self.book).count(), 3)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (6, 6))
+
+    def test_last_copy_is_lent_once(self):
+        set_holding(self.north, self.book.id, 1)
+        self.assertTrue(take_copy(self.north, self.book.id))
+        self.assertFalse(take_copy(self.north, self.book.id))
+        self.assertEqual(self.available(self.north), 0)
+
+        response = self.borrow(self.north)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_failed_loan_gives_the_copy_back(self):
+        set_holding(self.north, self.book.id, 1)
+        with mock.patch.object(Transaction.objects, 'create', side_effect=RuntimeError('primary down')):
+            with self.assertRaises(RuntimeError):
+                self.borrow(self.north)
+        self.assertEqual(self.available(self.north), 1)
+
+    def test_return_restocks_the_lending_branch(self):
+        set_holding(self.north, self.book.id, 1)
+        set_holding(self.south, self.book.id, 1)
+
+        response = self.borrow(self.north)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((self.available(self.north), self.available(self.south)), (0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/transactions/{response.data['transaction']['id']}/return_book/")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((self.available(self.north), self.available(self.south)), (1, 1))
+        self.assertEqual(
+            BranchAvailability.objects.get(branch=self.north, book=self.book).available_copies, 1
+        )
+
+    def test_bulk_return_restocks_each_branch(self):
+        set_holding(self.north, self.book.id, 1)
+        set_holding(self.south, self.book.id, 1)
+        self.assertEqual(self.borrow(self.north).status_code, 201)
+        self.assertEqual(self.borrow(self.south).status_code, 201)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = bulk_return(Transaction.objects.all())
+        self.assertEqual(result['returned'], 2)
+        self.assertEqual((self.available(self.north), self.available(self.south)), (1, 1))
+
+    def test_refresh_and_reconcile(self):
+        set_holding(self.north, self.book.id, 3)
+        self.assertEqual(self.borrow(self.north).status_code, 201)
+
+        # Drift in the partition: a copy lost without a loan
+        holdings('north').update(available_copies=1)
+        refresh_branch_index()
+        self.assertEqual(BranchAvailability.objects.get(branch=self.north).available_copies, 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+        self.assertEqual(reconcile_branch_holdings(self.north), {self.book.id: (1, 2)})
+        reconcile_branch_holdings(self.north, fix=True)
+        self.assertEqual(self.available(self.north), 2)
+        self.assertEqual(reconcile_branch_holdings(self.north), {})
+
+    def test_copy_counts_of_branch_held_books_are_not_editable(self):
+        set_holding(self.north, self.book.id, 4)
+        librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        librarian.profile.role = 'librarian'
+        librarian.profile.save()
+        self.client.force_authenticate(librarian)
+
+        response = self.client.patch(f'/api/books/{self.book.id}/', {'total_copies': 10}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('total_copies', response.data)
+
+        response = self.client.patch(f'/api/books/{self.book.id}/', {'total_copies': 4, 'title': 'Renamed'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.title, self.book.total_copies), ('Renamed', 4))
+
+    def test_branch_in_use_is_not_deleted(self):
+        librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        librarian.profile.role = 'librarian'
+        librarian.profile.save()
+
+        set_holding(self.north, self.book.id, 2)
+        set_holding(self.south, self.book.id, 1)
+        self.assertEqual(self.borrow(self.south).status_code, 201)
+        self.client.force_authenticate(librarian)
+
+        self.assertEqual(self.client.delete('/api/branches/north/').status_code, 400)
+        set_holding(self.north, self.book.id, 0)
+        self.assertEqual(self.client.delete('/api/branches/north/').status_code, 204)
+        self.assertFalse(BranchHolding.objects.using('branch_north').exists())
+
+        # Loans keep a branch (and its partition rows) even without copies
+        set_holding(self.south, self.book.id, 0)
+        self.assertEqual(self.client.delete('/api/branches/south/').status_code, 400)
+        self.assertTrue(Branch.objects.filter(code='south').exists())
+
+    def test_relations_to_lazy_objects(self):
+        # request.user is a SimpleLazyObject wherever the auth middleware ran
+        router = BranchRouter()
+        lazy_user = SimpleLazyObject(lambda: self.student)
+        self.assertIsNone(router.allow_relation(self.book, lazy_user))
+        holding = BranchHolding(branch_code='north', book_id=self.book.id)
+        self.assertTrue(router.allow_relation(holding, lazy_user))
@@ -0,0 +1,57 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from books.views import IsLibrarianOrReadOnly
+from .inventory import BranchInUse, delete_branch, holdings as branch_holdings, set_holding
+from .models import Branch
+from .serializers import BranchSerializer, BranchHoldingSerializer, SetHoldingSerializer
+
+
+class BranchViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for Branch CRUD operations
+    """
+    queryset = Branch.objects.all()
+    serializer_class = BranchSerializer
+    permission_classes = [IsLibrarianOrReadOnly]
+    lookup_field = 'code'
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Delete a branch without copies or loans
+        DELETE /api/branches/{code}/
+        """
+        try:
+            delete_branch(self.get_object())
+        except BranchInUse as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['get', 'post'])
+    def holdings(self, request, code=None):
+        """
+        List a branch's copies, or stock a book there (librarian only)
+        GET/POST /api/branches/{code}/holdings/
+        """
+        branch = self.get_object()
+
+        if request.method == 'POST':
+            serializer = SetHoldingSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            holding = set_holding(
+                branch,
+                serializer.validated_data['book_id'],
+                serializer.validated_data['total_copies'],
+                serializer.validated_data.get('shelf_location'),
+            )
+            return Response(BranchHoldingSerializer(holding).data, status=status.HTTP_200_OK)
+
+        queryset = branch_holdings(branch.code).order_by('book_id')
+        book_id = request.query_params.get('book', None)
+        if book_id:
+            queryset = queryset.filter(book_id=book_id)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(BranchHoldingSerializer(page, many=True).data)
+        return Response(BranchHoldingSerializer(queryset, many=True).data)
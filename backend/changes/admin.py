@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import Tombstone
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    """Read-only view of deletion records served to change feeds"""
+    list_display = ('model', 'object_id', 'owner_id', 'deleted_at')
+    list_filter = ('model',)
+    date_hierarchy = 'deleted_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,160 @@
+"""
+Delta-sync change feeds.
+
+GET .../changes/?since=<token> on the book, transaction and fine viewsets
+returns the rows created or updated since the token (by the indexed
+updated_at column) and the ids deleted since then (from tombstones), with
+a token to continue from:
+
+    {"changes": [...], "deleted": [3, 17], "next": "<token>", "has_more": false}
+
+Omit since to start a replica from scratch: the first pages carry every
+row, and deletions are tracked from that moment. Keep requesting with the
+returned token while has_more is true; afterwards poll with the last token.
+
+Both streams are read in (timestamp, id) order with a keyset cursor, so
+each page is an index range scan however far behind the client is. Rows
+only become visible once their timestamp is SETTLE_SECONDS old, which
+leaves time for the writing transaction to commit: a row stamped before
+the cursor but committed after it would otherwise be skipped. Tokens
+older than the tombstone retention period get 410 Gone and the client
+must resync from scratch.
+"""
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Tombstone
+
+DEFAULT_CHANGE_FEED = {
+    'PAGE_SIZE': 500,
+    'SETTLE_SECONDS': 5,     # rows younger than this wait for the next sync
+    'RETENTION_DAYS': 30,    # tombstones (and so tokens) older than this are purged
+}
+
+TOKEN_VERSION = 'v1'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(ValueError):
+    pass
+
+
+def change_feed_settings():
+    return {**DEFAULT_CHANGE_FEED, **getattr(settings, 'CHANGE_FEED', {})}
+
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def _moment(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def encode_token(rows_cursor, tombstones_cursor):
+    """Opaque token for the (timestamp, id) cursors of both streams"""
+    parts = [TOKEN_VERSION]
+    for moment, pk in (rows_cursor, tombstones_cursor):
+        parts += [str(_micros(moment)) if moment else '', '' if pk is None else str(pk)]
+    return base64.urlsafe_b64encode('.'.join(parts).encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """(rows_cursor, tombstones_cursor) from a token; raises InvalidToken"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        version, *fields = raw.split('.')
+        if version != TOKEN_VERSION or len(fields) != 4:
+            raise ValueError
+        values = [int(field) if field else None for field in fields]
+    except ValueError:
+        raise InvalidToken('Invalid change token') from None
+    rows_ts, rows_pk, tombstones_ts, tombstones_pk = values
+    return (
+        (_moment(rows_ts) if rows_ts is not None else None, rows_pk),
+        (_moment(tombstones_ts) if tombstones_ts is not None else None, tombstones_pk),
+    )
+
+
+def _after(field, cursor):
+    """Q for rows strictly after a (timestamp, id) cursor; id None = after every row at timestamp"""
+    moment, pk = cursor
+    if moment is None:
+        return Q()
+    if pk is None:
+        return Q(**{f'{field}__gt': moment})
+    return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'pk__gt': pk})
+
+
+def _page(queryset, field, cursor, cutoff, size):
+    """(items, next cursor, has_more) for one stream"""
+    items = list(
+        queryset.filter(_after(field, cursor), **{f'{field}__lte': cutoff})
+        .order_by(field, 'pk')[:size + 1]
+    )
+    if len(items) > size:
+        items = items[:size]
+        last = items[-1]
+        return items, (getattr(last, field), last.pk), True
+    # Caught up: continue after everything at the cutoff
+    moment = cursor[0]
+    return items, (cutoff if moment is None or cutoff > moment else moment, None), False
+
+
+def read_changes(queryset, tombstones, token=None, is_removed=None, now=None):
+    """
+    One page of a change feed
+
+    queryset holds the (already scoped) rows and tombstones the matching
+    Tombstone rows. is_removed(row) marks rows that clients should drop
+    although they still exist (e.g. deactivated books). Returns a dict with
+    changes (row instances), deleted (ids), next (token) and has_more.
+    """
+    options = change_feed_settings()
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=options['SETTLE_SECONDS'])
+
+    if token:
+        rows_cursor, tombstones_cursor = decode_token(token)
+        if tombstones_cursor[0] is None or \
+                tombstones_cursor[0] < now - timedelta(days=options['RETENTION_DAYS']):
+            raise ExpiredToken('Change token expired; resync from scratch')
+    else:
+        # A new replica gets every live row; only later deletions matter to it
+        rows_cursor, tombstones_cursor = (None, None), (cutoff, None)
+
+    size = options['PAGE_SIZE']
+    rows, rows_cursor, more_rows = _page(queryset, 'updated_at', rows_cursor, cutoff, size)
+    deleted, tombstones_cursor, more_tombstones = _page(
+        tombstones, 'deleted_at', tombstones_cursor, cutoff, size
+    )
+
+    removed = {row.pk for row in rows if is_removed(row)} if is_removed else set()
+    return {
+        'changes': [row for row in rows if row.pk not in removed],
+        'deleted': [tombstone.object_id for tombstone in deleted] + sorted(removed),
+        'next': encode_token(rows_cursor, tombstones_cursor),
+        'has_more': more_rows or more_tombstones,
+    }
+
+
+def record_deletion(instance, owner_id=None):
+    """Write a tombstone for a deleted row (call from post_delete receivers)"""
+    Tombstone.objects.create(
+        model=instance._meta.label_lower, object_id=instance.pk, owner_id=owner_id
+    )
+
+
+def purge_tombstones(days=None, now=None):
+    days = change_feed_settings()['RETENTION_DAYS'] if days is None else days
+    now = now or timezone.now()
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=now - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,26 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted row, so change feeds can report the deletion
+
+    Written by the post_delete receivers of the synced models and purged
+    after CHANGE_FEED['RETENTION_DAYS'] (see changes.feed).
+    """
+    model = models.CharField(max_length=50)  # app_label.model_name
+    object_id = models.BigIntegerField()
+    # User the row belonged to, for feeds scoped to one user's rows
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'change_tombstones'
+        indexes = [
+            models.Index(fields=['model', 'deleted_at']),
+            models.Index(fields=['model', 'owner_id', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
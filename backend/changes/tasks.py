@@ -0,0 +1,8 @@
+from jobs.queue import task
+from .feed import purge_tombstones
+
+
+@task(unique=True)
+def purge_old_tombstones():
+    """Drop deletion records older than the change-feed retention period"""
+    return purge_tombstones()
@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from books.models import Book
+from transactions.models import Transaction
+from .feed import encode_token, read_changes
+from .models import Tombstone
+
+
+@override_settings(CHANGE_FEED={'PAGE_SIZE': 2, 'SETTLE_SECONDS': 0, 'RETENTION_DAYS': 30})
+class ChangeFeedTests(APITestCase):
+    def setUp(self):
+        self.books = [
+            Book.objects.create(
+                title=f'Book {index}', isbn=f'97800000000{index:02d}', publisher='P',
+                publication_year=2000, total_copies=1, available_copies=1
+            )
+            for index in range(5)
+        ]
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.client.force_authenticate(self.student)
+
+    def changes(self, path='/api/books/changes/', since=None):
+        response = self.client.get(path, {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def sync(self, path='/api/books/changes/', since=None):
+        """Follow has_more to the end; (changed ids, deleted ids, pages, last token)"""
+        changed, deleted, pages = [], [], 0
+        while True:
+            page = self.changes(path, since)
+            changed += [row['id'] for row in page['changes']]
+            deleted += page['deleted']
+            pages += 1
+            since = page['next']
+            if not page['has_more']:
+                return changed, deleted, pages, since
+
+    def test_pages_cover_every_row_once(self):
+        changed, deleted, pages, token = self.sync()
+        self.assertEqual(sorted(changed), sorted(book.id for book in self.books))
+        self.assertEqual((deleted, pages), ([], 3))
+
+        # Caught up: nothing until a row changes
+        self.assertEqual(self.sync(since=token)[:3], ([], [], 1))
+        self.books[2].title = 'Renamed'
+        self.books[2].save()
+        changed, _, _, token = self.sync(since=token)
+        self.assertEqual(changed, [self.books[2].id])
+        self.assertEqual(self.sync(since=token)[0], [])
+
+    @override_settings(CHANGE_FEED={'PAGE_SIZE': 2, 'SETTLE_SECONDS': 5, 'RETENTION_DAYS': 30})
+    def test_rows_wait_to_settle(self):
+        now = timezone.now()
+        since = now - timedelta(minutes=1)
+        token = encode_token((since, None), (since, None))
+        Book.objects.filter(pk=self.books[0].pk).update(updated_at=now - timedelta(seconds=30))
+        Book.objects.filter(pk=self.books[1].pk).update(updated_at=now)
+        Book.objects.exclude(pk__in=[self.books[0].pk, self.books[1].pk]).update(
+            updated_at=now - timedelta(minutes=2)
+        )
+
+        page = read_changes(Book.objects.all(), Tombstone.objects.all(), token, now=now)
+        self.assertEqual(page['changes'], [self.books[0]])
+        # The cursor stops at the settle cutoff, so the young row follows once settled
+        page = read_changes(Book.objects.all(), Tombstone.objects.all(), page['next'],
+                            now=now + timedelta(seconds=5))
+        self.assertEqual(page['changes'], [self.books[1]])
+
+    def test_deletions_and_deactivations_are_tombstones(self):
+        token = self.sync()[3]
+        deleted_id = self.books[0].id
+        self.books[0].delete()
+        self.books[1].is_active = False
+        self.books[1].save()
+
+        changed, deleted, _, _ = self.sync(since=token)
+        self.assertEqual(changed, [])
+        self.assertEqual(sorted(deleted), sorted([deleted_id, self.books[1].id]))
+
+        # A new replica gets the live rows (the inactive one to drop) but no
+        # earlier deletions
+        changed, deleted, _, _ = self.sync()
+        self.assertEqual(sorted(changed), sorted(book.id for book in self.books[2:]))
+        self.assertEqual(deleted, [self.books[1].id])
+
+    def test_students_only_see_their_own_deletions(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        mine = Transaction.objects.create(user=self.student, book=self.books[0])
+        theirs = Transaction.objects.create(user=other, book=self.books[1])
+        path = '/api/transactions/changes/'
+        token = self.sync(path)[3]
+
+        mine_id = mine.id
+        mine.delete()
+        theirs.delete()
+        self.assertEqual(Tombstone.objects.count(), 2)
+        self.assertEqual(self.sync(path, since=token)[1], [mine_id])
+
+    def test_expired_and_invalid_tokens(self):
+        old = timezone.now() - timedelta(days=31)
+        response = self.client.get('/api/books/changes/', {'since': encode_token((old, None), (old, None))})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.data['resync'])
+
+        recent = timezone.now() - timedelta(days=29)
+        response = self.client.get('/api/books/changes/', {'since': encode_token((recent, None), (recent, None))})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get('/api/books/changes/', {'since': 'not-a-token'}).status_code, 400)
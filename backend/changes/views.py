@@ -0,0 +1,47 @@
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .feed import ExpiredToken, InvalidToken, read_changes
+from .models import Tombstone
+
+
+class ChangeFeedMixin:
+    """
+    Adds a delta-sync change feed action to a viewset (see changes.feed)
+    """
+    change_feed_serializer_class = None
+
+    def get_change_feed_queryset(self):
+        """Rows this caller may sync (with the serializer's relations loaded)"""
+        return self.get_queryset()
+
+    def get_change_feed_tombstones(self):
+        """Deletions this caller may see"""
+        return Tombstone.objects.filter(model=self.get_change_feed_queryset().model._meta.label_lower)
+
+    def is_removed_change(self, obj):
+        """Whether an existing row should be reported as deleted"""
+        return False
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Rows created, updated or deleted since a change token
+        GET /api/<resource>/changes/?since=<token>
+        """
+        try:
+            page = read_changes(
+                self.get_change_feed_queryset(),
+                self.get_change_feed_tombstones(),
+                token=request.query_params.get('since'),
+                is_removed=self.is_removed_change,
+            )
+        except InvalidToken as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredToken as exc:
+            return Response({'error': str(exc), 'resync': True}, status=status.HTTP_410_GONE)
+
+        serializer = self.change_feed_serializer_class(
+            page['changes'], many=True, context=self.get_serializer_context()
+        )
+        return Response({**page, 'changes': serializer.data})
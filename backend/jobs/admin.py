@@ -0,0 +1,38 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job, JobSchedule
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin interface for background jobs"""
+    list_display = ('id', 'task', 'queue', 'priority', 'status', 'attempts',
+                    'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'queue', 'task')
+    search_fields = ('task', 'unique_key', 'last_error')
+    readonly_fields = ('created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error')
+    # Arguments can hold personal data (e.g. provisioning rows)
+    exclude = ('args',)
+    date_hierarchy = 'created_at'
+
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        """Queue selected failed jobs again with a fresh attempt budget"""
+        # A unique job can only be requeued while no equal job is pending
+        pending_keys = Job.objects.filter(
+            status__in=Job.ACTIVE_STATUSES, unique_key__isnull=False
+        ).values('unique_key')
+        count = queryset.filter(status='failed').exclude(unique_key__in=pending_keys).update(
+            status='queued', run_at=timezone.now(), attempts=0,
+            finished_at=None, locked_by='', locked_at=None
+        )
+        self.message_user(request, f'{count} job(s) queued for retry.')
+    retry_jobs.short_description = 'Retry selected failed jobs'
+
+
+@admin.register(JobSchedule)
+class JobScheduleAdmin(admin.ModelAdmin):
+    """Admin interface for scheduled job state"""
+    list_display = ('name', 'cron', 'next_run_at', 'last_enqueued_at')
+    readonly_fields = ('name', 'cron', 'last_enqueued_at')
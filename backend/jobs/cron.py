@@ -0,0 +1,110 @@
+"""
+Five-field cron expressions for scheduled jobs.
+
+Supports `*`, values, ranges (`1-5`), steps (`*/15`, `0-30/10`), comma lists
+and the @hourly/@daily/@weekly/@monthly/@yearly aliases. Day of week is 0-6
+with 0 (or 7) as Sunday; as in Vixie cron, when both day of month and day of
+week are restricted a day matching either one fires. Times are evaluated in
+the project's TIME_ZONE.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+# (name, lowest, highest)
+FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day of month', 1, 31),
+    ('month', 1, 12),
+    ('day of week', 0, 7),
+)
+
+# No five-field expression needs more than a few years to recur (Feb 29)
+MAX_SEARCH = timedelta(days=366 * 5)
+
+
+def _parse_field(text, name, lowest, highest):
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            if not step_text.isdigit() or int(step_text) < 1:
+                raise ValueError(f'Invalid step in cron {name} field: {text!r}')
+            step = int(step_text)
+
+        if part == '*':
+            start, end = lowest, highest
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            if not (start_text.isdigit() and end_text.isdigit()):
+                raise ValueError(f'Invalid range in cron {name} field: {text!r}')
+            start, end = int(start_text), int(end_text)
+        elif part.isdigit():
+            start = end = int(part)
+            if step > 1:
+                end = highest
+        else:
+            raise ValueError(f'Invalid cron {name} field: {text!r}')
+
+        if not lowest <= start <= end <= highest:
+            raise ValueError(f'Cron {name} field out of range {lowest}-{highest}: {text!r}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        fields = ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+
+        parsed = [_parse_field(text, *spec) for text, spec in zip(fields, FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __repr__(self):
+        return f'CronSchedule({self.expression!r})'
+
+    def _day_matches(self, moment):
+        # Python: Monday=0 ... Sunday=6; cron: Sunday=0 ... Saturday=6
+        in_month = moment.day in self.days
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """First aware datetime strictly after moment that the expression matches"""
+        local = timezone.localtime(moment).replace(tzinfo=None, second=0, microsecond=0)
+        candidate = local + timedelta(minutes=1)
+        limit = local + MAX_SEARCH
+
+        while candidate <= limit:
+            if candidate.month not in self.months:
+                year = candidate.year + (candidate.month == 12)
+                candidate = datetime(year, candidate.month % 12 + 1, 1)
+            elif not self._day_matches(candidate):
+                candidate = datetime(candidate.year, candidate.month, candidate.day) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(candidate)
+
+        raise ValueError(f'Cron expression never matches: {self.expression!r}')
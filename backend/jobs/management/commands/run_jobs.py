@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue (and enqueue scheduled jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help='Queue to process (repeatable; default JOB_QUEUE["QUEUES"])')
+        parser.add_argument('--concurrency', type=int, help='Jobs run at once')
+        parser.add_argument('--mode', choices=['thread', 'process'], help='Worker pool type')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between polls when idle')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no queued job is due instead of waiting for more')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            queues=options['queues'],
+            concurrency=options['concurrency'],
+            mode=options['mode'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+            log=self.stderr.write,
+        )
+        self.stderr.write(
+            f'Worker {worker.name} processing {", ".join(worker.queues)} '
+            f'with {worker.concurrency} {worker.mode} worker(s).'
+        )
+        stats = worker.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'{stats["succeeded"]} succeeded, {stats["retried"]} retried, {stats["failed"]} failed.'
+        ))
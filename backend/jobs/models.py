@@ -0,0 +1,73 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+
+    # Scheduling
+    queue = models.CharField(max_length=50, default='default')
+    priority = models.IntegerField(default=0)  # higher runs first
+    run_at = models.DateTimeField(default=timezone.now)
+
+    # At most one queued/running job per key (see the partial unique constraint)
+    unique_key = models.CharField(max_length=200, null=True, blank=True)
+
+    # Execution
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'queue', '-priority', 'run_at'], name='jobs_claim_idx'),
+            models.Index(fields=['status', 'finished_at'], name='jobs_finished_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'],
+                condition=Q(status__in=['queued', 'running']),
+                name='jobs_unique_active_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status})"
+
+
+class JobSchedule(models.Model):
+    """Next due time of each settings.JOB_QUEUE['SCHEDULE'] entry"""
+    name = models.CharField(max_length=100, unique=True)
+    cron = models.CharField(max_length=100)
+    next_run_at = models.DateTimeField()
+    last_enqueued_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'job_schedules'
+        verbose_name = 'Job schedule'
+        verbose_name_plural = 'Job schedules'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.cron})"
@@ -0,0 +1,169 @@
+"""
+Durable background jobs stored in the primary database.
+
+Functions decorated with @task (conventionally in an app's tasks.py, which
+JobsConfig imports at startup) can be enqueued as Job rows and are run by
+`manage.py run_jobs` workers:
+
+    from jobs.queue import task
+
+    @task(priority=5, max_attempts=3)
+    def send_receipt(transaction_id):
+        ...
+
+    send_receipt.enqueue(transaction.id)
+
+Arguments are stored as JSON, so pass ids rather than model instances.
+Enqueuing inside an atomic block writes the job in that same transaction:
+workers only see it once the caller's writes commit, and it disappears if
+they roll back. Failed jobs are retried with exponential backoff until
+max_attempts; unique tasks (or an explicit unique_key) are deduplicated
+while an equal job is still queued or running.
+"""
+import hashlib
+import json
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, close_old_connections, router, transaction
+from django.utils import timezone
+
+DEFAULT_JOB_QUEUE = {
+    'QUEUES': ['default'],
+    'CONCURRENCY': 4,
+    'MODE': 'thread',           # worker pool: 'thread' or 'process'
+    'POLL_INTERVAL': 1.0,       # seconds between polls of an idle queue
+    'LEASE_SECONDS': 600,       # running jobs older than this are presumed lost
+    'BACKOFF_BASE': 10,         # seconds before the first retry, doubled per attempt
+    'BACKOFF_MAX': 3600,
+    'KEEP_FINISHED_DAYS': 7,
+    'EAGER': False,             # run tasks inline after commit instead of queueing
+    'SCHEDULE': {},
+}
+
+TASKS = {}
+
+
+def queue_settings():
+    return {**DEFAULT_JOB_QUEUE, **getattr(settings, 'JOB_QUEUE', {})}
+
+
+def setup_process():
+    """Process pool initializer: spawned workers start without Django set up"""
+    import django
+    django.setup()
+
+
+def execute(task_name, args, kwargs):
+    """Run one task in a pool worker; returns None or the formatted traceback"""
+    close_old_connections()
+    try:
+        get_task(task_name).function(*args, **kwargs)
+    except Exception:
+        return traceback.format_exc()
+    finally:
+        close_old_connections()
+    return None
+
+
+def retry_delay(attempt, base=None, maximum=None):
+    """Seconds to wait after the given failed attempt (1-based), with jitter"""
+    config = queue_settings()
+    base = config['BACKOFF_BASE'] if base is None else base
+    maximum = config['BACKOFF_MAX'] if maximum is None else maximum
+    delay = min(base * 2 ** (attempt - 1), maximum)
+    # Spread retries of jobs that failed together (e.g. during an outage)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def get_task(name):
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise LookupError(f'Unknown task {name!r}') from None
+
+
+class Task:
+    def __init__(self, function, name=None, queue='default', priority=0, max_attempts=5, unique=False):
+        self.function = function
+        self.name = name or f'{function.__module__}.{function.__qualname__}'
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.unique = unique
+        self.__doc__ = function.__doc__
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def unique_key_for(self, args, kwargs):
+        payload = json.dumps([args, kwargs], sort_keys=True, separators=(',', ':'))
+        return f'{self.name}:{hashlib.sha1(payload.encode()).hexdigest()}'
+
+    def enqueue(self, *args, **kwargs):
+        """Queue a run with the task's default options; see enqueue() for overrides"""
+        return enqueue(self, args=args, kwargs=kwargs)
+
+
+def task(function=None, **options):
+    """Register a function as a background task (usable bare or with options)"""
+    def register(function):
+        registered = Task(function, **options)
+        if registered.name in TASKS:
+            raise ImproperlyConfigured(f'Task {registered.name!r} is registered twice')
+        TASKS[registered.name] = registered
+        return registered
+    return register(function) if function is not None else register
+
+
+def enqueue(task, args=(), kwargs=None, *, queue=None, priority=None, run_at=None,
+            delay=None, unique_key=None, max_attempts=None):
+    """
+    Store a job for task (a Task or registered task name)
+
+    delay is seconds (or a timedelta) from now; run_at an aware datetime.
+    Returns the Job, or None when an equal unique job is already pending or
+    (in EAGER mode) the task was scheduled to run on commit.
+    """
+    from .models import Job
+
+    task = get_task(task) if isinstance(task, str) else task
+    args, kwargs = list(args), dict(kwargs or {})
+
+    if queue_settings()['EAGER']:
+        using = router.db_for_write(Job)
+        transaction.on_commit(lambda: task.function(*args, **kwargs), using=using)
+        return None
+
+    if unique_key is None and task.unique:
+        unique_key = task.unique_key_for(args, kwargs)
+    if run_at is None:
+        run_at = timezone.now()
+        if delay:
+            run_at += delay if isinstance(delay, timedelta) else timedelta(seconds=delay)
+
+    job = Job(
+        task=task.name,
+        args=args,
+        kwargs=kwargs,
+        queue=queue or task.queue,
+        priority=task.priority if priority is None else priority,
+        run_at=run_at,
+        unique_key=unique_key,
+        max_attempts=task.max_attempts if max_attempts is None else max_attempts,
+    )
+    try:
+        # Savepoint, so a duplicate does not break the caller's transaction
+        with transaction.atomic(using=router.db_for_write(Job)):
+            job.save()
+    except IntegrityError:
+        if unique_key is None:
+            raise
+        return None
+    return job
@@ -0,0 +1,8 @@
+from .queue import queue_settings, task
+from .worker import purge_finished
+
+
+@task(unique=True)
+def purge_finished_jobs():
+    """Delete succeeded and failed jobs older than KEEP_FINISHED_DAYS"""
+    return purge_finished(queue_settings()['KEEP_FINISHED_DAYS'])
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job, JobSchedule
+from .queue import enqueue, retry_delay, task
+from .worker import Worker, enqueue_due_schedules
+
+
+@task(name='jobs.tests.flaky', max_attempts=2)
+def flaky():
+    raise RuntimeError('flaky')
+
+
+@task(name='jobs.tests.unique_report', unique=True)
+def unique_report(day):
+    pass
+
+
+SCHEDULE = {'nightly': {'task': 'jobs.tests.unique_report', 'cron': '0 3 * * *', 'args': ['all']}}
+
+
+@override_settings(JOB_QUEUE={'EAGER': False, 'BACKOFF_BASE': 10, 'BACKOFF_MAX': 3600})
+class RetryTests(TestCase):
+    def setUp(self):
+        self.worker = Worker(queues=['default'], log=lambda message: None)
+
+    def test_backoff_doubles_up_to_the_maximum(self):
+        for attempt, delay in ((1, 10), (2, 20), (3, 40), (12, 3600)):
+            self.assertTrue(delay / 2 <= retry_delay(attempt) <= delay, attempt)
+
+    def test_failed_job_is_retried_after_backoff_then_failed(self):
+        job = flaky.enqueue()
+
+        [claimed] = self.worker.claim(1)
+        self.assertEqual(claimed.attempts, 1)
+        before = timezone.now()
+        self.assertEqual(self.worker.finish(claimed, 'boom'), 'retried')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error, job.locked_by), ('queued', 'boom', ''))
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=5))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=10))
+
+        # Not due again until the backoff has passed
+        self.assertEqual(self.worker.claim(1), [])
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        [claimed] = self.worker.claim(1)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertEqual(self.worker.finish(claimed, 'boom'), 'failed')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.worker.stats, {'succeeded': 0, 'retried': 1, 'failed': 1})
+
+    def test_only_the_claiming_worker_records_the_outcome(self):
+        flaky.enqueue()
+        [claimed] = self.worker.claim(1)
+        other = Worker(queues=['default'], log=lambda message: None)
+        other.name = 'elsewhere:1'
+        other.finish(claimed, None)
+        self.assertEqual(Job.objects.get().status, 'running')
+
+
+@override_settings(JOB_QUEUE={'EAGER': False})
+class UniqueJobTests(TestCase):
+    def test_equal_unique_job_is_not_queued_twice(self):
+        first = unique_report.enqueue('2024-01-01')
+        self.assertIsNotNone(first)
+        self.assertIsNone(unique_report.enqueue('2024-01-01'))
+        self.assertIsNotNone(unique_report.enqueue('2024-01-02'))
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_duplicate_keeps_the_callers_transaction(self):
+        unique_report.enqueue('2024-01-01')
+        with transaction.atomic():
+            self.assertIsNone(unique_report.enqueue('2024-01-01'))
+            # The failed insert only rolled back its savepoint
+            self.assertEqual(Job.objects.count(), 1)
+
+    def test_finished_job_frees_its_key(self):
+        job = unique_report.enqueue('2024-01-01')
+        Job.objects.filter(id=job.id).update(status='succeeded')
+        self.assertIsNotNone(unique_report.enqueue('2024-01-01'))
+
+    def test_explicit_key(self):
+        self.assertIsNotNone(enqueue(flaky, unique_key='k'))
+        self.assertIsNone(enqueue('jobs.tests.flaky', unique_key='k'))
+
+
+@override_settings(JOB_QUEUE={'EAGER': False, 'SCHEDULE': SCHEDULE})
+class ScheduleTests(TestCase):
+    def test_first_sight_sets_the_next_run(self):
+        self.assertEqual(enqueue_due_schedules(), [])
+        state = JobSchedule.objects.get(name='nightly')
+        self.assertGreater(state.next_run_at, timezone.now())
+        self.assertFalse(Job.objects.exists())
+
+    def test_due_slot_is_taken_once(self):
+        enqueue_due_schedules()
+        JobSchedule.objects.update(next_run_at=timezone.now() - timedelta(days=3))
+        stale = JobSchedule.objects.get()
+
+        now = timezone.now()
+        self.assertEqual(enqueue_due_schedules(now), ['nightly'])
+        # A second worker that read the schedule before the first one took it
+        with mock.patch.object(JobSchedule.objects, 'get_or_create', return_value=(stale, False)):
+            self.assertEqual(enqueue_due_schedules(now), [])
+
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.args, job.unique_key),
+                         ('jobs.tests.unique_report', ['all'], 'schedule:nightly'))
+        state = JobSchedule.objects.get()
+        self.assertGreater(state.next_run_at, now)
+        self.assertEqual(state.last_enqueued_at, now)
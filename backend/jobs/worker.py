@@ -0,0 +1,226 @@
+"""
+Job worker used by `manage.py run_jobs`.
+
+The worker's main thread claims due jobs, hands them to a thread or process
+pool and records the outcome; it also enqueues scheduled jobs and requeues
+jobs whose worker died mid-run. Several workers (on one host or many) can
+share the database: claims are a single UPDATE guarded by the job's status,
+and each schedule slot is taken with a compare-and-set on its next run time.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import DatabaseError, connections, router
+from django.db.models import F
+from django.utils import timezone
+
+from library_management.db import write_atomic
+
+from .cron import CronSchedule
+from .models import Job, JobSchedule
+from .queue import TASKS, enqueue, execute, queue_settings, retry_delay, setup_process
+
+logger = logging.getLogger(__name__)
+
+# How often the main loop checks schedules and expired leases
+MAINTENANCE_INTERVAL = 30
+
+
+def enqueue_due_schedules(now=None):
+    """Enqueue every SCHEDULE entry that is due; returns the names enqueued"""
+    now = now or timezone.now()
+    enqueued = []
+    for name, entry in queue_settings()['SCHEDULE'].items():
+        cron = CronSchedule(entry['cron'])
+        state, created = JobSchedule.objects.get_or_create(
+            name=name, defaults={'cron': cron.expression, 'next_run_at': cron.next_after(now)}
+        )
+        if state.cron != cron.expression:
+            JobSchedule.objects.filter(id=state.id).update(
+                cron=cron.expression, next_run_at=cron.next_after(now)
+            )
+            continue
+        if created or state.next_run_at > now:
+            continue
+
+        # Missed slots (no worker running) collapse into a single run
+        with write_atomic():
+            taken = JobSchedule.objects.filter(id=state.id, next_run_at=state.next_run_at).update(
+                next_run_at=cron.next_after(now), last_enqueued_at=now
+            )
+            if taken:
+                enqueue(
+                    entry['task'],
+                    args=entry.get('args', ()),
+                    kwargs=entry.get('kwargs'),
+                    priority=entry.get('priority'),
+                    queue=entry.get('queue'),
+                    unique_key=f'schedule:{name}',
+                )
+                enqueued.append(name)
+    return enqueued
+
+
+def requeue_expired(lease_seconds, now=None):
+    """Return jobs whose lease expired (crashed worker) to the queue, or fail them"""
+    now = now or timezone.now()
+    expired = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=lease_seconds))
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, last_error='Lease expired while running'
+    )
+    requeued = expired.update(status='queued', run_at=now, locked_by='', locked_at=None)
+    return requeued, failed
+
+
+def purge_finished(days, now=None):
+    now = now or timezone.now()
+    deleted, _ = Job.objects.filter(
+        status__in=['succeeded', 'failed'], finished_at__lt=now - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+class Worker:
+    def __init__(self, queues=None, concurrency=None, mode=None, poll_interval=None, burst=False, log=None):
+        config = queue_settings()
+        self.queues = list(queues or config['QUEUES'])
+        self.concurrency = concurrency or config['CONCURRENCY']
+        self.mode = mode or config['MODE']
+        self.poll_interval = config['POLL_INTERVAL'] if poll_interval is None else poll_interval
+        self.lease_seconds = config['LEASE_SECONDS']
+        self.burst = burst
+        self.log = log or logger.info
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stats = {'succeeded': 0, 'retried': 0, 'failed': 0}
+        self.in_flight = {}
+        self._stopping = threading.Event()
+        self._last_maintenance = None
+
+    def stop(self, *args):
+        self._stopping.set()
+
+    def _executor(self):
+        if self.mode == 'process':
+            # Spawned (not forked) children never inherit open database handles
+            return ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=setup_process,
+            )
+        if self.mode == 'thread':
+            return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+        raise ValueError(f"Unknown worker mode {self.mode!r} (use 'thread' or 'process')")
+
+    def claim(self, limit):
+        """Mark up to limit due jobs as running by this worker and return them"""
+        now = timezone.now()
+        with write_atomic():
+            candidates = Job.objects.filter(
+                status='queued', queue__in=self.queues, run_at__lte=now
+            ).order_by('-priority', 'run_at', 'id')
+            if connections[router.db_for_write(Job)].features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            ids = list(candidates.values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            Job.objects.filter(id__in=ids, status='queued').update(
+                status='running', locked_by=self.name, locked_at=now, attempts=F('attempts') + 1
+            )
+        return list(
+            Job.objects.filter(id__in=ids, status='running', locked_by=self.name, locked_at=now)
+            .order_by('-priority', 'run_at', 'id')
+        )
+
+    def finish(self, job, error):
+        """Record a job's outcome: success, a retry with backoff, or failure"""
+        now = timezone.now()
+        mine = Job.objects.filter(id=job.id, status='running', locked_by=self.name)
+        if error is None:
+            mine.update(status='succeeded', finished_at=now, last_error='')
+            outcome = 'succeeded'
+        elif job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            mine.update(
+                status='queued', run_at=now + timedelta(seconds=delay),
+                locked_by='', locked_at=None, last_error=error
+            )
+            outcome = 'retried'
+            self.log(f'{job.task} #{job.id} failed (attempt {job.attempts}/{job.max_attempts}), '
+                     f'retrying in {delay:.0f}s\n{error}')
+        else:
+            mine.update(status='failed', finished_at=now, last_error=error)
+            outcome = 'failed'
+            self.log(f'{job.task} #{job.id} failed permanently after {job.attempts} attempt(s)\n{error}')
+        self.stats[outcome] += 1
+        return outcome
+
+    def maintenance(self):
+        now = timezone.now()
+        if self._last_maintenance and (now - self._last_maintenance).total_seconds() < MAINTENANCE_INTERVAL:
+            return
+        self._last_maintenance = now
+        # Renew the lease of everything still running here
+        if self.in_flight:
+            Job.objects.filter(
+                id__in=[job.id for job in self.in_flight.values()], status='running', locked_by=self.name
+            ).update(locked_at=now)
+        for name in enqueue_due_schedules(now):
+            self.log(f'Scheduled {name}')
+        requeued, failed = requeue_expired(self.lease_seconds, now)
+        if requeued or failed:
+            self.log(f'Recovered {requeued + failed} job(s) with expired leases')
+
+    def _collect(self, future):
+        job = self.in_flight.pop(future)
+        try:
+            error = future.result()
+        except Exception:
+            # The pool itself failed (e.g. a process worker was killed)
+            error = traceback.format_exc()
+        self.finish(job, error)
+
+    def run(self):
+        """Process jobs until stopped (or, in burst mode, until the queues are empty)"""
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, self.stop)
+
+        executor = self._executor()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    self.maintenance()
+                    free = self.concurrency - len(self.in_flight)
+                    for job in self.claim(free) if free else []:
+                        if job.task not in TASKS:
+                            # Retrying cannot help until the code is deployed
+                            job.max_attempts = job.attempts
+                            self.finish(job, f'Unknown task {job.task!r}')
+                            continue
+                        self.in_flight[executor.submit(execute, job.task, job.args, job.kwargs)] = job
+                except DatabaseError as exc:
+                    # e.g. SQLite "database is locked" under contention; try again next poll
+                    self.log(f'Job queue unavailable: {exc}')
+
+                if not self.in_flight:
+                    if self.burst:
+                        break
+                    self._stopping.wait(self.poll_interval)
+                    continue
+
+                done, _ = wait(self.in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._collect(future)
+        finally:
+            # Let running jobs finish; unclaimed work stays queued
+            for future in list(self.in_flight):
+                self._collect(future)
+            executor.shutdown(wait=True)
+        return self.stats
@@ -0,0 +1,183 @@
+"""
+Batched API reads.
+
+POST /api/batch/ runs several GET requests against the API views
+in-process and returns all their responses at once, so a dashboard can
+load its panels in one round trip:
+
+    {"requests": [{"id": "books", "path": "/api/books/?page=1"},
+                  {"id": "fines", "path": "/api/fines/my_fines/"}]}
+
+    {"responses": [{"id": "books", "status": 200, "body": {...}},
+                   {"id": "fines", "status": 200, "body": {...}}]}
+
+The batch is authenticated once: every sub-request reuses the caller's user
+and profile instances (so fields hydrated by one view are already loaded
+for the next) and the outer request's middleware state (replica routing,
+SQL instrumentation). Sub-responses are returned as data and rendered once,
+in the batch response's own format. Sub-requests run concurrently on a
+small thread pool when that is safe, i.e. when each thread's own database
+connection sees the same data: never inside a transaction or against an
+in-memory SQLite database.
+"""
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .db import threads_share_view
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_API = {
+    'MAX_REQUESTS': 20,
+    # Threads running sub-requests concurrently; None = min(4, CPU count).
+    # Threads only pay off when the database work overlaps on several cores.
+    'MAX_WORKERS': None,
+}
+
+API_PREFIX = '/api/'
+
+_executor = (0, None)  # (max_workers, ThreadPoolExecutor)
+_executor_lock = threading.Lock()
+
+
+def batch_settings():
+    options = {**DEFAULT_BATCH_API, **getattr(settings, 'BATCH_API', {})}
+    if options['MAX_WORKERS'] is None:
+        options['MAX_WORKERS'] = min(4, os.cpu_count() or 1)
+    return options
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor[0] != workers:
+            _executor = (workers, ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch'))
+        return _executor[1]
+
+
+def _subrequest(parent, path, user, token):
+    url = urlsplit(path)
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = url.path
+    request.META = {
+        **parent.META,
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_LENGTH': '0',
+        # Sub-responses are returned as data and rendered with the batch
+        'HTTP_ACCEPT': 'application/json',
+    }
+    request.META.pop('CONTENT_TYPE', None)
+    request.GET = QueryDict(url.query)
+    request.COOKIES = parent.COOKIES
+    request.user = user
+    # Read by rest_framework.request.Request in place of re-authenticating
+    request._force_auth_user = user
+    request._force_auth_token = token
+    for attribute in ('session', 'query_recorder'):
+        if hasattr(parent, attribute):
+            setattr(request, attribute, getattr(parent, attribute))
+    return request
+
+
+class BatchView(APIView):
+    """
+    API endpoint running several API GET requests in one round trip
+    POST /api/batch/
+    """
+
+    def post(self, request):
+        options = batch_settings()
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': 'Provide a non-empty "requests" list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > options['MAX_REQUESTS']:
+            return Response({
+                'error': f'At most {options["MAX_REQUESTS"]} requests per batch'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+                return Response({
+                    'error': f'Request {index} needs a "path"'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if str(item.get('method', 'GET')).upper() != 'GET':
+                return Response({
+                    'error': f'Request {index}: only GET requests can be batched'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        calls = [
+            (item.get('id', index), self._subrequest_for(request, item['path']))
+            for index, item in enumerate(items)
+        ]
+
+        workers = min(options['MAX_WORKERS'], len(calls))
+        if workers > 1 and threads_share_view():
+            executor = _get_executor(options['MAX_WORKERS'])
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._run_in_thread, subrequest)
+                for _, subrequest in calls
+            ]
+            results = [future.result() for future in futures]
+        else:
+            results = [self._run(subrequest) for _, subrequest in calls]
+
+        return Response({
+            'responses': [
+                {'id': item_id, 'status': result_status, 'body': body}
+                for (item_id, _), (result_status, body) in zip(calls, results)
+            ]
+        })
+
+    def _subrequest_for(self, request, path):
+        url = urlsplit(path)
+        if url.scheme or url.netloc or not url.path.startswith(API_PREFIX):
+            return None
+        return _subrequest(request._request, path, request.user, request.auth)
+
+    def _run_in_thread(self, subrequest):
+        recorder = getattr(subrequest, 'query_recorder', None)
+        try:
+            if recorder is None:
+                return self._run(subrequest)
+            with recorder.attach():
+                return self._run(subrequest)
+        finally:
+            close_old_connections()
+
+    def _run(self, subrequest):
+        """(status, body) for one sub-request"""
+        if subrequest is None:
+            return status.HTTP_400_BAD_REQUEST, {'error': f'Only {API_PREFIX} paths can be batched'}
+        try:
+            match = resolve(subrequest.path_info)
+        except Resolver404:
+            return status.HTTP_404_NOT_FOUND, {'error': 'Not found'}
+
+        view_class = getattr(match.func, 'cls', None)
+        if view_class is None or not issubclass(view_class, APIView) or issubclass(view_class, BatchView):
+            return status.HTTP_400_BAD_REQUEST, {'error': 'This endpoint cannot be batched'}
+
+        subrequest.resolver_match = match
+        try:
+            response = match.func(subrequest, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception('Batched request to %s failed', subrequest.get_full_path())
+            return status.HTTP_500_INTERNAL_SERVER_ERROR, {'error': 'Internal server error'}
+        return response.status_code, getattr(response, 'data', None)
@@ -0,0 +1,33 @@
+"""
+Cache backends that count hits and misses for /metrics.
+
+Drop-in replacements for Django's LocMemCache and FileBasedCache; set
+METRICS_LABEL in the CACHES entry to name the cache in metrics.
+"""
+from django.core.cache.backends import filebased, locmem
+
+from .metrics import CACHE_REQUESTS
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_label = params.get('METRICS_LABEL', location or self.__class__.__name__)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if value is _MISSING:
+            CACHE_REQUESTS.inc(cache=self.metrics_label, result='miss')
+            return default
+        CACHE_REQUESTS.inc(cache=self.metrics_label, result='hit')
+        return value
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(InstrumentedCacheMixin, filebased.FileBasedCache):
+    pass
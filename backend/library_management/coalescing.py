@@ -0,0 +1,193 @@
+"""
+Shared, short-lived responses for expensive public GETs.
+
+Catalogue endpoints such as /api/books/popular/ and /api/categories/ are
+requested by hundreds of clients at the same moment (class changeovers)
+and return the same data to all of them. Views decorated with
+@coalesced('books.popular') answer from a short-lived cache entry keyed by
+the normalized URL (host, path, sorted query parameters) and the caller's
+role:
+
+- fresh entry (younger than TIMEOUT): served as is;
+- stale entry (up to STALE seconds older): served as is while one
+  background thread recomputes it (stale-while-revalidate);
+- no entry: the first request computes it and concurrent identical
+  requests in the same process wait for that result instead of running
+  the same queries (single flight).
+
+Only successful responses are stored; response data is cached, not the
+rendered bytes, so content negotiation still applies per request. Roles
+in BYPASS_ROLES (librarians, who edit the catalogue) always get live
+data. Outcomes are counted per endpoint in library_coalesced_requests_total.
+"""
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from rest_framework.response import Response
+
+from .db import threads_share_view
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COALESCED_RESPONSES = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 5,            # seconds an entry is fresh
+    'STALE': 30,             # further seconds it may be served while revalidating
+    'WAIT_TIMEOUT': 10,      # longest a request waits for an identical one in flight
+    'BYPASS_ROLES': ['librarian'],
+}
+
+COALESCED_REQUESTS = REGISTRY.counter(
+    'library_coalesced_requests_total',
+    'Coalesced GETs by endpoint and result (hit/stale/miss/shared/bypass).',
+    ('endpoint', 'result'),
+)
+
+_revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix='revalidate')
+
+
+def coalescing_settings():
+    return {**DEFAULT_COALESCED_RESPONSES, **getattr(settings, 'COALESCED_RESPONSES', {})}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def acquire(self, key):
+        """(call, leader): leader is True when the caller must run the computation"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def run(self, key, call, function):
+        """Run function as the leader of call and publish its outcome"""
+        try:
+            call.result = function()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def do(self, key, function, timeout=None):
+        """(result, shared): shared is True when another caller computed it"""
+        call, leader = self.acquire(key)
+        if leader:
+            return self.run(key, call, function), False
+        if not call.done.wait(timeout):
+            # The leader is stuck; do not make this request hang with it
+            return function(), False
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+
+_flight = SingleFlight()
+
+
+def _role(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    profile = getattr(user, 'profile', None)
+    return getattr(profile, 'role', None) or 'user'
+
+
+def request_key(endpoint, request, role):
+    """Cache key from the normalized URL and role"""
+    query = urlencode(sorted(
+        (name, value) for name, values in request.query_params.lists() for value in values if value != ''
+    ))
+    return f'coalesced:{endpoint}:{role}:{request.get_host()}{request.path}?{query}'
+
+
+def _compute(cache, key, options, view):
+    """Run the view and store a successful result; returns (status, data)"""
+    response = view()
+    data = getattr(response, 'data', None)
+    if response.status_code == 200:
+        cache.set(
+            key,
+            {'data': data, 'fresh_until': time.time() + options['TIMEOUT']},
+            options['TIMEOUT'] + options['STALE'],
+        )
+    return response.status_code, data
+
+
+def _revalidate(cache, key, options, view, call):
+    try:
+        _flight.run(key, call, lambda: _compute(cache, key, options, view))
+    except Exception:
+        logger.exception('Revalidating %s failed', key)
+    finally:
+        close_old_connections()
+
+
+def coalesced_response(endpoint, request, view):
+    """Answer request from the coalescing cache; view() produces a live Response"""
+    options = coalescing_settings()
+    role = _role(request)
+    if not options['ENABLED'] or request.method not in ('GET', 'HEAD') or role in options['BYPASS_ROLES']:
+        COALESCED_REQUESTS.inc(endpoint=endpoint, result='bypass')
+        return view()
+
+    cache = caches[options['CACHE']]
+    key = request_key(endpoint, request, role)
+    entry = cache.get(key)
+    if entry is not None:
+        if entry['fresh_until'] > time.time():
+            COALESCED_REQUESTS.inc(endpoint=endpoint, result='hit')
+            return Response(entry['data'])
+
+        COALESCED_REQUESTS.inc(endpoint=endpoint, result='stale')
+        call, leader = _flight.acquire(key)
+        if leader:
+            if not threads_share_view():
+                # A background thread could not see this thread's data
+                status, data = _flight.run(key, call, lambda: _compute(cache, key, options, view))
+                return Response(data, status=status)
+            _revalidator.submit(contextvars.copy_context().run, _revalidate, cache, key, options, view, call)
+        return Response(entry['data'])
+
+    (status, data), shared = _flight.do(
+        key, lambda: _compute(cache, key, options, view), timeout=options['WAIT_TIMEOUT']
+    )
+    COALESCED_REQUESTS.inc(endpoint=endpoint, result='shared' if shared else 'miss')
+    return Response(data, status=status)
+
+
+def coalesced(endpoint):
+    """Decorate a viewset GET method so identical concurrent requests share one result"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            return coalesced_response(endpoint, request, lambda: method(self, request, *args, **kwargs))
+        return wrapper
+    return decorator
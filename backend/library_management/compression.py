@@ -0,0 +1,193 @@
+"""
+Response compression with content negotiation.
+
+CompressionMiddleware picks the best encoding the client accepts from
+settings.RESPONSE_COMPRESSION['ALGORITHMS'] (zstd and brotli when their
+optional packages are installed, gzip always) and compresses bodies of at
+least MIN_SIZE bytes. Streaming responses are compressed chunk by chunk;
+the first chunks are buffered until MIN_SIZE is reached, so short streams
+are still sent as-is.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+DEFAULT_RESPONSE_COMPRESSION = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,
+    'ALGORITHMS': ['zstd', 'br', 'gzip'],  # server preference among accepted encodings
+    'LEVELS': {'zstd': 3, 'br': 4, 'gzip': 6},
+    # Already-compressed content
+    'SKIP_CONTENT_TYPES': ['image/', 'video/', 'audio/', 'font/woff', 'application/zip',
+                           'application/gzip', 'application/zstd', 'application/x-brotli'],
+}
+
+_ACCEPT_ENCODING = _lazy_re_compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*')
+
+
+def compression_settings():
+    return {**DEFAULT_RESPONSE_COMPRESSION, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+
+
+def _gzip(level):
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+COMPRESSORS = {'gzip': _gzip}
+if brotli is not None:
+    COMPRESSORS['br'] = _Brotli
+if zstandard is not None:
+    COMPRESSORS['zstd'] = _Zstd
+
+
+def available_encodings():
+    return [name for name in compression_settings()['ALGORITHMS'] if name in COMPRESSORS]
+
+
+def negotiate_encoding(accept_encoding, encodings):
+    """Encoding from `encodings` to use for an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        match = _ACCEPT_ENCODING.fullmatch(part)
+        if not match:
+            continue
+        try:
+            accepted[match.group(1).lower()] = float(match.group(2) or 1)
+        except ValueError:
+            continue
+    # Highest client q-value wins; ties go to the server's preference order
+    ranked = [
+        (accepted.get(encoding, accepted.get('*', 0)), -index, encoding)
+        for index, encoding in enumerate(encodings)
+    ]
+    quality, _, encoding = max(ranked, default=(0, 0, None))
+    return encoding if quality > 0 else None
+
+
+def compress(encoding, data, level=None):
+    """One-shot compression of bytes"""
+    level = level if level is not None else compression_settings()['LEVELS'][encoding]
+    compressor = COMPRESSORS[encoding](level)
+    return compressor.compress(data) + compressor.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = compression_settings()
+        self.encodings = available_encodings()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.options['ENABLED'] or not self.encodings or not self._compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        if encoding is None:
+            return response
+
+        level = self.options['LEVELS'][encoding]
+        if response.streaming:
+            if response.is_async:
+                # Length unknown without consuming the async iterator: always compress
+                response.streaming_content = self._compress_async(
+                    response.streaming_content, encoding, level
+                )
+            else:
+                head, rest = self._peek(response.streaming_content)
+                if rest is None and len(head) < self.options['MIN_SIZE']:
+                    response.streaming_content = [head]
+                    return response
+                response.streaming_content = self._compress_stream(head, rest, encoding, level)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < self.options['MIN_SIZE']:
+                return response
+            compressed = compress(encoding, response.content, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag names the identity bytes; weaken it (as GZipMiddleware does)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '')
+        return not any(content_type.startswith(prefix) for prefix in self.options['SKIP_CONTENT_TYPES'])
+
+    def _peek(self, chunks):
+        """Buffer up to MIN_SIZE bytes; returns (head, remaining iterator or None)"""
+        iterator = iter(chunks)
+        buffered = []
+        size = 0
+        for chunk in iterator:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= self.options['MIN_SIZE']:
+                return b''.join(buffered), iterator
+        return b''.join(buffered), None
+
+    @staticmethod
+    def _compress_stream(head, rest, encoding, level):
+        compressor = COMPRESSORS[encoding](level)
+        data = compressor.compress(head)
+        if data:
+            yield data
+        for chunk in rest or ():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    async def _compress_async(chunks, encoding, level):
+        compressor = COMPRESSORS[encoding](level)
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
@@ -0,0 +1,56 @@
+"""
+Database helpers shared by the apps.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def write_atomic(using=None):
+    """
+    transaction.atomic() for write-heavy code paths
+
+    On the library_management.sqlite backend the outermost block starts with
+    BEGIN IMMEDIATE (and waits its turn in the in-process write queue when
+    WRITE_QUEUE is enabled), so concurrent writers queue on the write lock
+    instead of failing with "database is locked" when a read transaction
+    upgrades. On other backends, or inside an existing atomic block, it is
+    plain transaction.atomic().
+    """
+    using = using or DEFAULT_DB_ALIAS
+    connection = connections[using]
+
+    if not hasattr(connection, 'begin_immediate') or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    queue = connection.write_queue
+    if queue is not None:
+        queue.acquire()
+    try:
+        connection.begin_immediate = True
+        try:
+            with transaction.atomic(using=using):
+                yield
+        finally:
+            connection.begin_immediate = False
+    finally:
+        if queue is not None:
+            queue.release()
+
+
+def threads_share_view():
+    """
+    Whether work handed to another thread (with its own connections) sees
+    what this thread sees: never inside a transaction or against an
+    in-memory SQLite database
+    """
+    for connection in connections.all(initialized_only=True):
+        if connection.in_atomic_block:
+            return False
+    for connection in connections.all():
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            return False
+    return True
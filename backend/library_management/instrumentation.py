@@ -0,0 +1,143 @@
+"""
+Per-request SQL instrumentation.
+
+QueryRecorder hooks every database connection with execute_wrapper() and
+counts queries, SQL time and query shapes ("fingerprints": the SQL with
+literals and IN-lists collapsed). QueryInstrumentationMiddleware reports
+them per request as a Server-Timing header and a structured log line, and
+logs a warning when one shape repeats often enough to look like an N+1.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('library_management.queries')
+
+DEFAULT_QUERY_INSTRUMENTATION = {
+    'ENABLED': True,
+    'N_PLUS_ONE_THRESHOLD': 5,  # identical shapes per request before flagging
+    'REPORTED_SHAPES': 5,       # repeated shapes included in the log line
+}
+
+_IN_LIST = re.compile(r'\bIN \(\?(?:, \?)*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize a SQL statement to its shape"""
+    sql = _STRING.sub('?', sql).replace('%s', '?')
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def instrumentation_settings():
+    return {**DEFAULT_QUERY_INSTRUMENTATION, **getattr(settings, 'QUERY_INSTRUMENTATION', {})}
+
+
+class QueryRecorder:
+    """
+    Context manager recording the queries run on every connection alias
+
+    Only the current thread's connections are hooked, so concurrent
+    requests are recorded separately; a thread doing work for the same
+    request can join with attach().
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self._stack = None
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.duration += elapsed
+                self.count += 1
+                self.shapes[fingerprint(sql)] += 1
+
+    def attach(self):
+        """Hook the current thread's connections; returns the ExitStack that unhooks them"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    def __enter__(self):
+        self._stack = self.attach()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    def repeated(self, threshold=2):
+        """[(shape, count)] for shapes executed at least `threshold` times"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Adds `Server-Timing: db;dur=..;desc="N queries", app;dur=..` to every
+    response, logs one JSON line per request on library_management.queries
+    (INFO) and a WARNING when a query shape repeats N_PLUS_ONE_THRESHOLD
+    times or more.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = instrumentation_settings()
+
+    def __call__(self, request):
+        if not self.options['ENABLED']:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            request.query_recorder = recorder
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        db_ms = recorder.duration * 1000
+        response['Server-Timing'] = ', '.join(filter(None, [
+            response.get('Server-Timing'),
+            f'db;dur={db_ms:.2f};desc="{recorder.count} queries"',
+            f'app;dur={elapsed * 1000:.2f}',
+        ]))
+
+        suspects = recorder.repeated(self.options['N_PLUS_ONE_THRESHOLD'])
+        level = logging.WARNING if suspects else logging.INFO
+        if logger.isEnabledFor(level):
+            match = getattr(request, 'resolver_match', None)
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'queries': recorder.count,
+                'db_ms': round(db_ms, 2),
+                'total_ms': round(elapsed * 1000, 2),
+                'repeated': [
+                    {'count': count, 'sql': shape}
+                    for shape, count in recorder.repeated()[:self.options['REPORTED_SHAPES']]
+                ],
+            }
+            if suspects:
+                record['n_plus_one'] = True
+            logger.log(level, json.dumps(record), extra={'query_stats': record})
+        return response
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from library_management.profiling import make_profile_token, profiling_settings
+
+
+class Command(BaseCommand):
+    help = 'Print a signed X-Profile header value that profiles any request carrying it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--label', default='', help='Free-form label embedded in the token')
+
+    def handle(self, *args, **options):
+        token = make_profile_token(options['label'])
+        max_age = profiling_settings()['TOKEN_MAX_AGE']
+        self.stdout.write(f'X-Profile: {token}')
+        self.stderr.write(f'Valid for {max_age} seconds.')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library_management.replicas import refresh_replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into each configured read replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep refreshing every N seconds (0 = refresh once)')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='Pages copied per backup step')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            refreshed = refresh_replicas(pages=options['pages'])
+            if not refreshed:
+                raise CommandError('No replicas configured (set DB_REPLICAS).')
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(self.style.SUCCESS(
+                f'Refreshed {", ".join(refreshed)} in {elapsed:.0f} ms.'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
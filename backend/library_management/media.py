@@ -0,0 +1,218 @@
+"""
+Serving user uploads (MEDIA_ROOT) with ranges, validators and long caching.
+
+GET /media/<path> is answered according to settings.MEDIA_SERVING['MODE']:
+
+- 'direct': the file is streamed by Django as a FileResponse. Under a WSGI
+  server with wsgi.file_wrapper (gunicorn, uWSGI) the open file is handed
+  to the server, which copies it to the socket with os.sendfile() and
+  never through Python; range responses keep that path by positioning the
+  file at the range start and sending Content-Length bytes.
+- 'x-sendfile' / 'x-accel-redirect': Django only checks the path and the
+  conditional headers and returns an empty response whose X-Sendfile
+  (Apache, lighttpd) or X-Accel-Redirect (nginx, under ACCEL_PREFIX)
+  header tells the front-end server to send the file itself, ranges
+  included. nginx needs an internal location for ACCEL_PREFIX, e.g.
+
+      location /protected-media/ { internal; alias /srv/library/media/; }
+
+Every response carries a strong ETag (size and mtime) and Last-Modified,
+so If-None-Match / If-Modified-Since get 304 and If-Range is honoured.
+Single byte ranges get 206 (416 when unsatisfiable); multi-range requests
+get the whole file. Content-hashed names (see library_management.storage)
+never change, so they are sent as public, one-year and immutable; other
+files are cached for MAX_AGE seconds and then revalidated.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import is_hashed_name
+
+DEFAULT_MEDIA_SERVING = {
+    'MODE': 'direct',                       # 'direct', 'x-sendfile' or 'x-accel-redirect'
+    'ACCEL_PREFIX': '/protected-media/',    # nginx internal location aliasing MEDIA_ROOT
+    'MAX_AGE': 3600,                        # seconds for files without a content hash
+    'IMMUTABLE_MAX_AGE': 31536000,          # seconds for content-hashed files
+}
+
+OFFLOAD_HEADERS = {
+    'x-sendfile': 'X-Sendfile',
+    'x-accel-redirect': 'X-Accel-Redirect',
+}
+
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_serving_settings():
+    return {**DEFAULT_MEDIA_SERVING, **getattr(settings, 'MEDIA_SERVING', {})}
+
+
+def media_file(path):
+    """Absolute path of a file under MEDIA_ROOT; raises Http404"""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found') from None
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+    return full_path
+
+
+def file_etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def cache_control(path, options):
+    if is_hashed_name(path):
+        return f"public, max-age={options['IMMUTABLE_MAX_AGE']}, immutable"
+    return f"public, max-age={options['MAX_AGE']}"
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single byte range
+
+    None when the header should be ignored (absent, malformed or several
+    ranges: the whole file is sent); raises ValueError when the range
+    cannot be satisfied.
+    """
+    match = _BYTE_RANGE.match(header.replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError('Unsatisfiable range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range applies given If-Range (strong comparison only)"""
+    validator = request.META.get('HTTP_IF_RANGE')
+    if not validator:
+        return True
+    if validator.startswith(('"', 'W/')):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+class _FileRange:
+    """
+    Read-only view of bytes [start, start + length) of an open file
+
+    It keeps fileno() so wsgi.file_wrapper implementations can still
+    sendfile() it: the descriptor is positioned at start and the server
+    sends Content-Length bytes. Servers that read instead get exactly the
+    range from read().
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _content_type(full_path):
+    return mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+
+def _offload_response(full_path, path, mode, options):
+    # The front-end server sends the body (and handles Range) itself
+    response = HttpResponse(content_type=_content_type(full_path))
+    if mode == 'x-sendfile':
+        target = full_path
+    else:
+        # nginx expects an escaped URI here
+        target = options['ACCEL_PREFIX'].rstrip('/') + '/' + quote(path.lstrip('/'))
+    response.headers[OFFLOAD_HEADERS[mode]] = target
+    return response
+
+
+def _direct_response(request, full_path, size, etag, last_modified):
+    byte_range = None
+    if request.META.get('HTTP_RANGE') and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return response
+
+    content_type = _content_type(full_path)
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(
+        _FileRange(open(full_path, 'rb'), start, length), status=206, content_type=content_type
+    )
+    response.headers['Content-Length'] = str(length)
+    response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    A file under MEDIA_ROOT (cover images, profile pictures)
+    GET /media/<path>
+    """
+    options = media_serving_settings()
+    mode = options['MODE']
+    if mode != 'direct' and mode not in OFFLOAD_HEADERS:
+        raise ValueError(f"Unknown MEDIA_SERVING mode {mode!r}")
+
+    full_path = media_file(path)
+    stat = os.stat(full_path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if mode == 'direct':
+            response = _direct_response(request, full_path, stat.st_size, etag, last_modified)
+        else:
+            response = _offload_response(full_path, path, mode, options)
+
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = cache_control(path, options)
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
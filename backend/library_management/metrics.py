@@ -0,0 +1,380 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms live in a per-process Registry. In multiprocess
+mode (settings.METRICS['MULTIPROCESS_DIR']) every worker periodically
+writes its snapshot to <dir>/metrics-<pid>.json and /metrics merges all of
+them, so a scrape sees the whole server no matter which worker answers it.
+Clear the directory when the server restarts, as counters are cumulative.
+
+Domain gauges (loans, fines, inventory, job backlog) are read from the
+database at scrape time instead of being tracked per process.
+"""
+import ipaddress
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+DEFAULT_METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_INTERVAL': 1.0,   # seconds between snapshot writes per worker
+    'TOKEN': None,           # accept "Authorization: Bearer <TOKEN>" on /metrics
+    'ALLOWED_IPS': (),       # addresses/networks (e.g. '10.0.0.0/8') scraping without the token
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_settings():
+    return {**DEFAULT_METRICS, **getattr(settings, 'METRICS', {})}
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'help': self.documentation,
+                'labelnames': list(self.labelnames),
+                'samples': [[list(key), self._copy(value)] for key, value in self._values.items()],
+            }
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # one slot per bucket, one for +Inf, then the running sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, function):
+        """Register a scrape-time callback returning [(name, help, kind, [(labels, value)])]"""
+        self._collectors.append(function)
+        return function
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    # Multiprocess mode
+
+    def _snapshot_path(self, directory, pid=None):
+        return os.path.join(directory, f'metrics-{pid or os.getpid()}.json')
+
+    def flush(self, directory):
+        """Atomically write this process's snapshot to the multiprocess directory"""
+        os.makedirs(directory, exist_ok=True)
+        path = self._snapshot_path(directory)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self, directory, interval):
+        if time.monotonic() - self._last_flush < interval:
+            return
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self.flush(directory)
+            finally:
+                self._flush_lock.release()
+
+    def merged_snapshot(self, directory=None):
+        """This process's snapshot, or the sum of every worker's in multiprocess mode"""
+        if not directory:
+            return self.snapshot()
+
+        self.flush(directory)
+        merged = {}
+        for entry in os.scandir(directory):
+            if not (entry.name.startswith('metrics-') and entry.name.endswith('.json')):
+                continue
+            try:
+                with open(entry.path) as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                continue  # a worker is mid-write or the file vanished
+            for name, data in snapshot.items():
+                target = merged.setdefault(name, {**data, 'samples': {}})
+                for key, value in data['samples']:
+                    key = tuple(key)
+                    if key not in target['samples']:
+                        target['samples'][key] = value
+                    elif data['kind'] == 'histogram':
+                        target['samples'][key] = [a + b for a, b in zip(target['samples'][key], value)]
+                    else:
+                        target['samples'][key] += value
+        for data in merged.values():
+            data['samples'] = [[list(key), value] for key, value in data['samples'].items()]
+        return merged
+
+    def render(self, directory=None):
+        """Prometheus text exposition of every metric and collector"""
+        lines = []
+        snapshot = self.merged_snapshot(directory)
+        for name in sorted(snapshot):
+            data = snapshot[name]
+            lines.append(f'# HELP {name} {data["help"]}')
+            lines.append(f'# TYPE {name} {data["kind"]}')
+            labelnames = data['labelnames']
+            for key, value in sorted(data['samples']):
+                if data['kind'] != 'histogram':
+                    lines.append(f'{name}{_format_labels(labelnames, key)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip([*data['buckets'], float('inf')], value[:-1]):
+                    cumulative += count
+                    labels = _format_labels(labelnames, key, [('le', _format_value(bound))])
+                    lines.append(f'{name}_bucket{labels} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labelnames, key)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(labelnames, key)} {cumulative}')
+
+        for collector in self._collectors:
+            for name, documentation, kind, samples in collector(snapshot):
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    rendered = _format_labels(list(labels), list(labels.values()))
+                    lines.append(f'{name}{rendered} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    'library_http_requests_total', 'HTTP requests by view action and status.',
+    ('view', 'action', 'method', 'status'),
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    'library_http_request_duration_seconds', 'HTTP request latency by view action.',
+    ('view', 'action', 'method'),
+)
+DB_TIME = REGISTRY.histogram(
+    'library_db_time_seconds', 'Total SQL time per request by view action.',
+    ('view', 'action'),
+)
+DB_QUERIES = REGISTRY.histogram(
+    'library_db_queries_per_request', 'SQL queries per request by view action.',
+    ('view', 'action'), buckets=QUERY_COUNT_BUCKETS,
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'library_cache_requests_total', 'Cache lookups by cache and result (hit/miss).',
+    ('cache', 'result'),
+)
+
+
+@REGISTRY.collector
+def cache_hit_ratio(snapshot):
+    """Hit ratio per cache, derived from the (merged) lookup counters"""
+    totals = {}
+    for (cache, result), value in snapshot.get(CACHE_REQUESTS.name, {}).get('samples', []):
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (value if result == 'hit' else 0), lookups + value)
+    samples = [({'cache': cache}, hits / lookups) for cache, (hits, lookups) in sorted(totals.items()) if lookups]
+    return [('library_cache_hit_ratio', 'Cache hit ratio since start.', 'gauge', samples)]
+
+
+@REGISTRY.collector
+def domain_gauges(snapshot):
+    """Circulation gauges read from the dashboard rollups"""
+    from stats.models import LibraryTotals
+    from transactions.models import Fine
+    from .routers import reporting
+
+    with reporting():
+        totals = LibraryTotals.objects.filter(id=LibraryTotals.SINGLETON_ID).first() or LibraryTotals()
+        pending_fines = Fine.objects.filter(status='pending').count()
+
+    return [
+        ('library_active_loans', 'Books currently on loan.', 'gauge', [({}, totals.active_loans)]),
+        ('library_overdue_loans', 'Loans past their due date.', 'gauge', [({}, totals.overdue_loans)]),
+        ('library_outstanding_fines_amount', 'Unpaid fine balance across all users.', 'gauge',
+         [({}, float(totals.pending_fine_amount))]),
+        ('library_pending_fines', 'Fines awaiting payment.', 'gauge', [({}, pending_fines)]),
+        ('library_book_copies', 'Copies of active books by availability.', 'gauge', [
+            ({'state': 'total'}, totals.total_copies),
+            ({'state': 'available'}, totals.available_copies),
+        ]),
+    ]
+
+
+@REGISTRY.collector
+def job_queue_gauges(snapshot):
+    """Background job backlog per queue and status (finished jobs excluded)"""
+    from jobs.models import Job
+
+    rows = (
+        Job.objects.filter(status__in=Job.ACTIVE_STATUSES)
+        .values_list('queue', 'status').annotate(jobs=Count('id')).order_by()
+    )
+    samples = [({'queue': queue, 'status': status}, jobs) for queue, status, jobs in rows]
+    return [('library_jobs', 'Queued and running background jobs.', 'gauge', samples)]
+
+def view_labels(request):
+    """(view, action) labels for a resolved request, e.g. ('TransactionViewSet', 'borrow')"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched', ''
+    view = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return (view.__name__ if view else match.view_name or match.url_name or 'unknown'), action
+
+
+class MetricsMiddleware:
+    """
+    Records request counts, latency and (when QueryInstrumentationMiddleware
+    runs inside it) per-request SQL time and query counts
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = metrics_settings()
+
+    def __call__(self, request):
+        if not self.options['ENABLED']:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view, action = view_labels(request)
+        REQUESTS.inc(view=view, action=action, method=request.method, status=response.status_code)
+        REQUEST_LATENCY.observe(elapsed, view=view, action=action, method=request.method)
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None:
+            DB_TIME.observe(recorder.duration, view=view, action=action)
+            DB_QUERIES.observe(recorder.count, view=view, action=action)
+
+        if self.options['MULTIPROCESS_DIR']:
+            REGISTRY.maybe_flush(self.options['MULTIPROCESS_DIR'], self.options['FLUSH_INTERVAL'])
+        return response
+
+
+def _ip_allowed(address, allowed):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in allowed)
+
+
+def scrape_allowed(request, options):
+    """
+    Whether request may read /metrics
+
+    Either the bearer token or a client address in ALLOWED_IPS is
+    required; only with DEBUG on and neither configured is it open.
+    """
+    if options['TOKEN']:
+        expected = f'Bearer {options["TOKEN"]}'
+        if constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), expected):
+            return True
+    if _ip_allowed(request.META.get('REMOTE_ADDR', ''), options['ALLOWED_IPS']):
+        return True
+    return settings.DEBUG and not (options['TOKEN'] or options['ALLOWED_IPS'])
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint
+    GET /metrics
+    """
+    options = metrics_settings()
+    if not scrape_allowed(request, options):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(options['MULTIPROCESS_DIR']), content_type=CONTENT_TYPE)
@@ -0,0 +1,185 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries a valid signed X-Profile header (see
+`manage.py profile_token`) or, for librarians and staff, a ?profile=1 query
+flag. The request runs under cProfile and the pstats dump is written to a
+bounded on-disk ring buffer (settings.REQUEST_PROFILING['DIRECTORY']), where
+staff can list and download it from /admin/profiles/. The dumps load in
+pstats, snakeviz or flameprof. Requests without either trigger only pay for
+two dictionary lookups.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse
+from django.template.response import TemplateResponse
+
+SIGNING_SALT = 'library_management.profiling'
+HEADER = 'HTTP_X_PROFILE'
+QUERY_FLAG = 'profile'
+
+DEFAULT_REQUEST_PROFILING = {
+    'ENABLED': True,
+    'DIRECTORY': settings.BASE_DIR / 'profiles',
+    'MAX_PROFILES': 50,
+    'TOKEN_MAX_AGE': 3600,  # seconds a signed X-Profile token stays valid
+}
+
+_PROFILE_NAME = re.compile(r'^[\w.-]+\.prof$')
+
+# Only one cProfile profiler can be active per interpreter at a time
+_profiler_lock = threading.Lock()
+
+
+def profiling_settings():
+    return {**DEFAULT_REQUEST_PROFILING, **getattr(settings, 'REQUEST_PROFILING', {})}
+
+
+def make_profile_token(label=''):
+    """Signed value for the X-Profile header"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(label or 'profile')
+
+
+def _valid_token(value, max_age):
+    try:
+        signing.TimestampSigner(salt=SIGNING_SALT).unsign(value, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _is_librarian_or_staff(request):
+    from accounts.authentication import ClaimsJWTAuthentication
+    from rest_framework.exceptions import AuthenticationFailed
+
+    try:
+        authenticated = ClaimsJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        authenticated = None
+    if authenticated is not None:
+        profile = getattr(authenticated[0], 'profile', None)
+        return getattr(profile, 'role', None) == 'librarian'
+
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+def profile_directory():
+    directory = profiling_settings()['DIRECTORY']
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def list_profiles():
+    """Stored profiles, newest first: [{'name', 'size', 'created'}]"""
+    directory = profile_directory()
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and _PROFILE_NAME.match(entry.name):
+            stat = entry.stat()
+            entries.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'created': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            })
+    return sorted(entries, key=lambda entry: entry['created'], reverse=True)
+
+
+def _trim(max_profiles):
+    for entry in list_profiles()[max_profiles:]:
+        try:
+            os.remove(os.path.join(profile_directory(), entry['name']))
+        except FileNotFoundError:
+            pass
+
+
+def _profile_name(request, elapsed):
+    slug = re.sub(r'[^\w]+', '_', request.path).strip('_')[:60] or 'root'
+    return f'{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 1000000:06d}-' \
+           f'{request.method}-{slug}-{elapsed * 1000:.0f}ms.prof'
+
+
+class ProfilingMiddleware:
+    """Profiles flagged requests and adds an X-Profile-Id response header"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = profiling_settings()
+
+    def wants_profile(self, request):
+        header = request.META.get(HEADER)
+        if header is not None:
+            return _valid_token(header, self.options['TOKEN_MAX_AGE'])
+        if QUERY_FLAG in request.GET:
+            return _is_librarian_or_staff(request)
+        return False
+
+    def __call__(self, request):
+        if not self.options['ENABLED'] or not self.wants_profile(request):
+            return self.get_response(request)
+
+        if not _profiler_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Id'] = 'busy'
+            return response
+
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            name = _profile_name(request, time.perf_counter() - started)
+            profiler.dump_stats(os.path.join(profile_directory(), name))
+        finally:
+            _profiler_lock.release()
+
+        _trim(self.options['MAX_PROFILES'])
+        response['X-Profile-Id'] = name
+        return response
+
+
+@staff_member_required
+def profile_list(request):
+    """
+    List captured profiles
+    GET /admin/profiles/
+    """
+    context = {
+        **site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': list_profiles(),
+        'max_profiles': profiling_settings()['MAX_PROFILES'],
+    }
+    return TemplateResponse(request, 'admin/profiles.html', context)
+
+
+@staff_member_required
+def profile_download(request, name):
+    """
+    Download a profile (pstats dump), or ?format=text for a cumulative-time summary
+    GET /admin/profiles/<name>/
+    """
+    path = os.path.join(profile_directory(), name)
+    if not _PROFILE_NAME.match(name) or not os.path.isfile(path):
+        raise Http404('Profile not found')
+
+    if request.GET.get('format') == 'text':
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(60)
+        return HttpResponse(output.getvalue(), content_type='text/plain; charset=utf-8')
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
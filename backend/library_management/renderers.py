@@ -0,0 +1,97 @@
+"""
+Fast JSON and MessagePack rendering for the REST API.
+
+FastJSONRenderer encodes with orjson when it is installed (and
+settings.FAST_JSON_BACKEND allows it) and otherwise falls back to DRF's
+stdlib JSONRenderer. It converts values the way the stock renderer does:
+Decimal as a number, UTC datetimes with a 'Z' suffix, lazy translation
+strings as text and U+2028/U+2029 escaped. The bytes are not always
+identical: orjson writes floats in their shortest form (1e16 where the
+stdlib writes 1e+16, equal once parsed) and NaN/Infinity as null. Data
+orjson cannot encode at all (integers wider than 64 bits) is rendered by
+the stdlib path instead. Pretty-printed (indent=N) and non-compact output
+always use the stdlib path.
+
+MessagePackRenderer serves application/msgpack (or ?format=msgpack) with the
+same value conversions; it needs the optional msgpack package.
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+BACKENDS = ('auto', 'orjson', 'stdlib')
+
+_stdlib_encoder = encoders.JSONEncoder()
+
+
+def json_backend():
+    """'orjson' or 'stdlib', according to settings.FAST_JSON_BACKEND"""
+    backend = getattr(settings, 'FAST_JSON_BACKEND', 'auto')
+    if backend not in BACKENDS:
+        raise ValueError(f'FAST_JSON_BACKEND must be one of {", ".join(BACKENDS)}.')
+    if backend == 'stdlib' or orjson is None:
+        if backend == 'orjson':
+            raise ImportError('FAST_JSON_BACKEND is "orjson" but orjson is not installed.')
+        return 'stdlib'
+    return 'orjson'
+
+
+def _default(obj):
+    """Types orjson does not encode natively, mirroring DRF's JSONEncoder"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    return _stdlib_encoder.default(obj)
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or json_backend() != 'orjson':
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Keep the output a strict JavaScript subset, like JSONRenderer
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if msgpack is None:
+            raise ImportError('MessagePackRenderer requires the msgpack package.')
+        return msgpack.packb(data, default=_default, use_bin_type=True, datetime=False)
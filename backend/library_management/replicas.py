@@ -0,0 +1,41 @@
+"""
+Local SQLite read replicas refreshed with the online backup API.
+"""
+import os
+import sqlite3
+
+from django.conf import settings
+
+
+def refresh_replica(source, target, pages=1024):
+    """
+    Copy the primary into a replica file without blocking writers for long
+
+    The copy is written next to the target and atomically swapped in, so
+    readers holding the old file keep a consistent snapshot. The copy is
+    switched to rollback-journal mode so no WAL/SHM files outlive the swap.
+    """
+    temporary = f'{target}.refresh'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+
+    primary = sqlite3.connect(str(source))
+    replica = sqlite3.connect(temporary)
+    try:
+        primary.backup(replica, pages=pages)
+        replica.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        replica.close()
+        primary.close()
+    os.replace(temporary, str(target))
+
+
+def refresh_replicas(pages=1024):
+    """Refresh every SQLite replica in settings.DATABASE_REPLICAS"""
+    source = settings.DATABASES['default']['NAME']
+    refreshed = []
+    for alias in getattr(settings, 'DATABASE_REPLICAS', []):
+        target = settings.DATABASES[alias]['NAME']
+        refresh_replica(source, target, pages=pages)
+        refreshed.append(alias)
+    return refreshed
@@ -0,0 +1,139 @@
+"""
+Primary/replica database routing.
+
+Writes always go to 'default'. Reads go to a replica (settings.DATABASE_REPLICAS)
+when they happen inside a safe-method request handled by
+ReplicaRoutingMiddleware, or inside an explicit reporting() block. A client
+that has just written is pinned to the primary for REPLICA_STICKY_SECONDS so
+it always reads its own writes.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import LazyObject, empty
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'db_primary_pin'
+STICKY_CACHE_KEY = 'db:pin:{user_id}'
+
+_routing_state = ContextVar('routing_state', default=None)
+_reporting = ContextVar('reporting', default=False)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def choose_replica():
+    """Pick a replica alias, or the primary when none are configured"""
+    aliases = replicas()
+    return random.choice(aliases) if aliases else PRIMARY
+
+
+class RoutingState:
+    """Per-request routing decisions (see ReplicaRoutingMiddleware)"""
+
+    def __init__(self, request):
+        self.request = request
+        self.replica_ok = request.method in ('GET', 'HEAD', 'OPTIONS')
+        self.wrote = False
+        self.user_pinned = None
+
+    def _authenticated_user_id(self):
+        # Only look at a user that is already resolved; never trigger auth queries
+        user = self.request.__dict__.get('user')
+        if isinstance(user, LazyObject):
+            user = None if user._wrapped is empty else user._wrapped
+        if user is not None and getattr(user, 'is_authenticated', False):
+            return user.pk
+        return None
+
+    def pinned(self):
+        if self.wrote or self.request.COOKIES.get(STICKY_COOKIE):
+            return True
+        if self.user_pinned is None:
+            user_id = self._authenticated_user_id()
+            if user_id is None:
+                return False
+            self.user_pinned = bool(
+                caches['shared'].get(STICKY_CACHE_KEY.format(user_id=user_id))
+            )
+        return self.user_pinned
+
+
+@contextmanager
+def reporting():
+    """Route every read inside the block to a replica (e.g. heavy reports)"""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def for_reporting(queryset):
+    """Explicitly run a report queryset against a replica"""
+    return queryset.using(choose_replica())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replicas():
+            return PRIMARY
+        if _reporting.get():
+            return choose_replica()
+        state = _routing_state.get()
+        if state is not None and state.replica_ok and not state.pinned():
+            return choose_replica()
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are byte copies of the primary
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends reads of safe-method requests to replicas and pins a client to the
+    primary for a short while after it writes (cookie + per-user cache key)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request)
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        if state.wrote and replicas():
+            seconds = sticky_seconds()
+            response.set_cookie(STICKY_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+            user_id = state._authenticated_user_id()
+            if user_id is not None:
+                caches['shared'].set(STICKY_CACHE_KEY.format(user_id=user_id), True, timeout=seconds)
+        return response
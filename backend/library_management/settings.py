@@ -25,21 +25,33 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
 
     # Local apps
     'accounts',
     'books',
+    'branches',
+    'changes',
     'transactions',
+    'jobs',
+    'stats',
+    'benchmarks',
+    'library_management',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'library_management.compression.CompressionMiddleware',
+    'library_management.metrics.MetricsMiddleware',
+    'library_management.instrumentation.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'library_management.routers.ReplicaRoutingMiddleware',
+    'library_management.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,6 +84,70 @@ DATABASES = {
     }
 }
 
+# DB_PROFILE=production switches to the tuned SQLite backend: WAL journal,
+# connection pragmas, BEGIN IMMEDIATE write transactions and a write queue
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'library_management.sqlite',
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,       # ms to wait for the write lock
+            'mmap_size': 268435456,     # 256 MB memory-mapped reads
+            'cache_size': -64000,       # 64 MB page cache
+            'temp_store': 'MEMORY',
+        },
+        'WRITE_QUEUE': True,
+    })
+
+# Read replicas: DB_REPLICAS=N adds N local SQLite copies of the primary
+# (refreshed by `manage.py refresh_replicas`). Safe-method requests read from
+# a replica; a client that just wrote reads from the primary for
+# REPLICA_STICKY_SECONDS.
+DATABASE_REPLICAS = []
+for index in range(1, int(os.environ.get('DB_REPLICAS', 0)) + 1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DB_PROFILE == 'production':
+        # Replicas are swapped in as whole files, so keep them out of WAL mode
+        DATABASES[alias]['PRAGMAS'] = {**DATABASES['default']['PRAGMAS'], 'journal_mode': 'DELETE'}
+        DATABASES[alias]['WRITE_QUEUE'] = False
+    DATABASE_REPLICAS.append(alias)
+
+# Branch partitions: DB_BRANCHES=north,south keeps each listed branch's
+# inventory in its own SQLite file (see branches.partitions). Branches not
+# listed keep their inventory in the primary.
+BRANCH_DATABASES = {}
+for code in filter(None, os.environ.get('DB_BRANCHES', '').split(',')):
+    alias = f'branch_{code}'
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': BASE_DIR / f'db.{alias}.sqlite3'}
+    BRANCH_DATABASES[code] = alias
+
+DATABASE_ROUTERS = [
+    'branches.partitions.BranchRouter',
+    'library_management.routers.ReplicaRouter',
+]
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Caches
+# 'shared' is visible to every worker process on the host (token revocation)
+CACHES = {
+    'default': {
+        'BACKEND': 'library_management.cache.LocMemCache',
+        'METRICS_LABEL': 'default',
+    },
+    'shared': {
+        'BACKEND': 'library_management.cache.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'METRICS_LABEL': 'shared',
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,21 +178,76 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are saved under content-hashed names (see library_management.storage)
+STORAGES = {
+    'default': {'BACKEND': 'library_management.storage.ContentHashedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# GET /media/<path> (see library_management.media). MODE 'x-sendfile' or
+# 'x-accel-redirect' hands the file to the front-end server; 'direct' streams
+# it from Django (sendfile through wsgi.file_wrapper).
+MEDIA_SERVING = {
+    'MODE': os.environ.get('MEDIA_SERVING_MODE', 'direct'),
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+    'IMMUTABLE_MAX_AGE': 31536000,
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'library_management.renderers.FastJSONRenderer',
+        'library_management.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'library_management.parsers.FastJSONParser',
+        'library_management.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+# POST /api/batch/ (see library_management.batch)
+BATCH_API = {
+    'MAX_REQUESTS': 20,
+    'MAX_WORKERS': None,  # concurrent sub-requests; None = min(4, CPU count)
+}
+
+# Catalogue GETs shared between identical concurrent requests, with
+# stale-while-revalidate (see library_management.coalescing)
+COALESCED_RESPONSES = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 5,
+    'STALE': 30,
+    'BYPASS_ROLES': ['librarian'],
+}
+
+# JSON encoder/decoder for the API: 'auto' uses orjson when installed,
+# 'stdlib' forces DRF's json-module implementation
+FAST_JSON_BACKEND = os.environ.get('FAST_JSON_BACKEND', 'auto')
+
+# Response compression (see library_management.compression); zstd and br
+# are offered when the optional zstandard/brotli packages are installed
+RESPONSE_COMPRESSION = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,
+    'ALGORITHMS': ['zstd', 'br', 'gzip'],
+}
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -124,6 +255,109 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.TokenRefreshSerializer',
+}
+
+# In-memory front for refresh-token blacklist checks (see accounts.blacklist)
+TOKEN_BLACKLIST_FILTER = {
+    'CAPACITY': 1000000,   # expected blacklisted tokens before the filter grows
+    'ERROR_RATE': 0.001,   # Bloom false-positive rate (each costs one DB lookup)
+    'LRU_SIZE': 10000,
+}
+
+# Per-request SQL instrumentation (see library_management.instrumentation)
+QUERY_INSTRUMENTATION = {
+    'ENABLED': True,
+    'N_PLUS_ONE_THRESHOLD': 5,
+}
+
+# On-demand request profiling (see library_management.profiling)
+REQUEST_PROFILING = {
+    'ENABLED': True,
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'MAX_PROFILES': 50,
+    'TOKEN_MAX_AGE': 3600,
+}
+
+# Prometheus metrics at /metrics (see library_management.metrics). With
+# several worker processes set METRICS_MULTIPROC_DIR to a directory shared by
+# all of them and cleared on restart. Unless DEBUG is on, scrapes need
+# METRICS_TOKEN as a bearer token or to come from METRICS_ALLOWED_IPS
+# (comma-separated addresses or networks).
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROC_DIR'),
+    'FLUSH_INTERVAL': 1.0,
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+    'ALLOWED_IPS': list(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '').split(','))),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO logs one JSON line per request, WARNING only suspected N+1s
+        'library_management.queries': {
+            'handlers': ['console'],
+            'level': os.environ.get('QUERY_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Librarian dashboard rollups (see stats.rollups)
+DASHBOARD_STATS = {
+    'CACHE_TIMEOUT': 5,
+}
+
+# GET /api/{books,transactions,fines}/changes/?since=<token> (see changes.feed)
+CHANGE_FEED = {
+    'PAGE_SIZE': 500,
+    'SETTLE_SECONDS': 5,
+    'RETENTION_DAYS': 30,
+}
+
+# GET /api/me/dashboard/, cached per user (see transactions.dashboard)
+STUDENT_DASHBOARD = {
+    'DUE_SOON_DAYS': 3,
+    'CACHE_TIMEOUT': 300,
+}
+
+# Database-backed background jobs, run by `manage.py run_jobs` (see
+# jobs.queue). SCHEDULE entries are enqueued by the workers at each cron slot.
+JOB_QUEUE = {
+    'QUEUES': ['default', 'notifications'],
+    'CONCURRENCY': 4,
+    'MODE': 'thread',
+    'POLL_INTERVAL': 1.0,
+    'LEASE_SECONDS': 600,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'KEEP_FINISHED_DAYS': 7,
+    'EAGER': os.environ.get('JOBS_EAGER') == '1',
+    'SCHEDULE': {
+        'mark-overdue-loans': {'task': 'transactions.tasks.mark_overdue_loans', 'cron': '5 0 * * *'},
+        'compact-token-blacklist': {'task': 'accounts.tasks.compact_expired_tokens', 'cron': '30 3 * * *'},
+        'purge-finished-jobs': {'task': 'jobs.tasks.purge_finished_jobs', 'cron': '0 4 * * *'},
+        'rebuild-dashboard-rollups': {'task': 'stats.tasks.rebuild_rollups', 'cron': '15 4 * * *'},
+        'refresh-branch-index': {'task': 'branches.tasks.refresh_branch_index', 'cron': '* * * * *'},
+        'purge-tombstones': {'task': 'changes.tasks.purge_old_tombstones', 'cron': '45 4 * * *'},
+    },
+}
+
+# Outgoing mail (fine notices); the console backend prints instead of sending
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'library@localhost')
+
+# Fine policy used for overdue returns (see transactions.fine_policy)
+FINE_POLICY = {
+    'grace_days': 0,
+    'tiers': [{'from_day': 0, 'rate': 1.0}],  # rate per day, from chargeable day N
+    'cap': None,
+    'role_multipliers': {},
 }
 
 # CORS Settings (for development)
@@ -0,0 +1,13 @@
+"""
+SQLite backend tuned for concurrent production use.
+
+ENGINE 'library_management.sqlite' behaves like django.db.backends.sqlite3
+plus:
+
+* PRAGMAS        -- applied to every new connection (WAL journal, busy
+                    timeout, mmap, cache size, ...)
+* BEGIN IMMEDIATE transactions via library_management.db.write_atomic, so
+  writers take the write lock up front instead of failing on lock upgrade
+* WRITE_QUEUE    -- optional in-process FIFO queue that serializes writers
+                    before they reach SQLite
+"""
@@ -0,0 +1,76 @@
+import threading
+from collections import deque
+
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+
+class WriteQueue:
+    """FIFO lock: writers acquire in arrival order instead of racing for SQLite's lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._owner = None
+
+    def acquire(self):
+        event = threading.Event()
+        with self._lock:
+            if self._owner is None and not self._waiters:
+                self._owner = event
+                return
+            self._waiters.append(event)
+        event.wait()
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._owner = self._waiters.popleft()
+                self._owner.set()
+            else:
+                self._owner = None
+
+
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+
+def get_write_queue(name):
+    """One queue per database file, shared by every thread in the process"""
+    with _write_queues_lock:
+        return _write_queues.setdefault(str(name), WriteQueue())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.begin_immediate = False
+
+    @property
+    def pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+
+    @property
+    def write_queue(self):
+        if self.settings_dict.get('WRITE_QUEUE'):
+            return get_write_queue(self.settings_dict['NAME'])
+        return None
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # write_atomic() sets begin_immediate so the write lock is taken at BEGIN
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
+        self.begin_immediate = False
@@ -0,0 +1,54 @@
+"""
+Content-hashed media storage.
+
+Uploads (book covers, profile pictures) are stored as
+<name>.<hash>.<ext>, where hash is the start of the SHA-256 of the file's
+bytes. A new upload therefore always gets a new URL, which lets the media
+view (library_management.media) mark these files immutable and have
+browsers and proxies cache them for a year. Uploading identical bytes
+again reuses the stored file.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_LENGTH = 12
+HASHED_NAME = re.compile(r'\.[0-9a-f]{%d}(\.[^./]+)?$' % HASH_LENGTH)
+_HASH_SUFFIX = re.compile(r'\.[0-9a-f]{%d}$' % HASH_LENGTH)
+
+
+def is_hashed_name(name):
+    """Whether a media name carries a content hash (and so never changes)"""
+    return bool(HASHED_NAME.search(name))
+
+
+def file_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+class ContentHashedStorage(FileSystemStorage):
+    """FileSystemStorage that names uploads after their content"""
+
+    def hashed_name(self, name, content):
+        root, ext = os.path.splitext(name)
+        # An uploaded name that already looks hashed gets the real hash instead
+        root = _HASH_SUFFIX.sub('', root)
+        return f'{root}.{file_hash(content)}{ext}'
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Same name, same bytes
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,35 @@
+"""
+Test helpers.
+"""
+from contextlib import contextmanager
+
+from .instrumentation import QueryRecorder
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin asserting per-endpoint query budgets
+
+        with self.assertQueryBudget(4):
+            self.client.get('/api/books/')
+
+    Fails when more than max_queries queries run, or when any single query
+    shape runs more than max_repeats times (an N+1 that grows with the data).
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, max_repeats=None):
+        with QueryRecorder() as recorder:
+            yield recorder
+
+        problems = []
+        if recorder.count > max_queries:
+            problems.append(f'{recorder.count} queries run, budget is {max_queries}')
+        if max_repeats is not None:
+            problems.extend(
+                f'shape repeated {count} times (max {max_repeats}): {shape}'
+                for shape, count in recorder.repeated(max_repeats + 1)
+            )
+        if problems:
+            shapes = '\n'.join(f'  {count}x {shape}' for shape, count in recorder.shapes.most_common())
+            self.fail('\n'.join(problems) + '\nQueries by shape:\n' + shapes)
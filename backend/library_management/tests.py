@@ -0,0 +1,647 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from books.models import Author, Book
+from stats.models import LibraryTotals
+from stats.rollups import rebuild_library_totals
+from .compression import COMPRESSORS, CompressionMiddleware, compress, negotiate_encoding
+from .renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from .coalescing import SingleFlight, coalesced_response, request_key
+from .media import file_etag
+from .replicas import refresh_replica
+from .routers import STICKY_COOKIE, for_reporting, reporting
+
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+    def render(self, data):
+        return FastJSONRenderer().render(data), JSONRenderer().render(data)
+
+    def test_matches_stock_renderer(self):
+        fast, stock = self.render({'amount': Decimal('2.50'), 'title': 'A B', 'ids': [1, 2]})
+        self.assertEqual(fast, stock)
+
+    def test_floats_parse_to_the_same_values(self):
+        fast, stock = self.render({'big': 1e16, 'small': 1.5e-7})
+        self.assertEqual(json.loads(fast), json.loads(stock))
+
+    def test_wide_integers_use_the_stock_renderer(self):
+        data = {'id': 2 ** 64, 'negative': -2 ** 70}
+        fast, stock = self.render(data)
+        self.assertEqual(fast, stock)
+        self.assertEqual(json.loads(fast), data)
+
+
+class MetricsAccessTests(TestCase):
+    def scrape(self, **extra):
+        return self.client.get('/metrics', **extra).status_code
+
+    @override_settings(DEBUG=False, METRICS={})
+    def test_closed_without_token_or_allowed_ips(self):
+        self.assertEqual(self.scrape(), 403)
+
+    @override_settings(DEBUG=True, METRICS={})
+    def test_open_in_debug_when_unconfigured(self):
+        self.assertEqual(self.scrape(), 200)
+
+    @override_settings(DEBUG=True, METRICS={'TOKEN': 's'})
+    def test_token(self):
+        self.assertEqual(self.scrape(), 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong'), 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer s'), 200)
+
+    @override_settings(DEBUG=False, METRICS={'TOKEN': 's', 'ALLOWED_IPS': ['10.0.0.0/8']})
+    def test_allowed_ips(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.1.2.3'), 200)
+        self.assertEqual(self.scrape(REMOTE_ADDR='192.0.2.1'), 403)
+        self.assertEqual(self.scrape(REMOTE_ADDR='192.0.2.1', HTTP_AUTHORIZATION='Bearer s'), 200)
+
+
+def updated_columns(queries, table):
+    """Column sets of the UPDATEs on table among captured queries"""
+    columns = []
+    for query in queries.captured_queries:
+        match = re.match(rf'UPDATE "{table}" SET (.*) WHERE', query['sql'])
+        if match:
+            columns.append(set(re.findall(r'"(\w+)" =', match.group(1))))
+    return columns
+
+
+class TrackChangesTests(TestCase):
+    def setUp(self):
+        Book.objects.create(
+            title='Book', isbn='9780000000001', publisher='P', publication_year=2000,
+            total_copies=2, available_copies=2
+        )
+        self.book = Book.objects.get()
+
+    def test_unchanged_save_is_skipped(self):
+        self.book.title = 'Book'
+        self.book.cover_image  # the descriptor swaps in a FieldFile
+        with self.assertNumQueries(0):
+            self.book.save()
+
+    def test_save_updates_dirty_and_auto_now_columns(self):
+        self.book.title = 'Renamed'
+        self.book.available_copies = 1
+        with CaptureQueriesContext(connection) as queries:
+            self.book.save()
+        self.assertEqual(updated_columns(queries, 'books'), [{'title', 'available_copies', 'updated_at'}])
+        self.assertEqual(self.book.get_dirty_fields(), [])
+        self.assertEqual(self.book.get_loaded_value('title'), 'Renamed')
+
+    def test_explicit_update_fields_refresh_only_their_snapshot(self):
+        self.book.title = 'Renamed'
+        self.book.publisher = 'Q'
+        with CaptureQueriesContext(connection) as queries:
+            self.book.save(update_fields=['title'])
+        self.assertEqual(updated_columns(queries, 'books'), [{'title'}])
+        self.assertEqual(self.book.get_dirty_fields(), ['publisher'])
+
+    def test_refresh_from_db_fields_refresh_the_snapshot(self):
+        Book.objects.filter(pk=self.book.pk).update(title='Elsewhere', publisher='Q')
+        self.book.refresh_from_db(fields=['title'])
+        self.assertEqual(self.book.get_loaded_value('title'), 'Elsewhere')
+        self.assertEqual(self.book.get_loaded_value('publisher'), 'P')
+        with self.assertNumQueries(0):
+            self.book.save()
+
+    def test_file_fields_compare_by_name(self):
+        Book.objects.filter(pk=self.book.pk).update(cover_image='book_covers/a.png')
+        book = Book.objects.get()
+        self.assertEqual(book.cover_image.name, 'book_covers/a.png')
+        book.cover_image = 'book_covers/a.png'
+        self.assertEqual(book.get_dirty_fields(), [])
+        book.cover_image = 'book_covers/b.png'
+        self.assertEqual(book.get_dirty_fields(), ['cover_image'])
+        book.cover_image = None
+        self.assertEqual(book.get_dirty_fields(), ['cover_image'])
+
+    def test_loaded_values_drive_the_rollup_deltas(self):
+        rebuild_library_totals()
+        self.book.total_copies = 5
+        self.book.available_copies = 4
+        self.book.save()
+        self.book.is_active = False
+        self.book.save()
+        kept = LibraryTotals.objects.values('total_books', 'total_copies', 'available_copies').get()
+        self.assertEqual(kept, {'total_books': 0, 'total_copies': 0, 'available_copies': 0})
+        rebuild_library_totals()
+        self.assertEqual(LibraryTotals.objects.values('total_books', 'total_copies', 'available_copies').get(), kept)
+
+    def test_loaded_role_drives_token_revocation(self):
+        User.objects.create_user('stu', 'stu@example.com', 'pw')
+        profile = User.objects.get(username='stu').profile
+        with mock.patch('accounts.authentication.revoke_user_tokens') as revoke:
+            profile.phone_number = '555'
+            profile.save()
+            revoke.assert_not_called()
+            profile.role = 'librarian'
+            profile.save()
+            revoke.assert_called_once_with(profile.user_id)
+            # The snapshot now holds the new role
+            profile.save()
+            revoke.assert_called_once()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], COALESCED_RESPONSES={'ENABLED': False})
+class ReplicaRoutingTests(APITestCase):
+    """The replica holds different rows than the primary, so each read shows where it went"""
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        caches['shared'].clear()
+        for alias, title in (('default', 'On primary'), ('replica1', 'On replica')):
+            Book.objects.using(alias).create(
+                title=title, isbn='9780000000001', publisher='P', publication_year=2000,
+                total_copies=1, available_copies=1
+            )
+        self.librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        self.librarian.profile.role = 'librarian'
+        self.librarian.profile.save()
+        self.client.force_authenticate(self.librarian)
+
+    def titles(self):
+        response = self.client.get('/api/books/')
+        self.assertEqual(response.status_code, 200)
+        return [book['title'] for book in response.data['results']]
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.titles(), ['On replica'])
+
+    def test_reporting_reads_from_the_replica(self):
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['On primary'])
+        self.assertEqual(list(for_reporting(Book.objects).values_list('title', flat=True)), ['On replica'])
+        with reporting():
+            self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['On replica'])
+
+    def test_writes_go_to_the_primary_and_pin_the_writer(self):
+        response = self.client.post('/api/books/', {
+            'title': 'New', 'isbn': '9780000000002', 'publisher': 'P', 'publication_year': 2001,
+            'total_copies': 1, 'available_copies': 1, 'author_ids': [Author.objects.create(name='A').id],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(Book.objects.using('default').filter(title='New').exists())
+        self.assertFalse(Book.objects.using('replica1').filter(title='New').exists())
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        # Pinned by the cookie, and by user id for clients that drop it
+        self.assertEqual(sorted(self.titles()), ['New', 'On primary'])
+        self.client.cookies.clear()
+        self.assertEqual(sorted(self.titles()), ['New', 'On primary'])
+
+        # Other users still read from the replica
+        other = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.titles(), ['On replica'])
+
+
+class RefreshReplicaTests(SimpleTestCase):
+    def test_replica_file_is_swapped_for_a_fresh_copy(self):
+        directory = tempfile.mkdtemp()
+        source, target = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+        primary = sqlite3.connect(source)
+        primary.execute('PRAGMA journal_mode = WAL')
+        primary.execute('CREATE TABLE t (v INTEGER)')
+        primary.execute('INSERT INTO t VALUES (1)')
+        primary.commit()
+
+        refresh_replica(source, target)
+        reader = sqlite3.connect(target)  # holds the first copy open across the swap
+        self.assertEqual(reader.execute('SELECT v FROM t').fetchall(), [(1,)])
+
+        primary.execute('INSERT INTO t VALUES (2)')
+        primary.commit()
+        primary.close()
+        refresh_replica(source, target)
+        self.assertEqual(reader.execute('SELECT v FROM t').fetchall(), [(1,)])
+        reader.close()
+
+        replica = sqlite3.connect(target)
+        self.assertEqual(replica.execute('SELECT v FROM t ORDER BY v').fetchall(), [(1,), (2,)])
+        self.assertEqual(replica.execute('PRAGMA journal_mode').fetchone(), ('delete',))
+        replica.close()
+        self.assertEqual(sorted(name for name in os.listdir(directory) if name.startswith('replica')),
+                         ['replica.sqlite3'])
+
+
+@override_settings(COALESCED_RESPONSES={'ENABLED': False})
+class BatchTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.client.force_authenticate(self.student)
+
+    def batch(self, *requests):
+        return self.client.post('/api/batch/', {'requests': list(requests)}, format='json')
+
+    def statuses(self, *paths):
+        response = self.batch(*[{'id': path, 'path': path} for path in paths])
+        self.assertEqual(response.status_code, 200, response.data)
+        return {item['id']: item['status'] for item in response.data['responses']}
+
+    def test_each_item_has_its_own_status(self):
+        response = self.batch({'path': '/api/fines/my_fines/'}, {'id': 'missing', 'path': '/api/nowhere/'})
+        self.assertEqual(response.status_code, 200)
+        first, second = response.data['responses']
+        self.assertEqual((first['id'], first['status']), (0, 200))
+        self.assertEqual(first['body'], self.client.get('/api/fines/my_fines/').data)
+        self.assertEqual((second['id'], second['status']), ('missing', 404))
+
+    def test_permissions_apply_inside_the_batch(self):
+        self.assertEqual(self.statuses('/api/stats/dashboard/'), {'/api/stats/dashboard/': 403})
+        self.client.force_authenticate(None)
+        self.assertEqual(self.batch({'path': '/api/fines/my_fines/'}).status_code, 401)
+
+    def test_only_relative_api_paths_are_run(self):
+        self.assertEqual(self.statuses(
+            'http://example.com/api/books/', '//example.com/api/books/', '/admin/', '/api/batch/',
+        ), {
+            'http://example.com/api/books/': 400, '//example.com/api/books/': 400,
+            '/admin/': 400, '/api/batch/': 400,
+        })
+
+    @override_settings(BATCH_API={'MAX_REQUESTS': 2})
+    def test_batch_size_is_limited(self):
+        self.assertEqual(self.batch(*[{'path': '/api/books/'}] * 2).status_code, 200)
+        self.assertEqual(self.batch(*[{'path': '/api/books/'}] * 3).status_code, 400)
+
+    def test_malformed_batches_are_rejected(self):
+        self.assertEqual(self.batch({'path': '/api/books/', 'method': 'POST'}).status_code, 400)
+        self.assertEqual(self.batch({'id': 'no path'}).status_code, 400)
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.client.post('/api/batch/', [], format='json').status_code, 400)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_run(self):
+        flight, started, release = SingleFlight(), threading.Event(), threading.Event()
+        runs, results = [], []
+
+        def compute():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        def call():
+            results.append(flight.do('key', compute, timeout=5))
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        started.wait(5)
+        threads += [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)  # let the followers join the flight
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(sorted(results), [('value', False)] + [('value', True)] * 3)
+        # The key is free again once the flight lands
+        self.assertEqual(flight.do('key', lambda: 'again'), ('again', False))
+
+    def test_leader_error_reaches_the_caller(self):
+        flight = SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            flight.do('key', lambda: 1 / 0)
+        self.assertEqual(flight.do('key', lambda: 1), (1, False))
+
+
+@override_settings(COALESCED_RESPONSES={'CACHE': 'shared', 'TIMEOUT': 5, 'STALE': 30})
+class CoalescedResponseTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        self.librarian.profile.role = 'librarian'
+        self.librarian.profile.save()
+        self.calls = 0
+
+    def request(self, path='/api/books/popular/', user=None):
+        request = APIRequestFactory().get(path)
+        if user is not None:
+            force_authenticate(request, user)
+        return Request(request)
+
+    def view(self, status=200):
+        def view():
+            self.calls += 1
+            return Response({'call': self.calls}, status=status)
+        return view
+
+    def respond(self, request, status=200):
+        response = coalesced_response('books.popular', request, self.view(status))
+        return response.status_code, response.data
+
+    def test_fresh_entry_is_reused(self):
+        self.assertEqual(self.respond(self.request(user=self.student)), (200, {'call': 1}))
+        self.assertEqual(self.respond(self.request(user=self.student)), (200, {'call': 1}))
+        self.assertEqual(self.calls, 1)
+
+    def test_concurrent_identical_requests_run_the_view_once(self):
+        release, results = threading.Event(), []
+
+        def slow_view():
+            self.calls += 1
+            release.wait(5)
+            return Response({'call': self.calls})
+
+        def get():
+            results.append(coalesced_response('books.popular', self.request(), slow_view).data)
+
+        threads = [threading.Thread(target=get) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)  # all four are waiting on the first
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'call': 1}] * 4)
+
+    def test_key_separates_roles_and_ignores_parameter_order(self):
+        first = request_key('e', self.request('/api/x/?b=2&a=1&c='), 'student')
+        self.assertEqual(first, request_key('e', self.request('/api/x/?a=1&b=2'), 'student'))
+        self.assertNotEqual(first, request_key('e', self.request('/api/x/?a=1&b=2'), 'anonymous'))
+        self.assertNotEqual(first, request_key('e', self.request('/api/x/?a=1&b=3'), 'student'))
+
+        self.respond(self.request(user=self.student))
+        self.respond(self.request())
+        self.assertEqual(self.calls, 2)
+
+    def test_librarians_bypass_the_cache(self):
+        for _ in range(2):
+            self.respond(self.request(user=self.librarian))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.respond(self.request(user=self.student)), (200, {'call': 3}))
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self.respond(self.request(), status=404)[0], 404)
+        self.assertEqual(self.respond(self.request(), status=404)[0], 404)
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_entry_is_served_while_revalidating(self):
+        self.respond(self.request())
+        key = request_key('books.popular', self.request(), 'anonymous')
+        entry = caches['shared'].get(key)
+        caches['shared'].set(key, {**entry, 'fresh_until': time.time() - 1})
+
+        with mock.patch('library_management.coalescing.threads_share_view', return_value=True), \
+                mock.patch('library_management.coalescing._revalidator') as revalidator:
+            self.assertEqual(self.respond(self.request()), (200, {'call': 1}))
+            # A second stale hit does not schedule another revalidation
+            self.assertEqual(self.respond(self.request()), (200, {'call': 1}))
+        revalidator.submit.assert_called_once()
+        self.assertEqual(self.calls, 1)
+
+        run, *args = revalidator.submit.call_args.args
+        run(*args)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.respond(self.request()), (200, {'call': 2}))
+
+
+class MediaServingTests(SimpleTestCase):
+    DATA = bytes(range(100))
+
+    def setUp(self):
+        root = self.enterContext(tempfile.TemporaryDirectory())
+        self.media_root = os.path.join(root, 'media')
+        os.makedirs(os.path.join(self.media_root, 'covers'))
+        for name in ('covers/plain.bin', 'covers/cover.0123456789ab.bin', 'covers/with space.bin'):
+            with open(os.path.join(self.media_root, name), 'wb') as file:
+                file.write(self.DATA)
+        with open(os.path.join(root, 'secret.txt'), 'w') as file:
+            file.write('secret')
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+    def get(self, path='covers/plain.bin', **headers):
+        return self.client.get('/media/' + path, headers=headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.DATA)
+        self.assertEqual(response['ETag'], file_etag(os.stat(os.path.join(self.media_root, 'covers/plain.bin'))))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.client.head('/media/covers/plain.bin').status_code, 200)
+        self.assertEqual(self.client.post('/media/covers/plain.bin').status_code, 405)
+
+    def test_byte_ranges(self):
+        for header, (start, end) in (
+            ('bytes=10-19', (10, 19)),
+            ('bytes=90-', (90, 99)),
+            ('bytes=95-500', (95, 99)),
+            ('bytes=-5', (95, 99)),
+            ('bytes=-500', (0, 99)),
+        ):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/100', header)
+            self.assertEqual(response['Content-Length'], str(end - start + 1), header)
+            self.assertEqual(self.body(response), self.DATA[start:end + 1], header)
+
+        # Several ranges, malformed ranges and a stale If-Range get the whole file
+        for headers in ({'range': 'bytes=0-1,5-6'}, {'range': 'bytes=5-1'}, {'range': 'lines=1-2'},
+                        {'range': 'bytes=0-9', 'if_range': '"stale"'}):
+            response = self.get(**headers)
+            self.assertEqual((response.status_code, self.body(response)), (200, self.DATA), headers)
+        response = self.get(range='bytes=0-9', if_range=self.get()['ETag'])
+        self.assertEqual(response.status_code, 206)
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=100-', 'bytes=-0'):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_conditional_requests(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+        response = self.get(if_modified_since=self.get()['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_paths_outside_media_root(self):
+        for path in ('../secret.txt', '%2E%2E/secret.txt', 'covers/../../secret.txt', 'covers/', 'missing.bin'):
+            self.assertEqual(self.get(path).status_code, 404, path)
+
+    def test_hashed_names_are_immutable(self):
+        response = self.get('covers/cover.0123456789ab.bin')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_offload_modes(self):
+        full_path = os.path.join(self.media_root, 'covers', 'with space.bin')
+        with override_settings(MEDIA_SERVING={'MODE': 'x-sendfile'}):
+            response = self.get('covers/with space.bin', range='bytes=0-9')
+            self.assertEqual((response.status_code, response.content), (200, b''))
+            self.assertEqual(response['X-Sendfile'], full_path)
+            self.assertIn('ETag', response)
+            self.assertEqual(self.get('../secret.txt').status_code, 404)
+
+        with override_settings(MEDIA_SERVING={'MODE': 'x-accel-redirect', 'ACCEL_PREFIX': '/internal/'}):
+            response = self.get('covers/with space.bin')
+            self.assertEqual((response.status_code, response.content), (200, b''))
+            self.assertEqual(response['X-Accel-Redirect'], '/internal/covers/with%20space.bin')
+            self.assertNotIn('X-Sendfile', response)
+            # The conditional headers are still answered by Django
+            self.assertEqual(self.get('covers/with space.bin', if_none_match=response['ETag']).status_code, 304)
+
+
+@override_settings(RESPONSE_COMPRESSION={'ENABLED': True, 'MIN_SIZE': 100, 'ALGORITHMS': ['gzip']})
+class CompressionTests(SimpleTestCase):
+    BODY = json.dumps([{'id': index, 'title': f'Book {index}'} for index in range(50)]).encode()
+
+    def respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation(self):
+        encodings = ['zstd', 'br', 'gzip']
+        for header, expected in (
+            ('gzip, br', 'br'),                     # equal q-values: server preference
+            ('gzip;q=1.0, br;q=0.5', 'gzip'),
+            ('br;q=0, GZIP', 'gzip'),
+            ('*', 'zstd'),
+            ('*;q=0.5, zstd;q=0, gzip', 'gzip'),
+            ('gzip;q=0', None),
+            ('identity', None),
+            ('', None),
+            ('br;q=1.2.3, gzip;q=0.1', 'gzip'),     # unparsable entries are ignored
+        ):
+            self.assertEqual(negotiate_encoding(header, encodings), expected, header)
+        self.assertIsNone(negotiate_encoding('br', ['gzip']))
+
+    def test_compresses_and_weakens_the_etag(self):
+        response = HttpResponse(self.BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+        response = self.respond(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(zlib.decompress(response.content, 31), self.BODY)
+
+    def test_left_alone(self):
+        # Below MIN_SIZE, not accepted, or not worth it: identity, but it still varies
+        for body, accept_encoding in ((self.BODY[:99], 'gzip'), (self.BODY, ''), (self.BODY, 'br'),
+                                      (os.urandom(500), 'gzip')):
+            response = self.respond(HttpResponse(body, content_type='application/json'), accept_encoding)
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual((response.content, response['Vary']), (body, 'Accept-Encoding'))
+
+    def test_skipped_responses(self):
+        responses = [HttpResponse(self.BODY, content_type='image/png'),
+                     HttpResponse(self.BODY, status=206),
+                     HttpResponse(self.BODY, headers={'Content-Encoding': 'br'}),
+                     HttpResponse(self.BODY, headers={'Cache-Control': 'no-transform'})]
+        for response in responses:
+            response = self.respond(response)
+            self.assertEqual(response.content, self.BODY)
+            self.assertNotIn('Vary', response)
+        self.assertEqual(responses[2]['Content-Encoding'], 'br')
+
+    def test_streamed_responses(self):
+        chunks = [self.BODY[start:start + 30] for start in range(0, len(self.BODY), 30)]
+        response = StreamingHttpResponse(iter(chunks), content_type='application/json')
+        response['Content-Length'] = str(len(self.BODY))
+        response = self.respond(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(zlib.decompress(b''.join(response.streaming_content), 31), self.BODY)
+
+        # A stream shorter than MIN_SIZE is sent as-is
+        response = self.respond(StreamingHttpResponse(iter([b'short', b' body'])))
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), b'short body')
+
+    @override_settings(RESPONSE_COMPRESSION={'ENABLED': False})
+    def test_disabled(self):
+        response = self.respond(HttpResponse(self.BODY))
+        self.assertEqual((response.content, response.has_header('Vary')), (self.BODY, False))
+
+    @unittest.skipUnless({'br', 'zstd'} <= set(COMPRESSORS), 'brotli or zstandard is not installed')
+    def test_optional_encodings(self):
+        import brotli
+        import zstandard
+        self.assertEqual(brotli.decompress(compress('br', self.BODY)), self.BODY)
+        self.assertEqual(zstandard.ZstdDecompressor().decompressobj().decompress(compress('zstd', self.BODY)),
+                         self.BODY)
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+@override_settings(COALESCED_RESPONSES={'ENABLED': False})
+class MessagePackTests(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        self.librarian.profile.role = 'librarian'
+        self.librarian.profile.save()
+        self.client.force_authenticate(self.librarian)
+        self.author = Author.objects.create(name='A')
+
+    def test_converts_values_like_json(self):
+        data = {'amount': Decimal('2.50'), 'at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+                'ids': [1, 2], 'empty': None}
+        unpacked = msgpack.unpackb(MessagePackRenderer().render(data), raw=False)
+        self.assertEqual(unpacked, json.loads(FastJSONRenderer().render(data)))
+        self.assertEqual(unpacked['at'], '2024-01-02T03:04:05Z')
+
+    def test_round_trip(self):
+        body = msgpack.packb({
+            'title': 'Packed', 'isbn': '9780000000002', 'publisher': 'P', 'publication_year': 2001,
+            'total_copies': 2, 'available_copies': 2, 'author_ids': [self.author.id],
+        })
+        response = self.client.post('/api/books/', body, content_type='application/msgpack',
+                                    HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        created = msgpack.unpackb(response.content, raw=False)
+        self.assertEqual((created['title'], created['total_copies']), ('Packed', 2))
+
+        packed = self.client.get(f"/api/books/{created['id']}/", HTTP_ACCEPT='application/msgpack')
+        plain = self.client.get(f"/api/books/{created['id']}/")
+        self.assertEqual(msgpack.unpackb(packed.content, raw=False), plain.json())
+        self.assertEqual(self.client.get('/api/books/', {'format': 'msgpack'})['Content-Type'],
+                         'application/msgpack')
+
+        response = self.client.post('/api/books/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(RESPONSE_COMPRESSION={'MIN_SIZE': 200, 'ALGORITHMS': ['gzip']})
+    def test_compressed_through_the_stack(self):
+        for index in range(10):
+            Book.objects.create(title=f'Book {index}', isbn=f'97800000001{index:02d}', publisher='P',
+                                publication_year=2000, total_copies=1, available_copies=1)
+        response = self.client.get('/api/books/', HTTP_ACCEPT='application/msgpack',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(msgpack.unpackb(zlib.decompress(response.content, 31), raw=False)['results']), 10)
@@ -0,0 +1,93 @@
+"""
+Dirty-field tracking for model saves.
+
+TrackChangesMixin snapshots the values loaded from the database and narrows
+a plain save() to UPDATE only the columns that actually changed. When
+nothing changed the UPDATE is skipped altogether.
+"""
+from django.db.models import FileField
+
+
+def _comparable(field, value):
+    # File fields compare by name, whether the value is still the loaded
+    # string or the FieldFile the descriptor wraps it in ('' and None are
+    # both "no file")
+    if isinstance(field, FileField):
+        return getattr(value, 'name', value) or None
+    return value
+
+
+class TrackChangesMixin:
+    """
+    Mixin for models.Model subclasses (list it before models.Model)
+
+    save() without update_fields on a loaded instance becomes
+    save(update_fields=<changed columns + auto_now columns>), or a no-op.
+    Passing update_fields explicitly, force_insert/force_update, or saving a
+    new instance behaves exactly like Model.save().
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def _snapshot_loaded_values(self, attnames=None):
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if attnames is not None and field.attname not in attnames:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = _comparable(field, self.__dict__[field.attname])
+        self._loaded_values = loaded
+
+    def get_loaded_value(self, attname, default=None):
+        """Value of a field as last loaded from / saved to the database"""
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def get_dirty_fields(self):
+        """Names of concrete fields whose value differs from the database"""
+        loaded = getattr(self, '_loaded_values', {})
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            value = _comparable(field, self.__dict__[field.attname])
+            if field.attname not in loaded or loaded[field.attname] != value:
+                dirty.append(field.attname)
+        return dirty
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._snapshot_loaded_values(attnames=set(fields) if fields is not None else None)
+
+    def save(self, *args, **kwargs):
+        narrow = (
+            not args
+            and not self._state.adding
+            and hasattr(self, '_loaded_values')
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not kwargs.get('force_update')
+            and kwargs.get('using', self._state.db) == self._state.db
+        )
+
+        if narrow:
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            auto_now = [
+                field.attname for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False) and field.attname not in dirty
+            ]
+            kwargs['update_fields'] = dirty + auto_now
+
+        super().save(*args, **kwargs)
+
+        if kwargs.get('update_fields') is not None and not narrow:
+            self._snapshot_loaded_values(attnames={
+                self._meta.get_field(name).attname for name in kwargs['update_fields']
+            })
+        else:
+            self._snapshot_loaded_values()
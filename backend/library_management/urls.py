@@ -1,19 +1,35 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from library_management.batch import BatchView
+from library_management.media import serve_media
+from library_management.metrics import metrics_view
+from library_management.profiling import profile_download, profile_list
 
 urlpatterns = [
     # Admin site
+    path('admin/profiles/', profile_list, name='profile-list'),
+    path('admin/profiles/<str:name>/', profile_download, name='profile-download'),
     path('admin/', admin.site.urls),
 
     # API endpoints
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/auth/', include('accounts.urls')),
     path('api/', include('books.urls')),
+    path('api/', include('branches.urls')),
     path('api/', include('transactions.urls')),
+    path('api/', include('stats.urls')),
+
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
+
+    # Uploaded media (cover images, profile pictures), see library_management.media
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
 ]
 
-# Serve media files in development
+# Serve static files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -0,0 +1,22 @@
+from django.contrib import admin
+from .models import LibraryTotals, DailyCirculation
+
+
+@admin.register(LibraryTotals)
+class LibraryTotalsAdmin(admin.ModelAdmin):
+    """Read-only view of the dashboard rollup row"""
+    list_display = ('total_books', 'total_copies', 'available_copies', 'active_loans',
+                    'overdue_loans', 'pending_fine_amount', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyCirculation)
+class DailyCirculationAdmin(admin.ModelAdmin):
+    """Admin interface for daily borrow/return counts"""
+    list_display = ('date', 'borrows', 'returns')
+    date_hierarchy = 'date'
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stats.rollups import rebuild_library_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard rollups (library totals and daily circulation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild daily circulation from this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a YYYY-MM-DD date.')
+        days = rebuild_library_stats(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Library totals rebuilt; {days} day(s) of circulation written.'))
@@ -0,0 +1,43 @@
+from django.db import models
+
+
+class LibraryTotals(models.Model):
+    """
+    Library-wide rollup counters (a single row, id=1)
+
+    Maintained incrementally from the write paths; see stats.rollups.
+    Book figures cover active catalogue books only.
+    """
+    SINGLETON_ID = 1
+
+    total_books = models.IntegerField(default=0)
+    total_copies = models.IntegerField(default=0)
+    available_copies = models.IntegerField(default=0)
+    active_loans = models.IntegerField(default=0)
+    overdue_loans = models.IntegerField(default=0)
+    pending_fine_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'library_totals'
+        verbose_name = 'Library totals'
+        verbose_name_plural = 'Library totals'
+
+    def __str__(self):
+        return f"{self.total_books} books, {self.active_loans} active loans"
+
+
+class DailyCirculation(models.Model):
+    """Borrows and returns per calendar day (TIME_ZONE)"""
+    date = models.DateField(unique=True)
+    borrows = models.IntegerField(default=0)
+    returns = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_circulation'
+        verbose_name = 'Daily circulation'
+        verbose_name_plural = 'Daily circulation'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.borrows} borrowed, {self.returns} returned"
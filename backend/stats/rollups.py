@@ -0,0 +1,183 @@
+"""
+Library-wide rollups for the librarian dashboard.
+
+LibraryTotals (one row) and DailyCirculation (one row per day) are kept
+current with F() updates from the same write paths that maintain the
+UserProfile counters: loan and fine deltas arrive through
+accounts.counters, book inventory through Book.save(), and borrows/returns
+through Transaction.save() and the set-based admin actions. Reading the
+dashboard is therefore two primary-key lookups however large the library
+is, behind a short-TTL cache.
+
+Paths that rewrite inventory in bulk (admin actions, reconciliation)
+recompute the book figures with rebuild_book_totals(), and
+rebuild_library_stats() recomputes everything from the source tables; it
+also runs nightly as a scheduled job to absorb any drift.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCirculation, LibraryTotals
+
+DEFAULT_DASHBOARD_STATS = {
+    'CACHE_TIMEOUT': 5,  # seconds the assembled dashboard is served from cache
+}
+
+CACHE_KEY = 'stats:dashboard'
+ACTIVE_LOAN_STATUSES = ('borrowed', 'overdue')
+
+
+def dashboard_settings():
+    return {**DEFAULT_DASHBOARD_STATS, **getattr(settings, 'DASHBOARD_STATS', {})}
+
+
+def book_contribution(is_active, total_copies, available_copies):
+    """(total_books, total_copies, available_copies) a book adds to the totals"""
+    if not is_active:
+        return 0, 0, 0
+    return 1, total_copies or 0, available_copies or 0
+
+
+def adjust_library_totals(**deltas):
+    """Atomically apply deltas (field name -> amount) to the library totals"""
+    updates = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if not updates:
+        return
+    updated = LibraryTotals.objects.filter(id=LibraryTotals.SINGLETON_ID).update(
+        updated_at=timezone.now(), **updates
+    )
+    if not updated:
+        # First write since the table was created: the source tables
+        # (including the change being recorded) give the right starting point
+        rebuild_library_totals()
+
+
+def record_circulation(borrows=0, returns=0, day=None):
+    """Count borrows/returns against a day (default: today)"""
+    if not (borrows or returns):
+        return
+    day = day or timezone.localdate()
+    updates = {
+        'borrows': F('borrows') + borrows,
+        'returns': F('returns') + returns,
+    }
+    if DailyCirculation.objects.filter(date=day).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyCirculation.objects.create(date=day, borrows=borrows, returns=returns)
+    except IntegrityError:
+        # Another writer created today's row first
+        DailyCirculation.objects.filter(date=day).update(**updates)
+
+
+def _book_totals():
+    from books.models import Book
+
+    totals = Book.objects.filter(is_active=True).aggregate(
+        total_books=Count('id'),
+        total_copies=Sum('total_copies'),
+        available_copies=Sum('available_copies'),
+    )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def rebuild_book_totals():
+    """Recompute only the book figures (after a bulk inventory rewrite)"""
+    if not LibraryTotals.objects.filter(id=LibraryTotals.SINGLETON_ID).update(
+        updated_at=timezone.now(), **_book_totals()
+    ):
+        rebuild_library_totals()
+
+
+def rebuild_library_totals():
+    """Recompute the totals row from books, transactions and fines"""
+    from transactions.models import Fine, Transaction
+
+    values = _book_totals()
+    loans = Transaction.objects.filter(status__in=ACTIVE_LOAN_STATUSES).aggregate(
+        active_loans=Count('id'),
+        overdue_loans=Count('id', filter=Q(status='overdue')),
+    )
+    fines = Fine.objects.filter(status='pending').aggregate(pending_fine_amount=Sum('amount'))
+    values.update({name: value or 0 for name, value in {**loans, **fines}.items()})
+
+    totals, _ = LibraryTotals.objects.update_or_create(id=LibraryTotals.SINGLETON_ID, defaults=values)
+    return totals
+
+
+def rebuild_daily_circulation(since=None):
+    """
+    Recompute DailyCirculation from transaction dates
+
+    since limits the rebuild to days on or after that date. Returns the
+    number of days written.
+    """
+    from transactions.models import Transaction
+
+    borrowed = Transaction.objects.all()
+    returned = Transaction.objects.filter(return_date__isnull=False)
+    if since is not None:
+        borrowed = borrowed.filter(borrow_date__date__gte=since)
+        returned = returned.filter(return_date__date__gte=since)
+
+    days = {}
+    for day, count in borrowed.order_by().values_list(TruncDate('borrow_date')).annotate(count=Count('id')):
+        days.setdefault(day, [0, 0])[0] = count
+    for day, count in returned.order_by().values_list(TruncDate('return_date')).annotate(count=Count('id')):
+        days.setdefault(day, [0, 0])[1] = count
+
+    with transaction.atomic():
+        stale = DailyCirculation.objects.all()
+        if since is not None:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+        DailyCirculation.objects.bulk_create(
+            [DailyCirculation(date=day, borrows=b, returns=r) for day, (b, r) in days.items()],
+            batch_size=1000,
+        )
+    return len(days)
+
+
+def rebuild_library_stats(since=None):
+    """Recompute the totals and the daily circulation history"""
+    from library_management.db import write_atomic
+
+    with write_atomic():
+        rebuild_library_totals()
+        days = rebuild_daily_circulation(since=since)
+    cache.delete(CACHE_KEY)
+    return days
+
+
+def dashboard_stats():
+    """The librarian dashboard figures, from the rollups (cached briefly)"""
+    stats = cache.get(CACHE_KEY)
+    if stats is not None:
+        return stats
+
+    totals = LibraryTotals.objects.filter(id=LibraryTotals.SINGLETON_ID).first()
+    if totals is None:
+        totals = rebuild_library_totals()
+    today = timezone.localdate()
+    circulation = DailyCirculation.objects.filter(date=today).values_list('borrows', 'returns').first()
+    borrows, returns = circulation or (0, 0)
+
+    stats = {
+        'total_books': totals.total_books,
+        'total_copies': totals.total_copies,
+        'available_copies': totals.available_copies,
+        'active_loans': totals.active_loans,
+        'overdue_loans': totals.overdue_loans,
+        'pending_fine_amount': float(totals.pending_fine_amount),
+        'borrows_today': borrows,
+        'returns_today': returns,
+        'date': today.isoformat(),
+        'updated_at': totals.updated_at.isoformat(),
+    }
+    cache.set(CACHE_KEY, stats, dashboard_settings()['CACHE_TIMEOUT'])
+    return stats
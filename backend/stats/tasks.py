@@ -0,0 +1,12 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from jobs.queue import task
+from .rollups import rebuild_library_stats
+
+
+@task(unique=True)
+def rebuild_rollups():
+    """Nightly recount of the dashboard rollups (totals plus the last two days)"""
+    return rebuild_library_stats(since=timezone.localdate() - timedelta(days=1))
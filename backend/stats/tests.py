@@ -0,0 +1,138 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from books.models import Book
+from transactions.bulk import bulk_mark_overdue, bulk_renew, bulk_return
+from transactions.models import Fine, Transaction
+from .models import DailyCirculation, LibraryTotals
+from .rollups import rebuild_library_totals
+
+
+def totals():
+    row = LibraryTotals.objects.values().get()
+    return {name: value for name, value in row.items() if name not in ('id', 'updated_at')}
+
+
+class RollupTests(APITestCase):
+    """The incrementally kept totals equal a full rebuild after each write path"""
+
+    def setUp(self):
+        self.books = [
+            Book.objects.create(
+                title=f'Book {index}', isbn=f'97800000000{index:02d}', publisher='P',
+                publication_year=2000, total_copies=copies, available_copies=copies
+            )
+            for index, copies in enumerate((3, 1, 2))
+        ]
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        self.librarian.profile.role = 'librarian'
+        self.librarian.profile.save()
+        self.client.force_authenticate(self.student)
+
+    def assertMatchesRebuild(self):
+        kept = totals()
+        rebuild_library_totals()
+        self.assertEqual(kept, totals())
+        return kept
+
+    def borrow(self, book):
+        response = self.client.post('/api/transactions/borrow/', {'book_id': book.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Transaction.objects.get(pk=response.data['transaction']['id'])
+
+    def make_overdue(self, loan, days=5):
+        Transaction.objects.filter(pk=loan.pk).update(due_date=timezone.now() - timedelta(days=days))
+
+    def test_borrow_and_return(self):
+        loans = [self.borrow(book) for book in self.books[:2]]
+        kept = self.assertMatchesRebuild()
+        self.assertEqual((kept['active_loans'], kept['available_copies']), (2, 4))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/transactions/{loans[0].id}/return_book/')
+        self.assertEqual(response.status_code, 200, response.data)
+        kept = self.assertMatchesRebuild()
+        self.assertEqual((kept['active_loans'], kept['available_copies']), (1, 5))
+
+        today = DailyCirculation.objects.get(date=timezone.localdate())
+        self.assertEqual((today.borrows, today.returns), (2, 1))
+
+    def test_overdue_return_and_pay(self):
+        loan = self.borrow(self.books[0])
+        self.make_overdue(loan)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/transactions/{loan.id}/return_book/')
+        self.assertEqual(response.status_code, 200, response.data)
+        fine = Fine.objects.get(transaction=loan)
+        kept = self.assertMatchesRebuild()
+        self.assertEqual(kept['pending_fine_amount'], fine.amount)
+
+        response = self.client.post(f'/api/fines/{fine.id}/pay/', {'payment_method': 'card'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.assertMatchesRebuild()['pending_fine_amount'], Decimal('0'))
+
+    def test_waive(self):
+        loan = self.borrow(self.books[0])
+        fine = Fine.objects.create(transaction=loan, user=self.student, amount=Decimal('3.50'), reason='Damage')
+        self.assertEqual(self.assertMatchesRebuild()['pending_fine_amount'], Decimal('3.50'))
+
+        self.client.force_authenticate(self.librarian)
+        response = self.client.post(f'/api/fines/{fine.id}/waive/', {'reason': 'First time'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.assertMatchesRebuild()['pending_fine_amount'], Decimal('0'))
+
+    def test_bulk_actions(self):
+        loans = [self.borrow(book) for book in self.books]
+        self.make_overdue(loans[0])
+
+        self.assertEqual(bulk_mark_overdue(Transaction.objects.filter(pk=loans[0].pk)), 1)
+        self.assertEqual(self.assertMatchesRebuild()['overdue_loans'], 1)
+        self.assertEqual(bulk_renew(Transaction.objects.all()), 2)
+        self.assertMatchesRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = bulk_return(Transaction.objects.all())
+        self.assertEqual((result['returned'], result['fines_created']), (3, 1))
+        kept = self.assertMatchesRebuild()
+        self.assertEqual((kept['active_loans'], kept['overdue_loans']), (0, 0))
+        self.assertEqual(kept['available_copies'], 6)
+
+    def test_book_admin_actions(self):
+        self.borrow(self.books[0])
+        admin = site._registry[Book]
+        request = RequestFactory().post('/admin/books/book/')
+        request.user = self.librarian
+        admin.message_user = lambda *args, **kwargs: None
+
+        admin.mark_as_inactive(request, Book.objects.filter(pk=self.books[1].pk))
+        self.assertEqual(self.assertMatchesRebuild()['total_books'], 2)
+        admin.reset_availability(request, Book.objects.all())
+        self.assertEqual(self.assertMatchesRebuild()['available_copies'], 5)
+        admin.mark_as_active(request, Book.objects.all())
+        self.assertEqual(self.assertMatchesRebuild()['total_copies'], 6)
+
+    def test_book_edits_and_deletes(self):
+        book = self.books[0]
+        book.total_copies, book.available_copies = 5, 5
+        book.save()
+        self.assertEqual(self.assertMatchesRebuild()['total_copies'], 8)
+        self.books[1].delete()
+        self.assertEqual(self.assertMatchesRebuild()['total_books'], 2)
+
+    def test_dashboard_endpoint(self):
+        self.borrow(self.books[0])
+        self.client.force_authenticate(self.librarian)
+        response = self.client.get('/api/stats/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['active_loans'], 1)
+        self.assertEqual(response.data['borrows_today'], 1)
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get('/api/stats/dashboard/').status_code, 403)
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import DashboardStatsView
+
+urlpatterns = [
+    path('stats/dashboard/', DashboardStatsView.as_view(), name='dashboard_stats'),
+]
@@ -0,0 +1,15 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from transactions.views import IsLibrarian
+from .rollups import dashboard_stats
+
+
+class DashboardStatsView(APIView):
+    """
+    API endpoint for the librarian dashboard totals
+    GET /api/stats/dashboard/
+    """
+    permission_classes = [IsLibrarian]
+
+    def get(self, request):
+        return Response(dashboard_stats())
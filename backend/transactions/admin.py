@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils import timezone
 from .models import Transaction, Fine
+from .bulk import bulk_return, bulk_renew, bulk_mark_overdue
 
 
 @admin.register(Transaction)
@@ -78,25 +79,24 @@ class TransactionAdmin(admin.ModelAdmin):
 
     def mark_as_returned(self, request, queryset):
         """Mark selected transactions as returned"""
-        count = 0
-        for transaction in queryset:
-            if transaction.return_book():
-                count += 1
-        self.message_user(request, f'{count} transaction(s) marked as returned.')
+        result = bulk_return(queryset)
+        self.message_user(
+            request,
+            f"{result['returned']} transaction(s) marked as returned, "
+            f"{result['books_updated']} book(s) restocked, "
+            f"{result['fines_created']} fine(s) created (${result['fine_total']:.2f})."
+        )
     mark_as_returned.short_description = 'Mark selected as returned'
 
     def mark_as_overdue(self, request, queryset):
         """Mark selected transactions as overdue"""
-        updated = queryset.filter(status='borrowed').update(status='overdue')
+        updated = bulk_mark_overdue(queryset)
         self.message_user(request, f'{updated} transaction(s) marked as overdue.')
     mark_as_overdue.short_description = 'Mark selected as overdue'
 
     def renew_transactions(self, request, queryset):
         """Renew selected transactions"""
-        count = 0
-        for transaction in queryset:
-            if transaction.renew():
-                count += 1
+        count = bulk_renew(queryset)
         self.message_user(request, f'{count} transaction(s) renewed successfully.')
     renew_transactions.short_description = 'Renew selected transactions'
 
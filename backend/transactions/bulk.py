@@ -0,0 +1,181 @@
+"""
+Set-based circulation operations used by the admin actions.
+
+These work on querysets with batched UPDATEs instead of calling
+Transaction.return_book()/renew() per row, so selecting thousands of rows
+costs a handful of queries rather than several per transaction.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from accounts.counters import apply_profile_counter_deltas
+from branches.inventory import restock_on_commit
+from branches.models import Branch
+from stats.rollups import adjust_library_totals, record_circulation
+from .dashboard import invalidate_student_dashboards
+from .fine_policy import as_money, get_fine_policy
+from .models import Transaction, Fine
+
+ACTIVE_STATUSES = ['borrowed', 'overdue']
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def increment_available_copies(book_counts, chunk_size=500):
+    """
+    Add returned copies back to inventory
+
+    book_counts maps book_id -> copies returned. Books that received the same
+    number of copies share one UPDATE, and availability is clamped to
+    total_copies just like Book.save() does. The rows are locked first so
+    the copies actually restocked (after clamping) can be added to the
+    library totals without recounting every book.
+    """
+    from books.models import Book
+
+    restocked = 0
+    for ids in _chunks(list(book_counts), chunk_size):
+        for book_id, available, total in (
+            Book.objects.select_for_update().filter(id__in=ids, is_active=True)
+            .order_by().values_list('id', 'available_copies', 'total_copies')
+        ):
+            restocked += max(min(available + book_counts[book_id], total) - available, 0)
+
+    by_increment = defaultdict(list)
+    for book_id, count in book_counts.items():
+        by_increment[count].append(book_id)
+
+    updated = 0
+    now = timezone.now()
+    for increment, book_ids in by_increment.items():
+        for ids in _chunks(book_ids, chunk_size):
+            updated += Book.objects.filter(id__in=ids).update(
+                available_copies=Least(F('available_copies') + increment, F('total_copies')),
+                updated_at=now
+            )
+    adjust_library_totals(available_copies=restocked)
+    return updated
+
+
+def bulk_return(queryset, policy=None, chunk_size=500):
+    """
+    Return every active transaction in queryset
+
+    Returns a dict of progress counts: returned, books_updated,
+    fines_created and fine_total.
+    """
+    policy = policy or get_fine_policy()
+    now = timezone.now()
+    today = now.date()
+
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(status__in=ACTIVE_STATUSES).order_by().values_list(
+                'id', 'book_id', 'user_id', 'due_date', 'user__profile__role', 'status', 'branch_id'
+            )
+        )
+        if not rows:
+            return {'returned': 0, 'books_updated': 0, 'fines_created': 0, 'fine_total': 0}
+
+        returned = 0
+        for chunk in _chunks(rows, chunk_size):
+            returned += Transaction.objects.filter(
+                id__in=[row[0] for row in chunk],
+                status__in=ACTIVE_STATUSES
+            ).update(status='returned', return_date=now, updated_at=now)
+
+        books_updated = increment_available_copies(
+            Counter(row[1] for row in rows if row[6] is None), chunk_size=chunk_size
+        )
+        # Branch loans restock their lending branch once this commits
+        branch_counts = defaultdict(Counter)
+        for row in rows:
+            if row[6] is not None:
+                branch_counts[row[6]][row[1]] += 1
+        for branch in Branch.objects.filter(id__in=list(branch_counts)):
+            restock_on_commit(branch, branch_counts[branch.id])
+        record_circulation(returns=returned)
+
+        overdue = [row for row in rows if row[3] < today]
+        amounts = policy.evaluate(
+            [(today - row[3]).days for row in overdue],
+            [row[4] for row in overdue]
+        )
+        fines = [
+            Fine(
+                transaction_id=row[0],
+                user_id=row[2],
+                amount=as_money(amount),
+                reason=f'Overdue by {(today - row[3]).days} days'
+            )
+            for row, amount in zip(overdue, amounts)
+            if amount > 0
+        ]
+        Fine.objects.bulk_create(fines, batch_size=chunk_size)
+
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for row in rows:
+            deltas[row[2]][0] -= 1
+            deltas[row[2]][1] -= int(row[5] == 'overdue')
+        for fine in fines:
+            deltas[fine.user_id][2] += fine.amount
+        apply_profile_counter_deltas(deltas, chunk_size=chunk_size)
+        invalidate_student_dashboards(deltas)
+
+    return {
+        'returned': returned,
+        'books_updated': books_updated,
+        'fines_created': len(fines),
+        'fine_total': float(sum(fine.amount for fine in fines)),
+    }
+
+
+def bulk_mark_overdue(queryset, chunk_size=500):
+    """Flag every borrowed transaction in queryset as overdue"""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(status='borrowed').order_by().values_list('id', 'user_id')
+        )
+        updated = 0
+        for chunk in _chunks(rows, chunk_size):
+            updated += Transaction.objects.filter(
+                id__in=[row[0] for row in chunk],
+                status='borrowed'
+            ).update(status='overdue', updated_at=now)
+
+        deltas = Counter(row[1] for row in rows)
+        apply_profile_counter_deltas(
+            {user_id: (0, count, 0) for user_id, count in deltas.items()},
+            chunk_size=chunk_size
+        )
+        invalidate_student_dashboards(deltas)
+    return updated
+
+
+def bulk_renew(queryset, days=14):
+    """Renew every renewable transaction in queryset with a single UPDATE
+
+    The affected users are read first so their dashboards can be dropped.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        renewable = queryset.filter(
+            status='borrowed',
+            renewal_count__lt=F('max_renewals'),
+            due_date__gte=now.date()
+        )
+        invalidate_student_dashboards(renewable.order_by().values_list('user_id', flat=True).distinct())
+        return renewable.update(
+            due_date=F('due_date') + timedelta(days=days),
+            renewal_count=F('renewal_count') + 1,
+            updated_at=now
+        )
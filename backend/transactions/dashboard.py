@@ -0,0 +1,152 @@
+"""
+The student dashboard: current loans, fines and borrowing headroom.
+
+GET /api/me/dashboard/ replaces the client-side bookkeeping done over the
+full transaction and fine lists. It is assembled from three indexed
+queries (the user's active transactions by (user, status), one aggregate
+over their fines by (user, status), and their profile) and cached per user
+in the shared cache, so every worker process sees the same entry.
+
+The entry is dropped after the writes that change it commit: loan and
+fine saves/deletes, renewals, profile changes and the set-based admin
+actions all call invalidate_student_dashboards() with the users they
+touched. Due states depend on the date, so the key includes it and
+entries also expire after CACHE_TIMEOUT.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+DEFAULT_STUDENT_DASHBOARD = {
+    'DUE_SOON_DAYS': 3,      # loans due within this many days are flagged 'due_soon'
+    'CACHE_TIMEOUT': 300,
+}
+
+DASHBOARD_CACHE = 'shared'
+CACHE_KEY = 'me:dashboard:{user_id}:{date}'
+ACTIVE_LOAN_STATUSES = ('borrowed', 'overdue')
+
+
+def student_dashboard_settings():
+    return {**DEFAULT_STUDENT_DASHBOARD, **getattr(settings, 'STUDENT_DASHBOARD', {})}
+
+
+def _cache():
+    return caches[DASHBOARD_CACHE]
+
+
+def _cache_key(user_id, day=None):
+    return CACHE_KEY.format(user_id=user_id, date=(day or timezone.localdate()).isoformat())
+
+
+def invalidate_student_dashboards(user_ids):
+    """Drop the cached dashboards of user_ids once the current transaction commits"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def drop():
+        today = timezone.localdate()
+        _cache().delete_many([_cache_key(user_id, today) for user_id in user_ids])
+
+    # Deleting before commit would let a concurrent read re-cache the old rows
+    transaction.on_commit(drop)
+
+
+def due_state(due_date, today, due_soon_days):
+    """'overdue', 'due_soon' or 'ok' for an active loan"""
+    if due_date < today:
+        return 'overdue'
+    if (due_date - today).days <= due_soon_days:
+        return 'due_soon'
+    return 'ok'
+
+
+def build_student_dashboard(user_id):
+    """Assemble the dashboard for user_id from the database (three queries)"""
+    from accounts.models import UserProfile
+    from .models import Fine, Transaction
+
+    options = student_dashboard_settings()
+    today = timezone.localdate()
+
+    loans = list(
+        Transaction.objects.filter(user_id=user_id, status__in=ACTIVE_LOAN_STATUSES)
+        .select_related('book')
+        .only(
+            'id', 'status', 'borrow_date', 'due_date', 'renewal_count', 'max_renewals',
+            'book__id', 'book__title', 'book__isbn', 'book__cover_image'
+        )
+        .order_by('due_date', 'id')
+    )
+    fines = Fine.objects.filter(user_id=user_id).aggregate(
+        pending_amount=Sum('amount', filter=Q(status='pending')),
+        pending_count=Count('id', filter=Q(status='pending')),
+    )
+    profile = UserProfile.objects.only(
+        'user_id', 'role', 'max_books_allowed', 'active_loans', 'overdue_loans', 'outstanding_fine_balance'
+    ).get(user_id=user_id)
+
+    items = []
+    counts = {'active': len(loans), 'overdue': 0, 'due_soon': 0}
+    for loan in loans:
+        state = due_state(loan.due_date, today, options['DUE_SOON_DAYS'])
+        if state != 'ok':
+            counts[state] += 1
+        renewable = (
+            loan.status == 'borrowed'
+            and state != 'overdue'
+            and loan.renewal_count < loan.max_renewals
+        )
+        items.append({
+            'id': loan.id,
+            'book': {
+                'id': loan.book.id,
+                'title': loan.book.title,
+                'isbn': loan.book.isbn,
+                'cover_image': loan.book.cover_image.url if loan.book.cover_image else None,
+            },
+            'borrow_date': loan.borrow_date.isoformat(),
+            'due_date': loan.due_date.isoformat(),
+            'due_state': state,
+            'days_until_due': (loan.due_date - today).days,
+            'renewal_count': loan.renewal_count,
+            'renewals_left': max(loan.max_renewals - loan.renewal_count, 0),
+            'can_renew': renewable,
+        })
+
+    pending_amount = fines['pending_amount'] or 0
+    # From the counters BorrowBookSerializer checks, so can_borrow matches
+    # what a borrow would do (counts['overdue'] is by due date and runs
+    # ahead of the nightly job that marks loans overdue)
+    headroom = max(profile.max_books_allowed - profile.active_loans, 0)
+    blocked = profile.borrowing_blocks()
+
+    return {
+        'date': today.isoformat(),
+        'loans': items,
+        'counts': counts,
+        'fines': {
+            'pending_amount': float(pending_amount),
+            'pending_count': fines['pending_count'],
+        },
+        'borrowing': {
+            'max_books_allowed': profile.max_books_allowed,
+            'active_loans': profile.active_loans,
+            'headroom': headroom,
+            'can_borrow': not blocked,
+            'blocked_by': blocked,
+        },
+    }
+
+
+def student_dashboard(user_id):
+    """The dashboard for user_id, from the per-user cache when possible"""
+    key = _cache_key(user_id)
+    dashboard = _cache().get(key)
+    if dashboard is None:
+        dashboard = build_student_dashboard(user_id)
+        _cache().set(key, dashboard, student_dashboard_settings()['CACHE_TIMEOUT'])
+    return dashboard
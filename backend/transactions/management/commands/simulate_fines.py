@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.fine_policy import FinePolicy, get_fine_policy, simulate_fines
+
+
+class Command(BaseCommand):
+    help = 'Run a what-if fine policy across all historical transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-days', type=int, default=None,
+                            help='Overdue days that are not charged')
+        parser.add_argument('--tier', action='append', default=[], metavar='FROM_DAY:RATE',
+                            help='Per-day rate starting at a chargeable day (repeatable)')
+        parser.add_argument('--cap', type=float, default=None,
+                            help='Maximum fine per transaction')
+        parser.add_argument('--multiplier', action='append', default=[], metavar='ROLE=FACTOR',
+                            help='Per-role multiplier (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=100000)
+        parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    def handle(self, *args, **options):
+        policy_data = get_fine_policy().to_dict()
+
+        try:
+            if options['grace_days'] is not None:
+                policy_data['grace_days'] = options['grace_days']
+            if options['tier']:
+                policy_data['tiers'] = [
+                    {'from_day': int(start), 'rate': float(rate)}
+                    for start, rate in (tier.split(':') for tier in options['tier'])
+                ]
+            if options['cap'] is not None:
+                policy_data['cap'] = options['cap']
+            if options['multiplier']:
+                policy_data['role_multipliers'] = {
+                    role: float(factor)
+                    for role, factor in (item.split('=') for item in options['multiplier'])
+                }
+            policy = FinePolicy.from_dict(policy_data)
+        except ValueError as exc:
+            raise CommandError(f'Invalid policy: {exc}')
+
+        report = simulate_fines(policy, chunk_size=options['chunk_size'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f'Policy: {policy}')
+        self.stdout.write(f"Transactions:        {report['transactions']}")
+        self.stdout.write(f"Fined transactions:  {report['fined_transactions']}")
+        self.stdout.write(f"Total amount:        ${report['total_amount']:.2f}")
+        self.stdout.write(f"Current policy:      ${report['current_policy_total']:.2f}")
+        self.stdout.write(f"Difference:          ${report['difference']:.2f}")
+        self.stdout.write(f"Average fine:        ${report['average_fine']:.2f}")
+        for role, entry in sorted(report['by_role'].items()):
+            self.stdout.write(
+                f"  {role}: {entry['fined_transactions']}/{entry['transactions']} fined, "
+                f"${entry['total_amount']:.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS('Simulation complete.'))
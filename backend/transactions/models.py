@@ -1,9 +1,18 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
-
-class Transaction(models.Model):
+from accounts.counters import adjust_profile_counters, loan_counter_deltas
+from accounts.models import UserProfile
+from branches.inventory import restock_on_commit
+from changes.feed import record_deletion
+from library_management.tracking import TrackChangesMixin
+from stats.rollups import record_circulation
+from .dashboard import invalidate_student_dashboards
+
+class Transaction(TrackChangesMixin, models.Model):
     STATUS_CHOICES = (
         ('borrowed', 'Borrowed'),
         ('returned', 'Returned'),
@@ -12,6 +21,14 @@ class Transaction(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     book = models.ForeignKey('books.Book', on_delete=models.CASCADE, related_name='transactions')
+    # Lending branch; loans without one draw on Book.available_copies directly
+    branch = models.ForeignKey(
+        'branches.Branch',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='transactions'
+    )
 
     # Transaction Details
     borrow_date = models.DateTimeField(auto_now_add=True)
@@ -45,7 +62,11 @@ class Transaction(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['book', 'status']),
+            models.Index(fields=['branch', 'status']),
             models.Index(fields=['due_date']),
+            # Change feeds (see changes.feed)
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['user', 'updated_at']),
         ]
 
     def __str__(self):
@@ -53,7 +74,7 @@ class Transaction(models.Model):
 
     @property
     def is_overdue(self):
-        if self.status == 'borrowed' and self.due_date:
+        if self.status in ['borrowed', 'overdue'] and self.due_date:
             return timezone.now().date() > self.due_date
         return False
 
@@ -87,17 +108,39 @@ class Transaction(models.Model):
         if self.status == 'borrowed' and self.is_overdue:
             self.status = 'overdue'
 
+        old_status = None if self._state.adding else self.get_loaded_value('status')
         super().save(*args, **kwargs)
 
+        active, overdue = loan_counter_deltas(old_status, self.status)
+        adjust_profile_counters(self.user_id, active_loans=active, overdue_loans=overdue)
+
+        # Daily borrow/return rollup for the librarian dashboard
+        if old_status is None:
+            record_circulation(borrows=1)
+        elif active < 0 and self.status == 'returned':
+            record_circulation(returns=1)
+
+        invalidate_student_dashboards([self.user_id])
+
     def return_book(self):
-        """Mark the book as returned"""
+        """
+        Mark the book as returned
+
+        Call inside a write transaction: the status is re-read there, so of
+        two concurrent returns of a loan only one restocks the copy.
+        """
+        from books.inventory import return_copy
+
+        self.refresh_from_db(fields=['status'])
         if self.status in ['borrowed', 'overdue']:
             self.status = 'returned'
             self.return_date = timezone.now()
 
-            # Increase available copies
-            self.book.available_copies += 1
-            self.book.save()
+            # Increase available copies (at the lending branch, if any)
+            if self.branch_id is not None:
+                restock_on_commit(self.branch, {self.book_id: 1})
+            else:
+                return_copy(self.book_id)
 
             self.save()
             return True
@@ -113,7 +156,7 @@ class Transaction(models.Model):
         return False
 
 
-class Fine(models.Model):
+class Fine(TrackChangesMixin, models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
         ('paid', 'Paid'),
@@ -159,6 +202,9 @@ class Fine(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['status']),
+            # Change feeds (see changes.feed)
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['user', 'updated_at']),
         ]
 
     def __str__(self):
@@ -168,6 +214,23 @@ class Fine(models.Model):
     def is_paid(self):
         return self.status == 'paid'
 
+    @property
+    def outstanding_amount(self):
+        """Amount counted towards the user's outstanding balance"""
+        return self.amount if self.status == 'pending' else 0
+
+    def save(self, *args, **kwargs):
+        old_outstanding = 0
+        if not self._state.adding and self.get_loaded_value('status') == 'pending':
+            old_outstanding = self.get_loaded_value('amount', 0)
+        super().save(*args, **kwargs)
+
+        adjust_profile_counters(
+            self.user_id,
+            fine_balance=self.outstanding_amount - old_outstanding
+        )
+        invalidate_student_dashboards([self.user_id])
+
     def mark_as_paid(self, payment_method='', payment_reference=''):
         """Mark the fine as paid"""
         if self.status == 'pending':
@@ -190,6 +253,30 @@ class Fine(models.Model):
         return False
 
     @staticmethod
-    def calculate_fine(days_overdue, rate_per_day=1.0):
-        """Calculate fine based on days overdue"""
-        return days_overdue * rate_per_day
\ No newline at end of file
+    def calculate_fine(days_overdue, role=None, policy=None):
+        """Calculate fine based on days overdue using the configured fine policy"""
+        from .fine_policy import get_fine_policy
+
+        policy = policy or get_fine_policy()
+        return policy.amount_for(days_overdue, role=role)
+
+
+@receiver(post_delete, sender=Transaction)
+def release_transaction_counters(sender, instance, **kwargs):
+    active, overdue = loan_counter_deltas(instance.status, None)
+    adjust_profile_counters(instance.user_id, active_loans=active, overdue_loans=overdue)
+    invalidate_student_dashboards([instance.user_id])
+    record_deletion(instance, owner_id=instance.user_id)
+
+
+@receiver(post_delete, sender=Fine)
+def release_fine_balance(sender, instance, **kwargs):
+    adjust_profile_counters(instance.user_id, fine_balance=-instance.outstanding_amount)
+    invalidate_student_dashboards([instance.user_id])
+    record_deletion(instance, owner_id=instance.user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def refresh_student_dashboard(sender, instance, **kwargs):
+    # The borrowing limit and account status feed the dashboard's headroom
+    invalidate_student_dashboards([instance.user_id])
@@ -19,7 +19,7 @@ class TransactionListSerializer(serializers.ModelSerializer):
         model = Transaction
         fields = [
             'id', 'user', 'user_name', 'user_full_name', 'book',
-            'book_title', 'book_isbn', 'borrow_date', 'due_date',
+            'book_title', 'book_isbn', 'branch', 'borrow_date', 'due_date',
             'return_date', 'status', 'is_overdue', 'days_overdue',
             'days_until_due', 'renewal_count', 'can_renew'
         ]
@@ -46,7 +46,7 @@ class TransactionDetailSerializer(serializers.ModelSerializer):
         model = Transaction
         fields = [
             'id', 'user', 'user_name', 'user_full_name', 'book',
-            'book_title', 'book_isbn', 'book_cover', 'borrow_date',
+            'book_title', 'book_isbn', 'book_cover', 'branch', 'borrow_date',
             'due_date', 'return_date', 'status', 'notes', 'approved_by',
             'approved_by_name', 'renewal_count', 'max_renewals',
             'is_overdue', 'days_overdue', 'days_until_due', 'can_renew',
@@ -62,54 +62,67 @@ class TransactionDetailSerializer(serializers.ModelSerializer):
 class BorrowBookSerializer(serializers.Serializer):
     """Serializer for borrowing a book"""
     book_id = serializers.IntegerField(required=True)
+    branch = serializers.SlugField(required=False)
     notes = serializers.CharField(required=False, allow_blank=True)
 
     def validate_book_id(self, value):
         """Validate book exists and is available"""
         from books.models import Book
+        from branches.inventory import is_branch_held
 
         try:
             book = Book.objects.get(id=value)
         except Book.DoesNotExist:
             raise serializers.ValidationError("Book not found.")
 
-        if not book.is_available:
-            raise serializers.ValidationError("This book is not available for borrowing.")
+        # Branch loans are checked against the branch's own copies instead
+        if not self.initial_data.get('branch'):
+            if is_branch_held(book.id):
+                raise serializers.ValidationError("This book is lent by branches; choose a branch.")
+            if not book.is_available:
+                raise serializers.ValidationError("This book is not available for borrowing.")
 
         if not book.is_active:
             raise serializers.ValidationError("This book is not active in the system.")
 
         return value
 
+    def validate_branch(self, value):
+        """Validate the lending branch exists and is open"""
+        from branches.models import Branch
+
+        try:
+            branch = Branch.objects.get(code=value)
+        except Branch.DoesNotExist:
+            raise serializers.ValidationError("Branch not found.")
+
+        if not branch.is_active:
+            raise serializers.ValidationError("This branch is not lending books.")
+
+        return branch
+
     def validate(self, attrs):
         """Validate user can borrow more books"""
-        user = self.context['request'].user
+        profile = self.context['request'].user.profile
+        blocks = profile.borrowing_blocks()
 
         # Check if user has reached their borrowing limit
-        if not user.profile.can_borrow_more:
+        if 'borrowing_limit' in blocks:
             raise serializers.ValidationError(
-                f"You have reached your borrowing limit of {user.profile.max_books_allowed} books."
+                f"You have reached your borrowing limit of {profile.max_books_allowed} books."
             )
 
         # Check if user has any overdue books
-        overdue_transactions = Transaction.objects.filter(
-            user=user,
-            status='overdue'
-        )
-        if overdue_transactions.exists():
+        if 'overdue_loans' in blocks:
             raise serializers.ValidationError(
                 "You have overdue books. Please return them before borrowing new ones."
             )
 
         # Check if user has unpaid fines
-        unpaid_fines = Fine.objects.filter(
-            user=user,
-            status='pending'
-        )
-        if unpaid_fines.exists():
-            total_unpaid = sum(fine.amount for fine in unpaid_fines)
+        if 'unpaid_fines' in blocks:
             raise serializers.ValidationError(
-                f"You have unpaid fines totaling ${total_unpaid}. Please pay them before borrowing."
+                f"You have unpaid fines totaling ${profile.outstanding_fine_balance}. "
+                f"Please pay them before borrowing."
             )
 
         return attrs
@@ -241,4 +254,36 @@ class CreateFineSerializer(serializers.ModelSerializer):
         if attrs['transaction'].user != attrs['user']:
             raise serializers.ValidationError("Transaction does not belong to this user.")
 
-        return attrs
\ No newline at end of file
+        return attrs
+
+class FineTierSerializer(serializers.Serializer):
+    """Serializer for a single fine-policy tier"""
+    from_day = serializers.IntegerField(min_value=0)
+    rate = serializers.FloatField(min_value=0)
+
+
+class FinePolicySerializer(serializers.Serializer):
+    """Serializer for a what-if fine policy (librarian only)"""
+    grace_days = serializers.IntegerField(min_value=0, default=0)
+    tiers = FineTierSerializer(many=True, required=False)
+    cap = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    role_multipliers = serializers.DictField(
+        child=serializers.FloatField(min_value=0),
+        required=False
+    )
+
+    def validate_tiers(self, value):
+        """Validate the first tier starts at day 0"""
+        if value and min(tier['from_day'] for tier in value) != 0:
+            raise serializers.ValidationError("The first tier must start at day 0.")
+        return value
+
+    def validate_role_multipliers(self, value):
+        """Validate roles exist"""
+        from accounts.models import UserProfile
+
+        valid_roles = {role for role, _ in UserProfile.USER_ROLES}
+        unknown = set(value) - valid_roles
+        if unknown:
+            raise serializers.ValidationError(f"Unknown roles: {', '.join(sorted(unknown))}.")
+        return value
@@ -0,0 +1,31 @@
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from jobs.queue import task
+from .bulk import bulk_mark_overdue
+from .models import Transaction, Fine
+
+
+@task(unique=True)
+def mark_overdue_loans():
+    """Flag borrowed loans past their due date, which otherwise only happens on save"""
+    return bulk_mark_overdue(
+        Transaction.objects.filter(status='borrowed', due_date__lt=timezone.now().date())
+    )
+
+
+@task(queue='notifications', max_attempts=8)
+def send_fine_notice(fine_id):
+    """Email the borrower about a new fine"""
+    fine = Fine.objects.select_related('user', 'transaction__book').filter(id=fine_id).first()
+    if fine is None or fine.status != 'pending' or not fine.user.email:
+        return
+    send_mail(
+        subject=f'Library fine: ${fine.amount}',
+        message=(
+            f'A fine of ${fine.amount} was added to your account for '
+            f'"{fine.transaction.book.title}" ({fine.reason}).'
+        ),
+        from_email=None,
+        recipient_list=[fine.user.email],
+    )
@@ -1,3 +1,360 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.counters import rebuild_profile_counters
+from accounts.models import UserProfile
+from books.inventory import lend_copy
+from books.models import Book
+from library_management.testing import QueryBudgetMixin
+from stats.models import LibraryTotals
+from stats.rollups import rebuild_library_totals
+from .bulk import bulk_return
+from .fine_policy import FinePolicy, simulate_fines
+from .models import Fine, Transaction
+
+
+def make_book(copies=1, **fields):
+    fields.setdefault('isbn', f'978000000{Book.objects.count():04d}')
+    return Book.objects.create(
+        title='Book', publisher='P', publication_year=2000,
+        total_copies=copies, available_copies=copies, **fields
+    )
+
+
+def totals():
+    """The rollup figures (without the bookkeeping columns)"""
+    row = LibraryTotals.objects.values().get()
+    return {name: value for name, value in row.items() if name not in ('id', 'updated_at')}
+
+
+class CirculationTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.client.force_authenticate(self.student)
+
+    def test_last_copy_is_lent_once(self):
+        book = make_book(copies=1)
+        self.assertTrue(lend_copy(book.id))
+        self.assertFalse(lend_copy(book.id))
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 0)
+
+    def test_borrow_and_double_return(self):
+        book = make_book(copies=2)
+        response = self.client.post('/api/transactions/borrow/', {'book_id': book.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        loan_id = response.data['transaction']['id']
+
+        # Two requests that both loaded the loan while it was still borrowed
+        first, second = Transaction.objects.get(pk=loan_id), Transaction.objects.get(pk=loan_id)
+        self.assertTrue(first.return_book())
+        self.assertFalse(second.return_book())
+
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 2)
+        self.assertEqual(UserProfile.objects.get(user=self.student).active_loans, 0)
+        response = self.client.post(f'/api/transactions/{loan_id}/return_book/')
+        self.assertEqual(response.status_code, 400)
+
+        expected = totals()
+        rebuild_library_totals()
+        self.assertEqual(totals(), expected)
+
+    def test_bulk_return_adds_clamped_restock_to_totals(self):
+        books = [make_book(copies=2), make_book(copies=1)]
+        for book in books:
+            response = self.client.post('/api/transactions/borrow/', {'book_id': book.id}, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+        # Restocked by hand while on loan: the return must not add a copy
+        Book.objects.filter(pk=books[1].pk).update(available_copies=1)
+        rebuild_library_totals()
+
+        result = bulk_return(Transaction.objects.all())
+        self.assertEqual(result['returned'], 2)
+        self.assertEqual(
+            list(Book.objects.order_by('id').values_list('available_copies', flat=True)), [2, 1]
+        )
+        expected = totals()
+        rebuild_library_totals()
+        self.assertEqual(totals(), expected)
+
+    def dashboard(self):
+        with override_settings(CACHES={**settings.CACHES, 'shared': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }}):
+            return self.client.get('/api/me/dashboard/').data
+
+    def test_dashboard_can_borrow_matches_borrowing(self):
+        book = make_book(copies=2)
+        response = self.client.post('/api/transactions/borrow/', {'book_id': book.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        # Past due, but not yet marked overdue by the nightly job
+        Transaction.objects.filter(pk=response.data['transaction']['id']).update(
+            due_date=timezone.now() - timedelta(days=1)
+        )
+
+        dashboard = self.dashboard()
+        self.assertEqual(dashboard['counts']['overdue'], 1)
+        self.assertEqual(dashboard['borrowing']['blocked_by'], [])
+        self.assertTrue(dashboard['borrowing']['can_borrow'])
+        response = self.client.post('/api/transactions/borrow/', {'book_id': book.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        profile = UserProfile.objects.get(user=self.student)
+        profile.overdue_loans = 1
+        profile.save()
+        self.client.force_authenticate(User.objects.get(pk=self.student.pk))
+        self.assertEqual(self.dashboard()['borrowing']['blocked_by'], ['overdue_loans'])
+        response = self.client.post('/api/transactions/borrow/', {'book_id': make_book().id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CirculationQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Query counts per request must not grow with the number of rows"""
+
+    def setUp(self):
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        self.librarian.profile.role = 'librarian'
+        self.librarian.profile.save()
+        self.book = make_book(copies=5)
+        for _ in range(10):
+            loan = Transaction.objects.create(user=self.student, book=make_book(copies=5))
+            Fine.objects.create(transaction=loan, user=self.student, amount=Decimal('1.00'),
+                                reason='Overdue', status='paid')
+        self.student.profile.refresh_from_db()
+        self.student.profile.max_books_allowed = 20
+        self.student.profile.save()
+        self.client.force_authenticate(self.student)
+
+    def test_transaction_list(self):
+        for user in (self.student, self.librarian):
+            self.client.force_authenticate(user)
+            with self.assertQueryBudget(2, max_repeats=1):
+                response = self.client.get('/api/transactions/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_my_fines(self):
+        with self.assertQueryBudget(1, max_repeats=1):
+            response = self.client.get('/api/fines/my_fines/')
+        self.assertEqual(response.data['summary']['total_fines'], 10)
+
+    def test_fine_list(self):
+        self.client.force_authenticate(self.librarian)
+        with self.assertQueryBudget(2, max_repeats=1):
+            response = self.client.get('/api/fines/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_borrow(self):
+        with self.assertQueryBudget(11, max_repeats=2):
+            response = self.client.post('/api/transactions/borrow/', {'book_id': self.book.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_return(self):
+        loan = Transaction.objects.filter(user=self.student).first()
+        with self.assertQueryBudget(9, max_repeats=1):
+            response = self.client.post(f'/api/transactions/{loan.id}/return_book/')
+        self.assertEqual(response.status_code, 200, response.data)
+
+
+POLICY = {
+    'grace_days': 2,
+    'tiers': [{'from_day': 0, 'rate': 0.5}, {'from_day': 5, 'rate': 1.0}, {'from_day': 10, 'rate': 2.0}],
+    'cap': 20,
+    'role_multipliers': {'librarian': 0.5},
+}
+
+
+class FinePolicyTests(SimpleTestCase):
+    # (days overdue, role, fine): chargeable days start after the 2 grace days
+    CASES = [
+        (-3, 'student', '0.00'),
+        (0, 'student', '0.00'),
+        (2, 'student', '0.00'),     # last grace day
+        (3, 'student', '0.50'),     # first chargeable day
+        (7, 'student', '2.50'),     # end of the first tier
+        (8, 'student', '3.50'),
+        (12, 'student', '7.50'),    # end of the second tier
+        (13, 'student', '9.50'),
+        (18, 'student', '19.50'),
+        (19, 'student', '20.00'),   # 21.50 capped
+        (100, 'student', '20.00'),
+        (13, 'librarian', '4.75'),
+        (19, 'librarian', '10.75'),
+        (30, 'librarian', '20.00'),  # multiplier before the cap: 21.75 capped
+    ]
+
+    def setUp(self):
+        self.policy = FinePolicy.from_dict(POLICY)
+
+    def test_amounts(self):
+        for days, role, expected in self.CASES:
+            with self.subTest(days=days, role=role):
+                self.assertEqual(self.policy.amount_for(days, role), Decimal(expected))
+
+    def test_evaluate_matches_amount_for(self):
+        days = list(range(-2, 60))
+        roles = ['student', 'librarian'] * (len(days) // 2)
+        amounts = self.policy.evaluate(days, roles)
+        for day, role, amount in zip(days, roles, amounts):
+            self.assertEqual(self.policy.amount_for(day, role), Decimal(str(amount)).quantize(Decimal('0.01')))
+
+    def test_defaults_and_validation(self):
+        self.assertEqual(FinePolicy().amount_for(4), Decimal('4.00'))
+        self.assertEqual(FinePolicy.from_dict(self.policy.to_dict()).to_dict(), self.policy.to_dict())
+        for options in ({'grace_days': -1}, {'tiers': [(1, 1.0)]}, {'tiers': [(0, -1.0)]}, {'cap': -1}):
+            with self.subTest(options=options), self.assertRaises(ValueError):
+                FinePolicy(**options)
+
+
+@override_settings(FINE_POLICY=POLICY)
+class FineSimulationTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user('stu', 'stu@example.com', 'pw')
+        self.librarian = User.objects.create_user('lib', 'lib@example.com', 'pw')
+        self.librarian.profile.role = 'librarian'
+        self.librarian.profile.save()
+        self.book = make_book(copies=5)
+        today = timezone.now()
+        # (user, days overdue at return; None = still out and 13 days overdue)
+        for user, days in ((self.student, 0), (self.student, 8), (self.student, None), (self.librarian, 19)):
+            loan = Transaction.objects.create(user=user, book=self.book)
+            if days is None:
+                Transaction.objects.filter(pk=loan.pk).update(due_date=(today - timedelta(days=13)).date())
+            else:
+                Transaction.objects.filter(pk=loan.pk).update(
+                    due_date=(today - timedelta(days=days + 1)).date(),
+                    return_date=today - timedelta(days=1), status='returned'
+                )
+
+    def test_simulation_totals(self):
+        result = simulate_fines(FinePolicy())
+        self.assertEqual((result['transactions'], result['fined_transactions']), (4, 3))
+        self.assertEqual(result['total_amount'], 8 + 13 + 19)
+        self.assertEqual(result['current_policy_total'], 3.5 + 9.5 + 10.75)
+        self.assertEqual(result['max_fine'], 19)
+        self.assertEqual(result['by_role']['student'],
+                         {'transactions': 3, 'fined_transactions': 2, 'total_amount': 21.0})
+
+    def test_simulate_endpoint(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post('/api/fines/simulate/', {}, format='json').status_code, 403)
+
+        self.client.force_authenticate(self.librarian)
+        response = self.client.post('/api/fines/simulate/', {'grace_days': 10, 'cap': 5}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['total_amount'], 3 + 5)
+        response = self.client.post('/api/fines/simulate/', {'tiers': [{'from_day': 1, 'rate': 1}]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_live_return_uses_the_policy(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post('/api/transactions/borrow/', {'book_id': self.book.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        loan_id = response.data['transaction']['id']
+        Transaction.objects.filter(pk=loan_id).update(due_date=(timezone.now() - timedelta(days=13)).date())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/transactions/{loan_id}/return_book/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Fine.objects.get(transaction_id=loan_id).amount, Decimal('9.50'))
+
+
+class BulkAdminActionTests(APITestCase):
+    """The admin actions keep the profile counters and library totals exact"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        self.books = [make_book(copies=2) for _ in range(3)]
+        self.loans = [
+            self.borrow(self.alice, self.books[0]),
+            self.borrow(self.alice, self.books[1]),
+            self.borrow(self.bob, self.books[2]),
+        ]
+        Transaction.objects.filter(pk=self.loans[0].pk).update(
+            due_date=timezone.now().date() - timedelta(days=5)
+        )
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_authenticate(None)
+        self.client.force_login(admin)
+
+    def borrow(self, user, book):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/transactions/borrow/', {'book_id': book.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Transaction.objects.get(pk=response.data['transaction']['id'])
+
+    def run_action(self, model, action, objects):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/admin/transactions/{model}/', {
+                'action': action, '_selected_action': [obj.pk for obj in objects]
+            })
+        self.assertEqual(response.status_code, 302)
+
+    def assertCountersMatchRebuild(self):
+        self.assertEqual(rebuild_profile_counters(), 0)
+        kept = totals()
+        rebuild_library_totals()
+        self.assertEqual(totals(), kept)
+        return kept
+
+    def counters(self, user):
+        profile = UserProfile.objects.get(user=user)
+        return profile.active_loans, profile.overdue_loans, profile.outstanding_fine_balance
+
+    def test_overdue_renew_and_return(self):
+        self.run_action('transaction', 'mark_as_overdue', self.loans[:1])
+        self.assertEqual(self.counters(self.alice), (2, 1, Decimal('0')))
+        self.assertEqual(self.assertCountersMatchRebuild()['overdue_loans'], 1)
+
+        # Only the borrowed, not yet due loans renew
+        due_dates = dict(Transaction.objects.values_list('pk', 'due_date'))
+        self.run_action('transaction', 'renew_transactions', self.loans)
+        for loan in Transaction.objects.all():
+            renewed = loan.pk != self.loans[0].pk
+            self.assertEqual(loan.renewal_count, int(renewed))
+            self.assertEqual(loan.due_date - due_dates[loan.pk], timedelta(days=14 if renewed else 0))
+        self.assertCountersMatchRebuild()
+
+        self.run_action('transaction', 'mark_as_returned', self.loans)
+        self.assertFalse(Transaction.objects.filter(status__in=['borrowed', 'overdue']).exists())
+        fine = Fine.objects.get()
+        self.assertEqual((fine.transaction_id, fine.user), (self.loans[0].pk, self.alice))
+        self.assertEqual(self.counters(self.alice), (0, 0, fine.amount))
+        self.assertEqual(self.counters(self.bob), (0, 0, Decimal('0')))
+        self.assertEqual(
+            list(Book.objects.order_by('id').values_list('available_copies', flat=True)), [2, 2, 2]
+        )
+        kept = self.assertCountersMatchRebuild()
+        self.assertEqual((kept['active_loans'], kept['available_copies']), (0, 6))
+        self.assertEqual(kept['pending_fine_amount'], fine.amount)
+
+        # Returned loans are skipped rather than counted twice
+        self.run_action('transaction', 'mark_as_returned', self.loans)
+        self.assertEqual(Fine.objects.count(), 1)
+        self.assertEqual(self.assertCountersMatchRebuild()['available_copies'], 6)
+
+    def test_fine_actions(self):
+        self.run_action('transaction', 'mark_as_returned', self.loans[:1])
+        bob_fine = Fine.objects.create(
+            transaction=self.loans[2], user=self.bob, amount=Decimal('2.00'), reason='Damage'
+        )
+        self.assertEqual(self.assertCountersMatchRebuild()['pending_fine_amount'],
+                         Fine.objects.get(user=self.alice).amount + Decimal('2.00'))
+
+        self.run_action('fine', 'mark_as_paid', Fine.objects.filter(user=self.alice))
+        self.assertEqual(self.counters(self.alice)[2], Decimal('0'))
+        self.assertEqual(self.assertCountersMatchRebuild()['pending_fine_amount'], Decimal('2.00'))
+
+        self.run_action('fine', 'waive_fines', [bob_fine])
+        bob_fine.refresh_from_db()
+        self.assertEqual(bob_fine.status, 'waived')
+        self.assertEqual(self.counters(self.bob), (1, 0, Decimal('0')))
+        self.assertEqual(self.assertCountersMatchRebuild()['pending_fine_amount'], Decimal('0'))
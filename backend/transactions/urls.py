@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet, FineViewSet
+from .views import TransactionViewSet, FineViewSet, StudentDashboardView
 
 # Create router and register viewsets
 router = DefaultRouter()
@@ -9,4 +9,5 @@ router.register(r'fines', FineViewSet, basename='fine')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('me/dashboard/', StudentDashboardView.as_view(), name='student_dashboard'),
 ]
\ No newline at end of file
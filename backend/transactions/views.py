@@ -1,16 +1,25 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.utils import timezone
+from library_management.db import write_atomic
+from library_management.routers import for_reporting
 from django.db.models import Q
 from .models import Transaction, Fine
+from books.inventory import lend_copy
 from books.models import Book
+from branches.inventory import restock, sync_branch_index, take_copy
 from .serializers import (
     TransactionListSerializer, TransactionDetailSerializer,
     BorrowBookSerializer, RenewTransactionSerializer, ReturnBookSerializer,
     FineListSerializer, FineDetailSerializer, PayFineSerializer,
-    WaiveFineSerializer, CreateFineSerializer
+    WaiveFineSerializer, CreateFineSerializer, FinePolicySerializer
 )
+from changes.views import ChangeFeedMixin
+from .dashboard import student_dashboard
+from .fine_policy import FinePolicy, simulate_fines
+from .tasks import send_fine_notice
 
 
 class IsLibrarian(permissions.BasePermission):
@@ -24,11 +33,12 @@ class IsLibrarian(permissions.BasePermission):
         )
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     """
     ViewSet for Transaction operations
     """
     serializer_class = TransactionListSerializer
+    change_feed_serializer_class = TransactionListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -45,7 +55,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
             ).all()
         else:
             queryset = Transaction.objects.select_related(
-                'book'
+                'user', 'book'
             ).filter(user=user)
 
         # Filter by status
@@ -53,6 +63,11 @@ class TransactionViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
+        # Filter by lending branch (code)
+        branch = self.request.query_params.get('branch', None)
+        if branch:
+            queryset = queryset.filter(branch__code=branch)
+
         # Filter by date range
         date_from = self.request.query_params.get('date_from', None)
         date_to = self.request.query_params.get('date_to', None)
@@ -63,6 +78,19 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
         return queryset.order_by('-borrow_date')
 
+    def get_change_feed_queryset(self):
+        """Students sync their own transactions, librarians all of them"""
+        queryset = Transaction.objects.select_related('user', 'book')
+        if self.request.user.profile.role != 'librarian':
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
+    def get_change_feed_tombstones(self):
+        tombstones = super().get_change_feed_tombstones()
+        if self.request.user.profile.role != 'librarian':
+            tombstones = tombstones.filter(owner_id=self.request.user.id)
+        return tombstones
+
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
         if self.action == 'retrieve':
@@ -79,27 +107,60 @@ class TransactionViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         book_id = serializer.validated_data['book_id']
+        branch = serializer.validated_data.get('branch')
         notes = serializer.validated_data.get('notes', '')
 
         # Get the book
         book = Book.objects.get(id=book_id)
 
-        # Create transaction
-        transaction = Transaction.objects.create(
-            user=request.user,
-            book=book,
-            notes=notes
-        )
+        if branch is not None:
+            return self._borrow_at_branch(request, book, branch, notes)
 
-        # Decrease available copies
-        book.available_copies -= 1
-        book.save()
+        with write_atomic():
+            # Take the copy with a guarded decrement: the availability checked
+            # by the serializer may be gone by the time the write lock is held
+            if not lend_copy(book.id):
+                return Response({
+                    'error': f'No copies of "{book.title}" are available'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # Create transaction (also bumps the borrower's active loan counter)
+            transaction = Transaction.objects.create(
+                user=request.user,
+                book=book,
+                notes=notes
+            )
 
         return Response({
             'transaction': TransactionDetailSerializer(transaction).data,
             'message': f'Book "{book.title}" borrowed successfully'
         }, status=status.HTTP_201_CREATED)
 
+    def _borrow_at_branch(self, request, book, branch, notes):
+        # The copy is taken in the branch's partition, then the loan recorded here
+        if not take_copy(branch, book.id):
+            return Response({
+                'error': f'No copies of "{book.title}" are available at {branch.name}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with write_atomic():
+                transaction = Transaction.objects.create(
+                    user=request.user,
+                    book=book,
+                    branch=branch,
+                    notes=notes
+                )
+        except Exception:
+            restock(branch, {book.id: 1})
+            raise
+        sync_branch_index(branch, [book.id])
+
+        return Response({
+            'transaction': TransactionDetailSerializer(transaction).data,
+            'message': f'Book "{book.title}" borrowed successfully from {branch.name}'
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def return_book(self, request, pk=None):
         """
@@ -120,24 +181,37 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 'error': 'This book has already been returned'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Return the book
-        if transaction.return_book():
+        # Capture overdue days before the status changes to returned
+        days_overdue = transaction.days_overdue
+
+        # Return the book and create the overdue fine in one write transaction
+        fine_amount = 0
+        with write_atomic():
+            returned = transaction.return_book()
+
             # Check if overdue and create fine
-            if transaction.is_overdue and transaction.days_overdue > 0:
-                fine_amount = Fine.calculate_fine(transaction.days_overdue)
-                Fine.objects.create(
+            if returned and days_overdue > 0:
+                role = getattr(getattr(transaction.user, 'profile', None), 'role', None)
+                fine_amount = Fine.calculate_fine(days_overdue, role=role)
+
+            if fine_amount > 0:
+                fine = Fine.objects.create(
                     transaction=transaction,
                     user=transaction.user,
                     amount=fine_amount,
-                    reason=f'Overdue by {transaction.days_overdue} days'
+                    reason=f'Overdue by {days_overdue} days'
                 )
+                # Queued in this transaction, so the worker only sees committed fines
+                send_fine_notice.enqueue(fine.id)
 
+        if returned:
+            if fine_amount > 0:
                 return Response({
                     'transaction': TransactionDetailSerializer(transaction).data,
                     'message': 'Book returned successfully',
                     'fine_created': True,
-                    'fine_amount': fine_amount,
-                    'days_overdue': transaction.days_overdue
+                    'fine_amount': float(fine_amount),
+                    'days_overdue': days_overdue
                 }, status=status.HTTP_200_OK)
 
             return Response({
@@ -146,8 +220,9 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 'fine_created': False
             }, status=status.HTTP_200_OK)
 
+        # Returned concurrently since the check above
         return Response({
-            'error': 'Failed to return book'
+            'error': 'This book has already been returned'
         }, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
@@ -172,7 +247,10 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
         days = serializer.validated_data['days']
 
-        if transaction.renew(days=days):
+        with write_atomic():
+            renewed = transaction.renew(days=days)
+
+        if renewed:
             return Response({
                 'transaction': TransactionDetailSerializer(transaction).data,
                 'message': f'Book renewed for {days} more days',
@@ -203,7 +281,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
         Get all overdue transactions (librarian only)
         GET /api/transactions/overdue/
         """
-        overdue_transactions = Transaction.objects.select_related(
+        overdue_transactions = for_reporting(Transaction.objects).select_related(
             'user', 'book'
         ).filter(
             status__in=['borrowed', 'overdue'],
@@ -214,11 +292,12 @@ class TransactionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class FineViewSet(viewsets.ModelViewSet):
+class FineViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     """
     ViewSet for Fine operations
     """
     serializer_class = FineListSerializer
+    change_feed_serializer_class = FineListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -231,10 +310,10 @@ class FineViewSet(viewsets.ModelViewSet):
 
         if user.profile.role == 'librarian':
             queryset = Fine.objects.select_related(
-                'user', 'transaction', 'waived_by'
+                'user', 'transaction__book', 'waived_by'
             ).all()
         else:
-            queryset = Fine.objects.select_related('transaction').filter(user=user)
+            queryset = Fine.objects.select_related('user', 'transaction__book').filter(user=user)
 
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
@@ -243,6 +322,19 @@ class FineViewSet(viewsets.ModelViewSet):
 
         return queryset.order_by('-created_at')
 
+    def get_change_feed_queryset(self):
+        """Students sync their own fines, librarians all of them"""
+        queryset = Fine.objects.select_related('user', 'transaction__book')
+        if self.request.user.profile.role != 'librarian':
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
+    def get_change_feed_tombstones(self):
+        tombstones = super().get_change_feed_tombstones()
+        if self.request.user.profile.role != 'librarian':
+            tombstones = tombstones.filter(owner_id=self.request.user.id)
+        return tombstones
+
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
         if self.action == 'retrieve':
@@ -260,6 +352,11 @@ class FineViewSet(viewsets.ModelViewSet):
 
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        with write_atomic():
+            fine = serializer.save()
+            send_fine_notice.enqueue(fine.id)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def pay(self, request, pk=None):
         """
@@ -280,7 +377,10 @@ class FineViewSet(viewsets.ModelViewSet):
         payment_method = serializer.validated_data['payment_method']
         payment_reference = serializer.validated_data.get('payment_reference', '')
 
-        if fine.mark_as_paid(payment_method=payment_method, payment_reference=payment_reference):
+        with write_atomic():
+            paid = fine.mark_as_paid(payment_method=payment_method, payment_reference=payment_reference)
+
+        if paid:
             return Response({
                 'fine': FineDetailSerializer(fine).data,
                 'message': 'Fine paid successfully'
@@ -306,7 +406,10 @@ class FineViewSet(viewsets.ModelViewSet):
 
         reason = serializer.validated_data['reason']
 
-        if fine.waive(waived_by=request.user, reason=reason):
+        with write_atomic():
+            waived = fine.waive(waived_by=request.user, reason=reason)
+
+        if waived:
             return Response({
                 'fine': FineDetailSerializer(fine).data,
                 'message': 'Fine waived successfully'
@@ -322,9 +425,9 @@ class FineViewSet(viewsets.ModelViewSet):
         Get all fines for the logged-in user
         GET /api/fines/my_fines/
         """
-        fines = Fine.objects.select_related('transaction').filter(
+        fines = list(Fine.objects.select_related('user', 'transaction__book').filter(
             user=request.user
-        ).order_by('-created_at')
+        ).order_by('-created_at'))
 
         serializer = FineListSerializer(fines, many=True)
 
@@ -337,7 +440,7 @@ class FineViewSet(viewsets.ModelViewSet):
             'summary': {
                 'total_pending': float(total_pending),
                 'total_paid': float(total_paid),
-                'total_fines': fines.count()
+                'total_fines': len(fines)
             }
         })
 
@@ -347,9 +450,9 @@ class FineViewSet(viewsets.ModelViewSet):
         Get all pending fines (librarian only)
         GET /api/fines/pending/
         """
-        pending_fines = Fine.objects.select_related(
-            'user', 'transaction'
-        ).filter(status='pending').order_by('-created_at')
+        pending_fines = list(for_reporting(Fine.objects).select_related(
+            'user', 'transaction__book'
+        ).filter(status='pending').order_by('-created_at'))
 
         serializer = FineListSerializer(pending_fines, many=True)
         total_pending = sum(f.amount for f in pending_fines)
@@ -357,5 +460,28 @@ class FineViewSet(viewsets.ModelViewSet):
         return Response({
             'fines': serializer.data,
             'total_pending': float(total_pending),
-            'count': pending_fines.count()
-        })
\ No newline at end of file
+            'count': len(pending_fines)
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[IsLibrarian])
+    def simulate(self, request):
+        """
+        Run a what-if fine policy over all historical transactions (librarian only)
+        POST /api/fines/simulate/
+        """
+        serializer = FinePolicySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        policy = FinePolicy.from_dict(serializer.validated_data)
+        return Response(simulate_fines(policy, for_reporting(Transaction.objects.all())))
+
+
+class StudentDashboardView(APIView):
+    """
+    API endpoint for the logged-in user's loans, fines and borrowing headroom
+    GET /api/me/dashboard/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(student_dashboard(request.user.id))
@@ -50,4 +50,19 @@ export const api = {
         });
         return response.json();
     },
+
+    // Several GET requests in one round trip: requests = [{ id, path: '/api/...' }]
+    batch: async (requests) => {
+        const { responses } = await api.post('/batch/', { requests });
+        return responses;
+    },
+
+    // Current loans with due state, fine balance and borrowing headroom
+    myDashboard: () => api.get('/me/dashboard/'),
+
+    // Delta sync: resource is 'books', 'transactions' or 'fines'; pass the
+    // previous response's `next` token (none for a first, full sync)
+    changes: (resource, since) => api.get(
+        `/${resource}/changes/${since ? `?since=${encodeURIComponent(since)}` : ''}`
+    ),
 };